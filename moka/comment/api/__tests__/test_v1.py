@@ -0,0 +1,211 @@
+from unittest import mock
+
+import django.test
+from comment.models import Comment, LikeComment
+from comment.service import counters, top_comments
+from django.core.cache import cache
+from django.test import Client
+from episode.factory import EpisodeFactory
+from moka_profile.factory import MokaProfileFactory
+
+
+class TestCommentAPI(django.test.TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.episode = EpisodeFactory()
+        self.reader = MokaProfileFactory()
+        likers = MokaProfileFactory.create_batch(size=4)
+
+        # Comment i has i likes and one reply
+        self.comments = []
+        for num_likes in range(5):
+            comment = Comment.objects.create(
+                commenter=self.reader if num_likes == 2 else likers[0],
+                episode=self.episode,
+                content=f"comment {num_likes}",
+            )
+            LikeComment.objects.bulk_create(
+                [
+                    LikeComment(comment=comment, liker=liker)
+                    for liker in likers[:num_likes]
+                ]
+            )
+            Comment.objects.create(
+                commenter=likers[0],
+                episode=self.episode,
+                parent=comment,
+                content="reply",
+            )
+            self.comments.append(comment)
+        LikeComment.objects.create(comment=self.comments[1], liker=self.reader)
+        counters.reconcile()
+        # Ids are reused across test databases
+        top_comments.invalidate(self.episode.id)
+
+    def get_as_reader(self, path):
+        with mock.patch(
+            "comment.api.v1.FirebaseOptionalAuthentication.authenticate",
+            return_value=self.reader,
+        ):
+            return self.client.get(path)
+
+    def test_episode_comments_keyset_pages(self):
+        path = f"/v1/comment/episode/{self.episode.id}?limit=2"
+        # Ranked ids and count, then the page
+        with self.assertNumQueries(3):
+            response = self.get_as_reader(path).json()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_as_reader(path).json(), response)
+        items = response["items"]
+        cursor = response["next_cursor"]
+        while cursor is not None:
+            # A single query per page
+            with self.assertNumQueries(1):
+                response = self.get_as_reader(f"{path}&cursor={cursor}").json()
+            items += response["items"]
+            cursor = response["next_cursor"]
+
+        # Comment 1 and 2 both have 2 likes, newest first
+        self.assertEqual(
+            [item["id"] for item in items],
+            [str(self.comments[i].id) for i in [4, 3, 2, 1, 0]],
+        )
+        self.assertEqual([item["likes"] for item in items], [4, 3, 2, 2, 0])
+        self.assertTrue(all(item["children"] == 1 for item in items))
+        self.assertEqual(
+            [item["liked"] for item in items], [False, False, False, True, False]
+        )
+        self.assertEqual(
+            [item["is_mine"] for item in items], [False, False, True, False, False]
+        )
+
+    def test_replies(self):
+        response = self.client.get(
+            f"/v1/comment/{self.comments[0].id}/replies?with_count=true"
+        ).json()
+        self.assertEqual(response["count"], 1)
+        self.assertEqual(response["items"][0]["content"], "reply")
+        self.assertFalse(response["items"][0]["liked"])
+
+    def test_load_episode_comments(self):
+        # Ranked ids and count, then the page
+        with self.assertNumQueries(3):
+            response = self.get_as_reader(
+                f"/v1/comment/load-episode/{self.episode.id}?offset=1"
+            ).json()
+        self.assertEqual(
+            [item["id"] for item in response],
+            [str(self.comments[i].id) for i in [3, 2, 1, 0]],
+        )
+        self.assertEqual(
+            [item["liked"] for item in response], [False, False, True, False]
+        )
+        self.assertEqual(
+            [item["is_mine"] for item in response], [False, True, False, False]
+        )
+
+    def post_as_reader(self, path, data=None):
+        with mock.patch(
+            "comment.api.v1.FirebaseAuthentication.authenticate",
+            return_value=self.reader,
+        ):
+            return self.client.post(path, data=data, content_type="application/json")
+
+    def get_top_comment_ids(self):
+        response = self.client.get(f"/v1/comment/load-episode/{self.episode.id}")
+        return [int(item["id"]) for item in response.json()]
+
+    def test_like_counts_and_ranking(self):
+        comment = self.comments[0]
+        response = self.post_as_reader(
+            "/v1/comment/comment",
+            {"content": "first!", "episode_id": str(self.episode.id)},
+        )
+        # Ties with comment 0, newest first
+        new_comment_id = int(response.json()["id"])
+        self.assertEqual(self.get_top_comment_ids()[-2:], [new_comment_id, comment.id])
+
+        for _ in range(2):
+            # Liking twice counts once
+            self.post_as_reader(f"/v1/comment/{comment.id}/like")
+        comment.refresh_from_db()
+        self.assertEqual(comment.like_count, 1)
+        self.assertEqual(self.get_top_comment_ids()[-2:], [comment.id, new_comment_id])
+
+        for _ in range(2):
+            self.post_as_reader(f"/v1/comment/{comment.id}/unlike")
+        comment.refresh_from_db()
+        self.assertEqual(comment.like_count, 0)
+        self.assertEqual(self.get_top_comment_ids()[-2:], [new_comment_id, comment.id])
+
+    def set_like_count(self, comment, like_count):
+        Comment.objects.filter(id=comment.id).update(like_count=like_count)
+        top_comments.update_like_count(self.episode.id, comment.id, like_count)
+
+    def get_cached_ranking(self):
+        entry = cache.get(top_comments.get_cache_key(self.episode.id))
+        if entry is None:
+            return None
+        # As indexes into self.comments
+        return [self.comments.index(Comment(id=id)) for id, _ in entry["ranked"]]
+
+    @mock.patch.object(top_comments, "TOP_COMMENTS_SIZE", 3)
+    def test_likes_rerank_cached_ranking(self):
+        self.get_top_comment_ids()
+        self.assertEqual(self.get_cached_ranking(), [4, 3, 2])
+
+        # Stays behind the cached comments
+        self.post_as_reader(f"/v1/comment/{self.comments[0].id}/like")
+        self.assertEqual(self.get_cached_ranking(), [4, 3, 2])
+
+        # Joins the list
+        self.set_like_count(self.comments[0], 5)
+        self.assertEqual(self.get_cached_ranking(), [0, 4, 3])
+
+        # Moves within the list
+        self.set_like_count(self.comments[3], 6)
+        self.assertEqual(self.get_cached_ranking(), [3, 0, 4])
+
+        # Falls to the end, where comments that aren't cached may rank higher
+        self.set_like_count(self.comments[4], 0)
+        self.assertIsNone(self.get_cached_ranking())
+        self.assertEqual(
+            self.get_top_comment_ids(),
+            [self.comments[i].id for i in [3, 0, 2, 1, 4]],
+        )
+
+    def test_reply_counts(self):
+        parent = self.comments[0]
+        response = self.post_as_reader(
+            "/v1/comment/reply",
+            {
+                "content": "me too",
+                "episode_id": str(self.episode.id),
+                "parent_comment_id": str(parent.id),
+            },
+        )
+        parent.refresh_from_db()
+        self.assertEqual(parent.reply_count, 2)
+
+        self.post_as_reader(f"/v1/comment/{response.json()['id']}/delete")
+        parent.refresh_from_db()
+        self.assertEqual(parent.reply_count, 1)
+
+    def test_new_and_deleted_comments_invalidate_ranking(self):
+        self.assertEqual(len(self.get_top_comment_ids()), 5)
+        response = self.post_as_reader(
+            "/v1/comment/comment",
+            {"content": "first!", "episode_id": str(self.episode.id)},
+        )
+        new_comment_id = response.json()["id"]
+        self.assertIn(int(new_comment_id), self.get_top_comment_ids())
+
+        self.post_as_reader(f"/v1/comment/{new_comment_id}/delete")
+        self.assertNotIn(int(new_comment_id), self.get_top_comment_ids())
+
+    def test_edit_keeps_counts(self):
+        comment = self.comments[2]
+        self.post_as_reader(f"/v1/comment/{comment.id}/update", {"content": "edited"})
+        comment.refresh_from_db()
+        self.assertEqual(comment.content, "edited")
+        self.assertEqual(comment.like_count, 2)
@@ -63,19 +63,21 @@ class CommentSchema(Schema):
 
     @staticmethod
     def resolve_is_mine(obj: Comment):
-        return False
+        # Set for the caller by the comment queries
+        return getattr(obj, "is_mine", False)
 
     @staticmethod
     def resolve_liked(obj: Comment):
-        return False
+        # Annotated for the caller by the comment queries
+        return getattr(obj, "caller_liked", False)
 
     @staticmethod
     def resolve_likes(obj: Comment):
-        return obj.likes.count()
+        return obj.like_count
 
     @staticmethod
     def resolve_children(obj: Comment):
-        return obj.replies.count()
+        return obj.reply_count
 
     @staticmethod
     def resolve_created_at(obj: Comment):
@@ -100,6 +102,9 @@ class CommentSchema(Schema):
     def resolve_with_comment_and_caller(obj: Comment, caller: Optional[MokaProfile]):
         ret = CommentSchema.resolve_with_comment(obj)
         if caller is not None:
-            ret["liked"] = obj.likes.filter(liker=caller).exists()
-            ret["is_mine"] = obj.commenter == caller
+            if hasattr(obj, "caller_liked"):
+                ret["liked"] = obj.caller_liked
+            else:
+                ret["liked"] = obj.likes.filter(liker=caller).exists()
+            ret["is_mine"] = obj.commenter_id == caller.id
         return ret
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from comment.api.schema import (
     CommentPostInputSchema,
@@ -7,14 +7,23 @@ from comment.api.schema import (
     ReplyPostInputSchema,
 )
 from comment.models import Comment, LikeComment
-from common.auth import FirebaseAuthentication, FirebaseOptionalAuthentication
+from comment.service import counters, top_comments
+from common.auth import (
+    CloudSchedulerAuthentication,
+    FirebaseAuthentication,
+    FirebaseOptionalAuthentication,
+)
 from common.logger import StructuredLogger
-from django.db.models import Count
+from common.pagination import CursorPagination
+from django.db import transaction
+from django.db.models import BooleanField, Exists, ExpressionWrapper, F, OuterRef, Q
+from django.db.models.functions import Greatest
 from django.shortcuts import get_object_or_404
 from django.views.decorators import csrf
 from episode.models import Episode
 from moka_profile.models import MokaProfile
 from ninja import Router
+from ninja.pagination import paginate
 
 router = Router()
 logger = StructuredLogger(__name__)
@@ -32,6 +41,7 @@ def post_comment(request, input: CommentPostInputSchema):
         episode=episode,
         content=input.content,
     )
+    top_comments.invalidate(episode.id)
     return CommentSchema.resolve_with_comment_and_caller(
         new_comment,
         request.auth,
@@ -46,12 +56,16 @@ def post_comment(request, input: CommentPostInputSchema):
 def reply(request, input: ReplyPostInputSchema):
     episode = get_object_or_404(Episode.objects, id=input.episode_id)
     parent_comment = get_object_or_404(Comment.objects, id=input.parent_comment_id)
-    reply = Comment.objects.create(
-        commenter=request.auth,
-        episode=episode,
-        parent=parent_comment,
-        content=input.content,
-    )
+    with transaction.atomic():
+        reply = Comment.objects.create(
+            commenter=request.auth,
+            episode=episode,
+            parent=parent_comment,
+            content=input.content,
+        )
+        Comment.objects.filter(id=parent_comment.id).update(
+            reply_count=F("reply_count") + 1
+        )
     return CommentSchema.resolve_with_comment_and_caller(
         reply,
         request.auth,
@@ -71,13 +85,20 @@ def update_comment(request, id: int, input: CommentUpdateInputSchema):
         id=id,
     )
     comment.content = input.content
-    comment.save()
+    # Leave the counters to their F() updates
+    comment.save(update_fields=["content", "updated_at"])
     return CommentSchema.resolve_with_comment_and_caller(
         comment,
         request.auth,
     )
 
 
+def update_top_comments(comment: Comment):
+    # The committed count, other likes may have landed since ours
+    like_count = Comment.objects.values_list("like_count", flat=True).get(id=comment.id)
+    top_comments.update_like_count(comment.episode_id, comment.id, like_count)
+
+
 @router.post(
     "/{int:id}/like",
     response=None,
@@ -88,10 +109,15 @@ def like_comment(request, id: int):
         Comment.objects,
         id=id,
     )
-    LikeComment.objects.create(
-        comment=comment,
-        liker=request.auth,
-    )
+    with transaction.atomic():
+        _, created = LikeComment.objects.get_or_create(
+            comment=comment,
+            liker=request.auth,
+        )
+        if created:
+            Comment.objects.filter(id=comment.id).update(like_count=F("like_count") + 1)
+    if created and comment.parent_id is None:
+        update_top_comments(comment)
 
 
 @router.post(
@@ -104,10 +130,17 @@ def unlike_comment(request, id: int):
         Comment.objects,
         id=id,
     )
-    LikeComment.objects.filter(
-        comment=comment,
-        liker=request.auth,
-    ).delete()
+    with transaction.atomic():
+        deleted_cnt, _ = LikeComment.objects.filter(
+            comment=comment,
+            liker=request.auth,
+        ).delete()
+        if deleted_cnt:
+            Comment.objects.filter(id=comment.id).update(
+                like_count=Greatest(F("like_count") - deleted_cnt, 0)
+            )
+    if deleted_cnt and comment.parent_id is None:
+        update_top_comments(comment)
 
 
 @router.post(
@@ -116,10 +149,87 @@ def unlike_comment(request, id: int):
     auth=FirebaseAuthentication(),
 )
 def delete_comment(request, id: int):
-    Comment.objects.filter(
+    comment = Comment.objects.filter(
         id=id,
         commenter=request.auth,
-    ).delete()
+    ).first()
+    if comment is None:
+        return
+    with transaction.atomic():
+        comment.delete()
+        if comment.parent_id is not None:
+            Comment.objects.filter(id=comment.parent_id).update(
+                reply_count=Greatest(F("reply_count") - 1, 0)
+            )
+    if comment.parent_id is None:
+        top_comments.invalidate(comment.episode_id)
+
+
+@router.post(
+    "/reconcile-counts",
+    auth=CloudSchedulerAuthentication(),
+)
+@csrf.csrf_exempt
+def reconcile_counts(request):
+    logger.info(event_name="RECONCILE_COMMENT_COUNTS_START")
+    fixed_cnt = counters.reconcile()
+    logger.info(
+        event_name="RECONCILE_COMMENT_COUNTS_DONE",
+        fixed_cnt=fixed_cnt,
+    )
+
+
+def get_comment_queryset(caller: Optional[MokaProfile]):
+    """
+    Comments with the caller's state, so a page is a single query
+    """
+    queryset = Comment.objects.select_related("commenter")
+    if caller is None:
+        return queryset
+    return queryset.annotate(
+        caller_liked=Exists(
+            LikeComment.objects.filter(comment=OuterRef("pk"), liker=caller)
+        ),
+        is_mine=ExpressionWrapper(
+            Q(commenter_id=caller.id), output_field=BooleanField()
+        ),
+    )
+
+
+def get_caller(request) -> Optional[MokaProfile]:
+    return request.auth if isinstance(request.auth, MokaProfile) else None
+
+
+@router.get(
+    "/episode/{int:episode_id}",
+    response=List[CommentSchema],
+    auth=FirebaseOptionalAuthentication(),
+    description="Top level comments of the episode, most liked first",
+)
+@csrf.csrf_exempt
+@paginate(CursorPagination, ordering=top_comments.ORDERING)
+def get_episode_comments(request, episode_id: int):
+    return top_comments.TopComments(
+        episode_id,
+        get_comment_queryset(get_caller(request)).filter(
+            episode__id=episode_id,
+            parent=None,
+        ),
+    )
+
+
+@router.get(
+    "/{int:parent_comment_id}/replies",
+    response=List[CommentSchema],
+    auth=FirebaseOptionalAuthentication(),
+    description="Replies of the comment, most liked first",
+)
+@csrf.csrf_exempt
+@paginate(CursorPagination, ordering=top_comments.ORDERING)
+def get_replies(request, parent_comment_id: int):
+    return get_comment_queryset(get_caller(request)).filter(
+        parent__id=parent_comment_id,
+    )
 
 
 @router.get(
@@ -132,23 +242,18 @@ def load_episode_comments(request, episode_id: int, offset: int = 0):
     """
     Return 10 most liked comments given the offset
     """
-    top_comments = (
-        Comment.objects.filter(
+    caller = get_caller(request)
+    comments = top_comments.TopComments(
+        episode_id,
+        get_comment_queryset(caller).filter(
             episode__id=episode_id,
             parent=None,
-        )
-        .select_related(
-            "commenter",
-        )
-        .annotate(num_likes=Count("like"))
-        .order_by("-num_likes")[offset : offset + 10]
-    )
+        ),
+    )[offset : offset + 10]
 
     return [
-        CommentSchema.resolve_with_comment_and_caller(
-            comment, request.auth if isinstance(request.auth, MokaProfile) else None
-        )
-        for comment in top_comments
+        CommentSchema.resolve_with_comment_and_caller(comment, caller)
+        for comment in comments
     ]
 
 
@@ -162,20 +267,16 @@ def load_replies(request, parent_comment_id: int, offset: int = 0):
     """
     Return 10 most liked replies given the offset
     """
+    caller = get_caller(request)
     top_replies = (
-        Comment.objects.filter(
+        get_comment_queryset(caller)
+        .filter(
             parent__id=parent_comment_id,
         )
-        .select_related(
-            "commenter",
-        )
-        .annotate(num_likes=Count("like"))
-        .order_by("-num_likes")[offset : offset + 10]
+        .order_by(*top_comments.ORDERING)[offset : offset + 10]
     )
 
     return [
-        CommentSchema.resolve_with_comment_and_caller(
-            comment, request.auth if isinstance(request.auth, MokaProfile) else None
-        )
+        CommentSchema.resolve_with_comment_and_caller(comment, caller)
         for comment in top_replies
     ]
@@ -0,0 +1,180 @@
+import random
+import statistics
+import time
+
+from comment.api.schema import CommentSchema
+from comment.api.v1 import get_comment_queryset
+from comment.models import Comment, LikeComment
+from comment.service import counters, top_comments
+from common.pagination import CursorPagination
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from episode.factory import EpisodeFactory
+from moka_profile.models import MokaProfile
+
+PAGE_SIZE = 10
+
+
+def legacy_page(episode, caller, offset):
+    # load_episode_comments before the annotated query
+    comments = (
+        Comment.objects.filter(episode=episode, parent=None)
+        .select_related("commenter")
+        .annotate(num_likes=Count("like"))
+        .order_by("-num_likes")[offset : offset + PAGE_SIZE]
+    )
+    return [
+        {
+            **CommentSchema.resolve_with_comment(comment),
+            "likes": comment.likes.count(),
+            "children": comment.replies.count(),
+            "liked": comment.likes.filter(liker=caller).exists(),
+        }
+        for comment in comments
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare comment page latency and query counts of the offset pages "
+        "against the annotated keyset pages on one episode with many "
+        "comments. Seeded rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--comments", type=int, default=10000)
+        parser.add_argument("--other-comments", type=int, default=100000)
+        parser.add_argument("--profiles", type=int, default=500)
+        parser.add_argument("--max-likes", type=int, default=30)
+        parser.add_argument("--pages", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def seed(self, options, rng):
+        profiles = MokaProfile.objects.bulk_create(
+            [
+                MokaProfile(firebase_uid=f"bench-{i}", display_name=f"reader {i}")
+                for i in range(options["profiles"])
+            ]
+        )
+        episode = EpisodeFactory()
+        comments = Comment.objects.bulk_create(
+            [
+                Comment(commenter=rng.choice(profiles), episode=episode, content="hi")
+                for _ in range(options["comments"])
+            ]
+        )
+        Comment.objects.bulk_create(
+            [
+                Comment(
+                    commenter=rng.choice(profiles),
+                    episode=episode,
+                    parent=parent,
+                    content="reply",
+                )
+                for parent in rng.sample(comments, len(comments) // 5)
+                for _ in range(rng.randint(1, 5))
+            ]
+        )
+        # Comments of other episodes, the table is shared
+        other_episodes = EpisodeFactory.create_batch(size=50)
+        Comment.objects.bulk_create(
+            [
+                Comment(
+                    commenter=rng.choice(profiles),
+                    episode=rng.choice(other_episodes),
+                    content="hi",
+                )
+                for _ in range(options["other_comments"])
+            ],
+            batch_size=5000,
+        )
+        LikeComment.objects.bulk_create(
+            [
+                LikeComment(comment=comment, liker=liker)
+                for comment in comments
+                for liker in rng.sample(
+                    profiles,
+                    min(int(rng.paretovariate(1.5)) - 1, options["max_likes"]),
+                )
+            ]
+        )
+        counters.reconcile()
+        with connection.cursor() as cursor:
+            for model in [Comment, LikeComment]:
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+        return episode, profiles[0]
+
+    def measure(self, fetch_pages):
+        latencies = []
+        with CaptureQueriesContext(connection) as queries:
+            for fetch in fetch_pages():
+                start = time.perf_counter()
+                fetch()
+                latencies.append((time.perf_counter() - start) * 1000)
+        return (
+            statistics.median(latencies),
+            max(latencies),
+            len(queries) / len(latencies),
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            episode, caller = self.seed(options, rng)
+            num_pages = options["pages"]
+
+            def legacy_pages():
+                for page in range(num_pages):
+                    yield lambda page=page: legacy_page(
+                        episode, caller, page * PAGE_SIZE
+                    )
+
+            def keyset_pages():
+                paginator = CursorPagination(ordering=top_comments.ORDERING)
+                top_comments.invalidate(episode.id)
+                queryset = top_comments.TopComments(
+                    episode.id,
+                    get_comment_queryset(caller).filter(episode=episode, parent=None),
+                )
+                state = {"cursor": None}
+
+                def fetch():
+                    if state["cursor"] is None:
+                        pagination = CursorPagination.Input(limit=PAGE_SIZE, offset=0)
+                    else:
+                        pagination = CursorPagination.Input(
+                            limit=PAGE_SIZE, cursor=state["cursor"]
+                        )
+                    page = paginator.paginate_queryset(queryset, pagination)
+                    [CommentSchema.from_orm(comment) for comment in page["items"]]
+                    state["cursor"] = page["next_cursor"]
+
+                for _ in range(num_pages):
+                    yield fetch
+
+            def first_pages():
+                # Every reader opening the episode, served from the cached ranking
+                for _ in range(num_pages):
+                    yield lambda: [
+                        CommentSchema.from_orm(comment)
+                        for comment in top_comments.TopComments(
+                            episode.id,
+                            get_comment_queryset(caller).filter(
+                                episode=episode, parent=None
+                            ),
+                        )[:PAGE_SIZE]
+                    ]
+
+            for name, fetch_pages in [
+                ("offset", legacy_pages),
+                ("keyset", keyset_pages),
+                ("first page", first_pages),
+            ]:
+                median, worst, queries = self.measure(fetch_pages)
+                self.stdout.write(
+                    f"{name:>10}: median {median:.1f} ms, max {worst:.1f} ms, "
+                    f"{queries:.1f} queries per page"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        # Backfill, comment.service.counters.reconcile fixes later drift
+        migrations.RunSQL(
+            sql="""
+            UPDATE comment_comment SET
+                like_count = (
+                    SELECT COUNT(*) FROM comment_likecomment
+                    WHERE comment_likecomment.comment_id = comment_comment.id
+                ),
+                reply_count = (
+                    SELECT COUNT(*) FROM comment_comment AS reply
+                    WHERE reply.parent_id = comment_comment.id
+                )
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['episode', 'parent', 'like_count', 'id'], name='comment_com_episode_d713b7_idx'),
+        ),
+    ]
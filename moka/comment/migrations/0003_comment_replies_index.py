@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comment', '0002_auto_20261017_0528'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['parent', 'like_count', 'id'], name='comment_com_parent__b40595_idx'),
+        ),
+    ]
@@ -24,9 +24,22 @@ class Comment(models.Model):
 
     content = models.CharField(max_length=200)
 
+    # Maintained with F() by the comment API, drift is fixed by
+    # comment.service.counters.reconcile
+    like_count = models.PositiveIntegerField(default=0)
+    reply_count = models.PositiveIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Most liked top level comments of an episode, scanned backwards
+            models.Index(fields=["episode", "parent", "like_count", "id"]),
+            # Most liked replies of a comment
+            models.Index(fields=["parent", "like_count", "id"]),
+        ]
+
 
 class LikeComment(models.Model):
     comment = models.ForeignKey(
@@ -0,0 +1,32 @@
+from comment.models import Comment, LikeComment
+from comment.service import counters, top_comments
+from django.core.cache import cache
+from django.test import TestCase
+from episode.factory import EpisodeFactory
+from moka_profile.factory import MokaProfileFactory
+
+
+class ReconcileTests(TestCase):
+    def test_fixes_drift(self):
+        episode = EpisodeFactory()
+        liker = MokaProfileFactory()
+        comment = Comment.objects.create(
+            commenter=liker, episode=episode, content="hi", like_count=5
+        )
+        Comment.objects.create(
+            commenter=liker, episode=episode, parent=comment, content="reply"
+        )
+        LikeComment.objects.create(comment=comment, liker=liker)
+        in_step = Comment.objects.create(
+            commenter=liker, episode=episode, content="hi", like_count=0
+        )
+        cache.set(top_comments.get_cache_key(episode.id), {"ids": [], "count": 0})
+
+        self.assertEqual(counters.reconcile(chunk_size=1), 1)
+
+        comment.refresh_from_db()
+        self.assertEqual((comment.like_count, comment.reply_count), (1, 1))
+        in_step.refresh_from_db()
+        self.assertEqual((in_step.like_count, in_step.reply_count), (0, 0))
+        self.assertIsNone(cache.get(top_comments.get_cache_key(episode.id)))
+        self.assertEqual(counters.reconcile(), 0)
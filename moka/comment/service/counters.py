@@ -0,0 +1,74 @@
+"""
+Reconciles the like_count and reply_count columns of comments with the
+LikeComment and reply rows. The API keeps them in step with F() updates,
+this catches drift from cascading deletes (e.g. a deleted profile's likes)
+and failed requests.
+"""
+from comment.models import Comment, LikeComment
+from comment.service import top_comments
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+RECONCILE_CHUNK_SIZE = 1000
+
+
+def count_rows(queryset, field: str):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(count=Count("id"))
+            .values("count"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def reconcile(chunk_size: int = RECONCILE_CHUNK_SIZE) -> int:
+    """
+    Walks all comments in id order. Returns the number of fixed comments
+    """
+    fixed_cnt = 0
+    last_id = 0
+    while True:
+        comments = list(
+            Comment.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "episode_id", "like_count", "reply_count")[:chunk_size]
+        )
+        if not comments:
+            return fixed_cnt
+        last_id = comments[-1][0]
+
+        comment_ids = [comment_id for comment_id, _, _, _ in comments]
+        like_counts = dict(
+            LikeComment.objects.filter(comment_id__in=comment_ids)
+            .values("comment")
+            .annotate(count=Count("id"))
+            .values_list("comment", "count")
+        )
+        reply_counts = dict(
+            Comment.objects.filter(parent_id__in=comment_ids)
+            .values("parent")
+            .annotate(count=Count("id"))
+            .values_list("parent", "count")
+        )
+        drifted = {
+            comment_id: episode_id
+            for comment_id, episode_id, like_count, reply_count in comments
+            if like_count != like_counts.get(comment_id, 0)
+            or reply_count != reply_counts.get(comment_id, 0)
+        }
+        if not drifted:
+            continue
+
+        # Recount in the UPDATE so likes since the read above are not lost
+        Comment.objects.filter(id__in=drifted.keys()).update(
+            like_count=count_rows(LikeComment.objects, "comment"),
+            reply_count=count_rows(Comment.objects, "parent"),
+        )
+        for episode_id in set(drifted.values()):
+            top_comments.invalidate(episode_id)
+        fixed_cnt += len(drifted)
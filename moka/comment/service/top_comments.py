@@ -0,0 +1,124 @@
+"""
+Cached ids of the most liked top level comments of each episode.
+
+Comment pages are hydrated from the ids with a single id__in query, so the
+ranking is shared by every reader while likes, liked state and content are
+always read fresh. The API invalidates an episode's list on new or deleted
+comments. Likes on top level comments re-rank the list in place, since the
+most read episodes are also the most liked, and only drop it when the
+comment may fall behind comments that aren't cached.
+"""
+from typing import List
+
+from comment.models import Comment
+from django.core.cache import cache
+from django.db.models import QuerySet
+from redis.exceptions import RedisError
+
+TOP_COMMENTS_CACHE_KEY = "episode_{episode_id}_ranked_comments"
+TOP_COMMENTS_SIZE = 100
+TOP_COMMENTS_TIMEOUT = 60 * 60
+# Seconds, likes of an episode update its list one at a time
+UPDATE_LOCK_TIMEOUT = 1
+ORDERING = ("-like_count", "-id")
+
+
+def get_cache_key(episode_id: int) -> str:
+    return TOP_COMMENTS_CACHE_KEY.format(episode_id=episode_id)
+
+
+def invalidate(episode_id: int):
+    cache.delete(get_cache_key(episode_id))
+
+
+def get_rank(item) -> tuple:
+    comment_id, like_count = item
+    return like_count, comment_id
+
+
+def update_like_count(episode_id: int, comment_id: int, like_count: int):
+    """
+    Re-ranks a top level comment of the cached list after a like or unlike
+    """
+    key = get_cache_key(episode_id)
+    try:
+        with cache.lock(
+            f"{key}_lock",
+            timeout=UPDATE_LOCK_TIMEOUT,
+            blocking_timeout=UPDATE_LOCK_TIMEOUT,
+        ):
+            entry = cache.get(key)
+            if entry is None:
+                return
+            ranked = [item for item in entry["ranked"] if item[0] != comment_id]
+            is_cached = len(ranked) < len(entry["ranked"])
+            is_complete = entry["count"] <= len(entry["ranked"])
+            if not is_cached and is_complete:
+                # A comment the list missed
+                invalidate(episode_id)
+                return
+
+            ranked.append((comment_id, like_count))
+            ranked.sort(key=get_rank, reverse=True)
+            if not is_complete and is_cached and ranked[-1][0] == comment_id:
+                # May now rank behind the first comment that isn't cached
+                invalidate(episode_id)
+                return
+            entry["ranked"] = ranked[:TOP_COMMENTS_SIZE]
+            cache.set(key, entry, timeout=TOP_COMMENTS_TIMEOUT)
+    except RedisError:
+        # Including a lock not acquired in time
+        invalidate(episode_id)
+
+
+class TopComments:
+    """
+    Read-only sequence over an episode's top level comments by likes,
+    accepted by the paginators in place of a queryset (slicing and len).
+    `fallback` is the equivalent queryset, used for hydration and for pages
+    beyond the cached ids.
+    """
+
+    def __init__(self, episode_id: int, fallback: QuerySet):
+        self.episode_id = episode_id
+        self.fallback = fallback.order_by(*ORDERING)
+        self._entry = None
+
+    def as_queryset(self) -> QuerySet:
+        return self.fallback
+
+    def _get_entry(self) -> dict:
+        if self._entry is None:
+            self._entry = cache.get(get_cache_key(self.episode_id))
+        if self._entry is None:
+            # Ranked without the caller's annotations of the fallback
+            ranked = Comment.objects.filter(
+                episode_id=self.episode_id, parent=None
+            ).order_by(*ORDERING)
+            self._entry = {
+                # (id, like_count), the like counts re-rank in place
+                "ranked": list(
+                    ranked.values_list("id", "like_count")[:TOP_COMMENTS_SIZE]
+                ),
+                "count": ranked.count(),
+            }
+            cache.set(
+                get_cache_key(self.episode_id),
+                self._entry,
+                timeout=TOP_COMMENTS_TIMEOUT,
+            )
+        return self._entry
+
+    def __len__(self) -> int:
+        return self._get_entry()["count"]
+
+    def __getitem__(self, index: slice) -> List[Comment]:
+        entry = self._get_entry()
+        comment_ids = [comment_id for comment_id, _ in entry["ranked"]]
+        if index.stop > len(comment_ids) and entry["count"] > len(comment_ids):
+            return list(self.fallback[index])
+        comment_ids = comment_ids[index]
+        comments = self.fallback.order_by().in_bulk(comment_ids)
+        return [
+            comments[comment_id] for comment_id in comment_ids if comment_id in comments
+        ]
@@ -0,0 +1,57 @@
+import datetime
+
+from common.pagination import CursorPagination
+from django.test import TestCase
+from episode.factory import EpisodeFactory
+from episode.models import Episode
+from series.factory import SeriesFactory
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        series = SeriesFactory()
+        publish_date = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+        # Ties on publish_date, and unpublished episodes
+        self.episodes = EpisodeFactory.create_batch(
+            size=3, series=series, publish_date=publish_date
+        ) + EpisodeFactory.create_batch(
+            size=3,
+            series=series,
+            publish_date=publish_date + datetime.timedelta(days=1),
+        )
+        for episode in EpisodeFactory.create_batch(size=2, series=series):
+            episode.publish_date = None
+            episode.save()
+            self.episodes.append(episode)
+
+    def get_pages(self, ordering):
+        pagination = CursorPagination(ordering=ordering)
+        queryset = Episode.objects.order_by(*ordering)
+        pages = [list(queryset[:3])]
+        while True:
+            page = list(
+                queryset.filter(
+                    pagination.get_seek_filter(
+                        queryset, pagination.encode_cursor(pages[-1][-1])
+                    )
+                )[:3]
+            )
+            if not page:
+                return pages
+            pages.append(page)
+
+    def test_pages_follow_ordering(self):
+        for ordering in [("-publish_date", "-id"), ("publish_date", "id")]:
+            pages = self.get_pages(ordering)
+            self.assertEqual(
+                [episode for page in pages for episode in page],
+                list(Episode.objects.order_by(*ordering)),
+            )
+
+    def test_leading_bound(self):
+        # A range on the first column the index can seek to, besides the OR
+        pagination = CursorPagination(ordering=("-publish_date", "-id"))
+        queryset = Episode.objects.all()
+        cursor = pagination.encode_cursor(self.episodes[0])
+        sql = str(queryset.filter(pagination.get_seek_filter(queryset, cursor)).query)
+        self.assertIn('"episode_episode"."publish_date" <= ', sql)
@@ -0,0 +1,84 @@
+import time
+from unittest import mock
+
+from common import session
+from django.core.cache import cache
+from django.test import TestCase
+from firebase_admin.auth import RevokedSessionCookieError
+from moka_profile.factory import MokaProfileFactory
+
+COOKIE = "session-cookie"
+
+
+class SessionCacheTests(TestCase):
+    def setUp(self):
+        self.profile = MokaProfileFactory()
+        self.claims = {
+            "sub": self.profile.firebase_uid,
+            "exp": time.time() + 60 * 60,
+        }
+        session.local_sessions.clear()
+        cache.delete_many(
+            [
+                session.get_session_key(COOKIE),
+                session.get_logout_key(self.profile.firebase_uid),
+            ]
+        )
+        patcher = mock.patch(
+            "common.session.verify_session_cookie", return_value=self.claims
+        )
+        self.verify = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_verifies_once(self):
+        for _ in range(3):
+            self.assertEqual(session.get_session_profile(COOKIE), self.profile)
+        self.verify.assert_called_once_with(COOKIE, check_revoked=True)
+
+    def test_shared_across_processes(self):
+        session.get_session_profile(COOKIE)
+        session.local_sessions.clear()
+        session.get_session_profile(COOKIE)
+        self.verify.assert_called_once()
+
+    def test_rechecks_revocation_after_interval(self):
+        now = time.time()
+        session.verify_session(COOKIE, now=now)
+        session.verify_session(COOKIE, now=now + 1)
+        self.assertEqual(self.verify.call_count, 1)
+
+        with self.settings(SESSION_REVOCATION_CHECK_SECONDS=60):
+            session.verify_session(COOKIE, now=now + 61)
+        self.assertEqual(self.verify.call_count, 2)
+
+    def test_expired_cookie_is_verified(self):
+        now = time.time()
+        session.verify_session(COOKIE, now=now)
+        session.verify_session(COOKIE, now=self.claims["exp"])
+        self.assertEqual(self.verify.call_count, 2)
+
+    def test_logout_evicts(self):
+        session.get_session_profile(COOKIE)
+        session.logout(COOKIE, self.profile.firebase_uid)
+        self.assertIsNone(cache.get(session.get_session_key(COOKIE)))
+
+        self.verify.side_effect = RevokedSessionCookieError("revoked")
+        with self.assertRaises(RevokedSessionCookieError):
+            session.get_session_profile(COOKIE)
+
+    def test_logout_in_other_process(self):
+        session.get_session_profile(COOKIE)
+        # Another process only knows the user
+        session.logout(None, self.profile.firebase_uid)
+        session.local_sessions.clear()
+
+        session.get_session_profile(COOKIE)
+        self.assertEqual(self.verify.call_count, 2)
+
+    def test_local_cache_is_bounded(self):
+        local = session.LocalSessionCache(max_size=2, max_age=10)
+        for key in ["a", "b", "c"]:
+            local.set(key, {}, now=0)
+        self.assertIsNone(local.get("a", now=0))
+        self.assertEqual(local.get("c", now=0), {})
+        self.assertIsNone(local.get("c", now=10))
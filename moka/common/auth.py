@@ -1,8 +1,9 @@
 import json
 
 from common.logger import StructuredLogger
+from common.session import get_session_profile
 from django.http import HttpRequest
-from firebase_admin.auth import InvalidSessionCookieError, verify_session_cookie
+from firebase_admin.auth import InvalidSessionCookieError
 from google.auth.transport import requests
 from google.oauth2 import id_token
 from moka_profile.models import MokaProfile
@@ -64,11 +65,7 @@ class FirebaseAuthentication(APIKeyCookie):
         session_cookie = key
         if session_cookie is not None:
             try:
-                decoded_claims = verify_session_cookie(
-                    session_cookie, check_revoked=True
-                )
-                firebase_uid = decoded_claims["sub"]
-                return MokaProfile.objects.get(firebase_uid=firebase_uid)
+                return get_session_profile(session_cookie)
             except MokaProfile.DoesNotExist:
                 raise NoMatchingProfile
             except InvalidSessionCookieError:
@@ -84,11 +81,7 @@ class FirebaseOptionalAuthentication(APIKeyCookie):
         session_cookie = key
         if session_cookie is not None:
             try:
-                decoded_claims = verify_session_cookie(
-                    session_cookie, check_revoked=True
-                )
-                firebase_uid = decoded_claims["sub"]
-                return MokaProfile.objects.get(firebase_uid=firebase_uid)
+                return get_session_profile(session_cookie)
             except MokaProfile.DoesNotExist:
                 return 1
             except InvalidSessionCookieError:
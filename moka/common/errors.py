@@ -18,6 +18,10 @@ class FirebaseUserFacingError(Exception):
     pass
 
 
+class InvalidCursorError(Exception):
+    pass
+
+
 class ErrorResponse(Schema):
     message: str
 
@@ -0,0 +1,71 @@
+"""
+Fields of model instances changed since they were loaded or last saved, for
+post_save receivers that only act on some fields. Each tracker keeps its own
+copy of the values, so every receiver sees each change once.
+
+    tracker = FieldTracker("feed_index", {Episode: {"status", "publish_date"}})
+
+    @receiver(post_save, sender=Episode)
+    def sync_feed(sender, instance, created, update_fields, **kwargs):
+        if tracker.pop_changes(instance, created, update_fields):
+            ...
+"""
+from typing import Any, Dict, Iterable, Optional, Set, Type
+
+from django.db.models import Model
+from django.db.models.signals import post_init
+
+TRACKED_VALUES_ATTR = "_tracked_values"
+
+
+class FieldTracker:
+    def __init__(self, name: str, fields: Dict[Type[Model], Set[str]]):
+        """
+        `fields` are attribute names, e.g. "series_id" for a foreign key
+        """
+        self.name = name
+        self.fields = fields
+        for model in fields:
+            post_init.connect(
+                self.remember_values,
+                sender=model,
+                weak=False,
+                dispatch_uid=f"{name}_{model.__name__}",
+            )
+
+    def get_values(self, instance: Model) -> Dict[str, Any]:
+        # From __dict__, so that deferred fields aren't loaded
+        return {
+            field: instance.__dict__[field]
+            for field in self.fields[type(instance)]
+            if field in instance.__dict__
+        }
+
+    def remember_values(self, sender, instance: Model, **kwargs):
+        instance.__dict__.setdefault(TRACKED_VALUES_ATTR, {})[
+            self.name
+        ] = self.get_values(instance)
+
+    def pop_changes(
+        self,
+        instance: Model,
+        created: bool,
+        update_fields: Optional[Iterable[str]],
+    ) -> Dict[str, Any]:
+        """
+        Tracked fields changed by the save, with their previous values. None
+        for fields that weren't loaded, every field when created.
+        """
+        tracked = instance.__dict__.setdefault(TRACKED_VALUES_ATTR, {})
+        loaded = tracked.get(self.name, {})
+        tracked[self.name] = self.get_values(instance)
+        fields = set(self.fields[type(instance)])
+        if created:
+            return dict.fromkeys(fields)
+        if update_fields is not None:
+            fields &= {instance._meta.get_field(name).attname for name in update_fields}
+        return {
+            field: loaded.get(field)
+            for field in fields
+            if field not in loaded or instance.__dict__.get(field) != loaded[field]
+        }
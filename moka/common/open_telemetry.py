@@ -2,11 +2,14 @@ import os
 
 import environ
 from grpc import ssl_channel_credentials
-from opentelemetry import trace
+from opentelemetry import metrics, trace
+from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.instrumentation.django import DjangoInstrumentor
 from opentelemetry.instrumentation.psycopg2 import Psycopg2Instrumentor
 from opentelemetry.instrumentation.requests import RequestsInstrumentor
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
@@ -48,6 +51,23 @@ def otel_init():
     # register trace provider
     trace.set_tracer_provider(trace_provider)
 
+    # metrics, e.g. episode.service.view_counter, go to their own dataset
+    metric_exporter = OTLPMetricExporter(
+        endpoint="api.honeycomb.io:443",
+        insecure=False,
+        credentials=ssl_channel_credentials(),
+        headers=(
+            ("x-honeycomb-team", HONEYCOMB_API_KEY),
+            ("x-honeycomb-dataset", f"{HONEYCOMB_DATASET}-metrics"),
+        ),
+    )
+    metrics.set_meter_provider(
+        MeterProvider(
+            resource=resource,
+            metric_readers=[PeriodicExportingMetricReader(metric_exporter)],
+        )
+    )
+
     DjangoInstrumentor().instrument()
     Psycopg2Instrumentor().instrument()
     RequestsInstrumentor().instrument()
@@ -0,0 +1,182 @@
+import base64
+import binascii
+import datetime
+import json
+from typing import Any, Callable, List, Optional, Tuple
+
+from common.errors import InvalidCursorError
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+from ninja import Field, Schema
+from ninja.conf import settings
+from ninja.pagination import LimitOffsetPagination
+
+
+class BatchedLimitOffsetPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination that hands the whole page to `batch_resolver`
+    before the items are serialized, so schema resolvers can read values
+    loaded for the page at once instead of querying per item.
+
+    @paginate(BatchedLimitOffsetPagination, batch_resolver=FeedItemSchema.prefetch)
+    """
+
+    def __init__(
+        self,
+        *,
+        batch_resolver: Optional[Callable[[List[Any]], None]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self.batch_resolver = batch_resolver
+        super().__init__(**kwargs)
+
+    def paginate_queryset(
+        self,
+        queryset: QuerySet,
+        pagination: LimitOffsetPagination.Input,
+        **params: Any,
+    ) -> Any:
+        ret = super().paginate_queryset(queryset, pagination, **params)
+        items = list(ret["items"])
+        if self.batch_resolver is not None and items:
+            self.batch_resolver(items)
+        ret["items"] = items
+        return ret
+
+
+def encode_cursor_value(value: Any) -> Any:
+    # Keep full precision, the seek compares for equality
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+class CursorPagination(BatchedLimitOffsetPagination):
+    """
+    Keyset pagination. Each page returns `next_cursor`, an opaque token holding
+    the last row's values of `ordering`, and the next page seeks past it
+    (WHERE (publish_date, id) < (...)) instead of scanning and discarding
+    `offset` rows. The total count is only computed when asked for.
+
+    Requests without `cursor` are served as limit/offset with a count like
+    before, and also get a `next_cursor`, so clients can migrate page by page.
+
+    `ordering` must end with a unique field, e.g. ("-publish_date", "-id").
+    Sources that are not querysets provide `as_queryset()` for cursor pages.
+
+    @paginate(CursorPagination, ordering=("-created_at", "-id"))
+    """
+
+    class Input(Schema):
+        limit: int = Field(settings.PAGINATION_PER_PAGE, ge=1)
+        offset: Optional[int] = Field(None, ge=0)
+        cursor: Optional[str] = None
+        with_count: bool = False
+
+    class Output(Schema):
+        items: List[Any]
+        count: Optional[int]
+        next_cursor: Optional[str]
+
+    def __init__(self, *, ordering: Tuple[str, ...], **kwargs: Any) -> None:
+        self.ordering = ordering
+        super().__init__(**kwargs)
+
+    def paginate_queryset(
+        self,
+        queryset: QuerySet,
+        pagination: Input,
+        **params: Any,
+    ) -> Any:
+        limit = pagination.limit
+        if isinstance(queryset, QuerySet):
+            # Same order as the cursor pages, including the tie breaker
+            queryset = queryset.order_by(*self.ordering)
+        if pagination.cursor is None:
+            offset = pagination.offset or 0
+            items = list(queryset[offset : offset + limit + 1])
+            count = self._items_count(queryset)
+        else:
+            if not isinstance(queryset, QuerySet):
+                queryset = queryset.as_queryset()
+            items = list(
+                queryset.order_by(*self.ordering).filter(
+                    self.get_seek_filter(queryset, pagination.cursor)
+                )[: limit + 1]
+            )
+            count = self._items_count(queryset) if pagination.with_count else None
+
+        has_next = len(items) > limit
+        items = items[:limit]
+        if self.batch_resolver is not None and items:
+            self.batch_resolver(items)
+        return {
+            "items": items,
+            "count": count,
+            "next_cursor": self.encode_cursor(items[-1]) if has_next else None,
+        }
+
+    def get_field_names(self) -> List[str]:
+        return [field.lstrip("-") for field in self.ordering]
+
+    @staticmethod
+    def get_field(queryset: QuerySet, name: str) -> Any:
+        # Orderings may use annotations, e.g. ("-num_likes", "-id")
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def encode_cursor(self, item: Any) -> str:
+        values = [getattr(item, name) for name in self.get_field_names()]
+        payload = json.dumps(values, default=encode_cursor_value)
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("utf-8")
+
+    def decode_cursor(self, queryset: QuerySet, cursor: str) -> List[Any]:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode("utf-8")))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                None if value is None else field.to_python(value)
+                for field, value in zip(
+                    [self.get_field(queryset, name) for name in self.get_field_names()],
+                    values,
+                )
+            ]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            raise InvalidCursorError
+
+    def get_seek_filter(self, queryset: QuerySet, cursor: str) -> Q:
+        """
+        Rows after the cursor in `ordering`, expanded to
+        (a after or equal) AND ((a after) OR (a equal AND b after) OR ...)
+        The leading bound alone is a range the index on the ordering can
+        seek to, Postgres can't from the OR.
+        Postgres sorts NULLs first descending and last ascending.
+        """
+        values = self.decode_cursor(queryset, cursor)
+        leading = Q()
+        name, value = self.ordering[0].lstrip("-"), values[0]
+        if value is not None:
+            if self.ordering[0].startswith("-"):
+                leading = Q(**{f"{name}__lte": value})
+            else:
+                leading = Q(**{f"{name}__gte": value})
+                if self.get_field(queryset, name).null:
+                    leading |= Q(**{f"{name}__isnull": True})
+        seek = Q(pk__in=[])
+        equal_so_far = Q()
+        for order, value in zip(self.ordering, values):
+            name = order.lstrip("-")
+            descending = order.startswith("-")
+            if value is None:
+                after = Q(**{f"{name}__isnull": False}) if descending else Q(pk__in=[])
+                equal = Q(**{f"{name}__isnull": True})
+            else:
+                after = Q(**{f"{name}__lt" if descending else f"{name}__gt": value})
+                if not descending and self.get_field(queryset, name).null:
+                    after |= Q(**{f"{name}__isnull": True})
+                equal = Q(**{name: value})
+            seek |= equal_so_far & after
+            equal_so_far &= equal
+        return leading & seek
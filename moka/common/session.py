@@ -0,0 +1,155 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from firebase_admin.auth import InvalidSessionCookieError, verify_session_cookie
+from moka_profile.models import MokaProfile
+
+# Firebase session cookies live at most 14 days
+MAX_SESSION_SECONDS = 14 * 24 * 60 * 60
+
+
+def get_session_key(session_cookie: str) -> str:
+    digest = hashlib.sha256(session_cookie.encode()).hexdigest()
+    return f"session_{digest}"
+
+
+def get_logout_key(firebase_uid: str) -> str:
+    return f"session_logout_{firebase_uid}"
+
+
+class LocalSessionCache:
+    """
+    Per-process LRU of verified sessions. Entries are trusted for at most
+    max_age seconds before being read again from Redis, which bounds how
+    long a logout in another process goes unnoticed.
+    """
+
+    def __init__(self, max_size: int, max_age: float):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, now: float) -> Optional[dict]:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            cached_at, entry = cached
+            if now - cached_at >= self.max_age:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict, now: float):
+        with self._lock:
+            self._entries[key] = (now, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_sessions = LocalSessionCache(
+    max_size=settings.SESSION_LOCAL_CACHE_SIZE,
+    max_age=settings.SESSION_LOCAL_CACHE_SECONDS,
+)
+
+
+def is_fresh(entry: Optional[dict], now: float, logout_at: Optional[float]) -> bool:
+    if entry is None or entry["expires_at"] <= now:
+        return False
+    if logout_at is not None and entry["checked_at"] <= logout_at:
+        return False
+    return now - entry["checked_at"] < settings.SESSION_REVOCATION_CHECK_SECONDS
+
+
+def get_cached_session(key: str, now: float) -> Optional[dict]:
+    entry = local_sessions.get(key, now)
+    if entry is not None:
+        if is_fresh(entry, now, None):
+            return entry
+        local_sessions.delete(key)
+        return None
+
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    logout_at = cache.get(get_logout_key(entry["firebase_uid"]))
+    if not is_fresh(entry, now, logout_at):
+        return None
+    local_sessions.set(key, entry, now)
+    return entry
+
+
+def verify_session(session_cookie: str, now: Optional[float] = None) -> dict:
+    """
+    Returns the cached session entry of the cookie, verifying it with
+    Firebase (signature, expiry and revocation) when it is not cached or
+    was last checked more than SESSION_REVOCATION_CHECK_SECONDS ago.
+    Raises InvalidSessionCookieError and MokaProfile.DoesNotExist.
+    """
+    now = time.time() if now is None else now
+    key = get_session_key(session_cookie)
+    entry = get_cached_session(key, now)
+    if entry is not None:
+        return entry
+
+    try:
+        decoded_claims = verify_session_cookie(session_cookie, check_revoked=True)
+    except InvalidSessionCookieError:
+        evict_session(session_cookie)
+        raise
+    firebase_uid = decoded_claims["sub"]
+    entry = {
+        "profile_id": MokaProfile.objects.values_list("id", flat=True).get(
+            firebase_uid=firebase_uid
+        ),
+        "firebase_uid": firebase_uid,
+        "expires_at": decoded_claims["exp"],
+        "checked_at": now,
+    }
+    timeout = entry["expires_at"] - now
+    if timeout > 0:
+        cache.set(key, entry, timeout=timeout)
+        local_sessions.set(key, entry, now)
+    return entry
+
+
+def get_session_profile(session_cookie: str) -> MokaProfile:
+    entry = verify_session(session_cookie)
+    try:
+        return MokaProfile.objects.get(id=entry["profile_id"])
+    except MokaProfile.DoesNotExist:
+        evict_session(session_cookie)
+        raise
+
+
+def evict_session(session_cookie: str):
+    key = get_session_key(session_cookie)
+    local_sessions.delete(key)
+    cache.delete(key)
+
+
+def logout(session_cookie: Optional[str], firebase_uid: str):
+    """
+    Firebase revokes every session of the user on logout, so cached
+    sessions of the user in other processes or from other cookies are
+    invalidated as well. Processes notice within SESSION_LOCAL_CACHE_SECONDS.
+    """
+    if session_cookie is not None:
+        evict_session(session_cookie)
+    cache.set(get_logout_key(firebase_uid), time.time(), timeout=MAX_SESSION_SECONDS)
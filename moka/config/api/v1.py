@@ -11,6 +11,7 @@ from common.auth import (
 from common.errors import (
     ErrorResponse,
     FirebaseUserFacingError,
+    InvalidCursorError,
     MokaBackendGenericError,
     NotFoundError,
     UnauthorizedError,
@@ -114,6 +115,15 @@ def on_firebase_user_facing_error(request, exc):
     )
 
 
+@api_v1.exception_handler(InvalidCursorError)
+def on_invalid_cursor_error(request, exc):
+    return api_v1.create_response(
+        request,
+        ErrorResponse(message="Invalid pagination cursor"),
+        status=HTTPStatus.BAD_REQUEST,
+    )
+
+
 @api_v1.get(
     "/tags",
     response=List[str],
@@ -3,7 +3,9 @@ import os
 import environ
 from common.open_telemetry import otel_init
 
-accesslog = "-"
+# This config used to be passed only to enable opentelemetry, keep the
+# access log to that case
+accesslog = "-" if environ.Env().bool("OTEL_ENABLED", default=False) else None
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
@@ -14,6 +16,21 @@ def post_fork(server, worker):
     if SYSTEM_ENV == "dev":
         print("Skip initiating open_telemetry in dev")
         pass
+    elif not env.bool("OTEL_ENABLED", default=False):
+        print("Skip initiating open_telemetry, OTEL_ENABLED is not set")
     else:
         print("Initiating open_telemetry")
         otel_init()
+
+
+def post_worker_init(worker):
+    # Django is loaded from here on
+    from episode.service.view_counter import view_counter
+
+    view_counter.start_flusher()
+
+
+def worker_exit(server, worker):
+    from episode.service.view_counter import view_counter
+
+    view_counter.flush()
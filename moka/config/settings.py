@@ -176,6 +176,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "corsheaders",
     "taggit",
     # Mocha Jump apps
@@ -355,10 +356,48 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # https://django-taggit.readthedocs.io/en/latest/getting_started.html#getting-started
 TAGGIT_CASE_INSENSITIVE = True
 
+# Trending, see episode/service/scoring.py
+# Likes and views within the window, weighted, and halved every half-life since publish
+TREND_SCORE_LIKE_WEIGHT = env.float("TREND_SCORE_LIKE_WEIGHT", default=0.7)
+TREND_SCORE_VIEW_WEIGHT = env.float("TREND_SCORE_VIEW_WEIGHT", default=1.0)
+TREND_SCORE_HALF_LIFE_HOURS = env.float("TREND_SCORE_HALF_LIFE_HOURS", default=72.0)
+TREND_SCORE_WINDOW_DAYS = env.int("TREND_SCORE_WINDOW_DAYS", default=5)
+# Unique readers (episode/service/readers.py) instead of views
+TREND_SCORE_USE_UNIQUE_READERS = env.bool(
+    "TREND_SCORE_USE_UNIQUE_READERS", default=False
+)
+# Proxies in front of the app that append to X-Forwarded-For, the unique reader
+# address is the entry this far from the right. 1 for Cloud Run, 2 behind a load
+# balancer, 0 uses REMOTE_ADDR. Entries left of it are sent by clients.
+TRUSTED_PROXY_COUNT = env.int("TRUSTED_PROXY_COUNT", default=1)
+
+# Episode views, see episode/service/view_counter.py
+# Views are counted in process and flushed to Redis per interval or batch size
+EPISODE_VIEW_FLUSH_INTERVAL_MS = env.int("EPISODE_VIEW_FLUSH_INTERVAL_MS", default=1000)
+EPISODE_VIEW_FLUSH_SIZE = env.int("EPISODE_VIEW_FLUSH_SIZE", default=500)
+
+# Session cookies, see common/session.py
+# Verified cookies are cached, and revocation is checked with Firebase once per interval
+SESSION_REVOCATION_CHECK_SECONDS = env.int(
+    "SESSION_REVOCATION_CHECK_SECONDS", default=5 * 60
+)
+SESSION_LOCAL_CACHE_SIZE = env.int("SESSION_LOCAL_CACHE_SIZE", default=10000)
+SESSION_LOCAL_CACHE_SECONDS = env.int("SESSION_LOCAL_CACHE_SECONDS", default=10)
+
 # If you are using an endpoint defined with the API or dashboard, look in your webhook settings
 # at https://dashboard.stripe.com/webhooks
 STRIPE_API_KEY = env("STRIPE_API_KEY")
 STRIPE_ENDPOINT_SECRET = env("STRIPE_ENDPOINT_SECRET")
+# Webhook events are recorded and processed later, see money/service/webhook.py
+# Events processed concurrently per worker
+STRIPE_EVENT_WORKERS = env.int("STRIPE_EVENT_WORKERS", default=4)
+# Connect account states are refreshed from Stripe when older than this,
+# see money/service/connect_account.py
+STRIPE_ACCOUNT_MAX_STALENESS_MINUTES = env.int(
+    "STRIPE_ACCOUNT_MAX_STALENESS_MINUTES", default=60
+)
+# Wallets paid out concurrently, see money/service/payout.py
+PAYOUT_MAX_WORKERS = env.int("PAYOUT_MAX_WORKERS", default=8)
 
 # Static files (CSS, JavaScript, Images)
 # [START cloudrun_django_static_config]
@@ -2,6 +2,8 @@ import datetime
 from unittest import mock
 
 import django.test
+from discovery.service import feed_index
+from django.core.cache import cache
 from django.test import Client
 from episode.factory import EpisodeFactory
 from episode.models import Episode
@@ -21,6 +23,9 @@ class TestNewFeed(django.test.TestCase):
         self.mock_signed_cookie.start()
         self.addCleanup(self.mock_signed_cookie.stop)
 
+        # Serve from the DB, see test_feed_index for the indexed path
+        cache.delete(feed_index.NEW_FEED_CACHE_KEY)
+
     def test_success(self):
         tags = ["sci-fi", "adventure", "comedy"]
         series = SeriesFactory(status=Series.SeriesStatus.PUBLIC, tags=tags)
@@ -109,3 +114,82 @@ class TestNewFeed(django.test.TestCase):
         )
         response = self.client.get("/v1/discovery/new?limit=5&offset=3").json()
         self.assertEqual(len(response["items"]), 5)
+
+    def test_page_query_count_is_constant(self):
+        profiles = MokaProfileFactory.create_batch(3)
+        for _ in range(4):
+            series = SeriesFactory(
+                status=Series.SeriesStatus.PUBLIC, tags=["sci-fi", "comedy"]
+            )
+            EpisodeFactory.create_batch(
+                size=5,
+                series=series,
+                status=Episode.EpisodeStatus.PUBLIC,
+                likes=[profile.id for profile in profiles],
+            )
+
+        # count, page, tags prefetch
+        with self.assertNumQueries(3):
+            response = self.client.get("/v1/discovery/new?limit=5").json()
+        self.assertEqual(len(response["items"]), 5)
+
+        with self.assertNumQueries(3):
+            response = self.client.get("/v1/discovery/new?limit=20").json()
+        self.assertEqual(len(response["items"]), 20)
+        for item in response["items"]:
+            self.assertEqual(item["likes"], 3)
+            self.assertSetEqual(set(item["tags"]), {"sci-fi", "comedy"})
+
+    def test_cursor_pagination(self):
+        series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        publish_date = datetime.datetime.now().replace(
+            tzinfo=datetime.timezone.utc
+        ) - datetime.timedelta(hours=1)
+        # Ties on publish_date are broken by id
+        episodes = EpisodeFactory.create_batch(
+            size=6,
+            series=series,
+            status=Episode.EpisodeStatus.PUBLIC,
+            publish_date=publish_date,
+        ) + EpisodeFactory.create_batch(
+            size=6,
+            series=series,
+            status=Episode.EpisodeStatus.PUBLIC,
+        )
+        expected_ids = [
+            str(episode.id)
+            for episode in sorted(
+                episodes, key=lambda e: (e.publish_date, e.id), reverse=True
+            )
+        ]
+
+        response = self.client.get("/v1/discovery/new?limit=5").json()
+        self.assertEqual(response["count"], 12)
+        episode_ids = [item["episode_id"] for item in response["items"]]
+        cursor = response["next_cursor"]
+        while cursor is not None:
+            # page and tags prefetch, without count
+            with self.assertNumQueries(2):
+                response = self.client.get(
+                    f"/v1/discovery/new?limit=5&cursor={cursor}"
+                ).json()
+            self.assertIsNone(response["count"])
+            episode_ids += [item["episode_id"] for item in response["items"]]
+            cursor = response["next_cursor"]
+        self.assertEqual(episode_ids, expected_ids)
+
+    def test_cursor_with_count(self):
+        series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        EpisodeFactory.create_batch(
+            size=3, series=series, status=Episode.EpisodeStatus.PUBLIC
+        )
+        cursor = self.client.get("/v1/discovery/new?limit=1").json()["next_cursor"]
+        response = self.client.get(
+            f"/v1/discovery/new?limit=1&with_count=true&cursor={cursor}"
+        ).json()
+        self.assertEqual(response["count"], 3)
+        self.assertEqual(len(response["items"]), 1)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/v1/discovery/new?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 400)
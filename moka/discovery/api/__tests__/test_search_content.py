@@ -0,0 +1,83 @@
+from unittest import mock
+
+import django.test
+from django.test import Client
+from episode.factory import EpisodeFactory
+from episode.models import Episode
+from image.models import Thumbnail
+from moka_profile.factory import MokaProfileFactory
+from series.factory import SeriesFactory
+from series.models import Series
+
+
+class TestSearchContent(django.test.TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        self.mock_signed_cookie = mock.patch.object(
+            Thumbnail, "signed_cookie", return_value="test_signed_cookie"
+        )
+        self.mock_signed_cookie.start()
+        self.addCleanup(self.mock_signed_cookie.stop)
+
+        # Search documents are refreshed on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.owner = MokaProfileFactory(display_name="Painter")
+            self.series = SeriesFactory(
+                owner=self.owner,
+                title="Moonlight",
+                status=Series.SeriesStatus.PUBLIC,
+                tags=["adventure", "comedy"],
+            )
+            self.episode = EpisodeFactory(
+                series=self.series,
+                title="Harbor",
+                status=Episode.EpisodeStatus.PUBLIC,
+            )
+            EpisodeFactory(
+                series=SeriesFactory(title="Other", status=Series.SeriesStatus.PUBLIC),
+                title="Unrelated",
+                status=Episode.EpisodeStatus.PUBLIC,
+            )
+
+    def search(self, q):
+        response = self.client.get("/v1/discovery/search/content", {"q": q}).json()
+        return [int(item["episode_id"]) for item in response["items"]]
+
+    def test_matches_every_field(self):
+        for q in ["harbor", "moonlight", "painter", "comedy"]:
+            self.assertEqual(self.search(q), [self.episode.id], q)
+
+    def test_matches_substring(self):
+        self.assertEqual(self.search("adven"), [self.episode.id])
+
+    def test_no_duplicates_across_tags(self):
+        # Both tags contain "o", the old tag join returned a row per tag
+        self.assertEqual(self.search("o").count(self.episode.id), 1)
+
+    def test_hidden_episodes_are_not_found(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.series.is_banned = True
+            self.series.save()
+        self.assertEqual(self.search("harbor"), [])
+
+    def test_ranked_by_relevance_and_trend(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            popular = EpisodeFactory(
+                series=self.series,
+                title="Sequel",
+                status=Episode.EpisodeStatus.PUBLIC,
+                trend_score=100,
+            )
+        # Same series words, title breaks the tie on its own
+        self.assertEqual(self.search("harbor"), [self.episode.id])
+        self.assertEqual(self.search("moonlight"), [popular.id, self.episode.id])
+
+    def test_document_follows_edits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.series.tags.add("horror")
+            self.owner.display_name = "Sculptor"
+            self.owner.save()
+        self.assertEqual(self.search("horror"), [self.episode.id])
+        self.assertEqual(self.search("sculptor"), [self.episode.id])
+        self.assertEqual(self.search("painter"), [])
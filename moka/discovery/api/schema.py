@@ -1,10 +1,12 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from common.logger import StructuredLogger
 from common.schema_utils import datetime_encoder
 from episode.models import Episode
+from image.models import Image
 from ninja import Schema
+from series.models import Series
 
 logger = StructuredLogger(__name__)
 
@@ -33,6 +35,17 @@ class FeedItemSchema(Schema):
     class Config(Schema.Config):
         json_encorders = {datetime: datetime_encoder}
 
+    @staticmethod
+    def prefetch(episodes: List[Episode]):
+        """
+        Batch resolve a page of feed items so that the per-item resolvers
+        below read precomputed values instead of querying once per row.
+        Episodes are expected to have `thumbnail` and `series__owner` selected.
+        """
+        Episode.prefetch_buffer_views(episodes)
+        Series.prefetch_tags([episode.series for episode in episodes])
+        Image.prefetch_signed_cookies([episode.thumbnail for episode in episodes])
+
     def resolve_thumbnail_url(self, obj: Episode):
         try:
             if obj.thumbnail:
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DiscoveryConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "discovery"
+
+    def ready(self):
+        # pylint: disable=import-outside-toplevel
+        import moka.discovery.signals.handlers  # noqa: F401
@@ -0,0 +1,133 @@
+import random
+import statistics
+import time
+
+from discovery.service import search
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from episode.models import Episode
+from moka_profile.models import MokaProfile
+from series.models import Series
+
+SYLLABLES = ["ka", "ro", "mi", "tsu", "ne", "ha", "shi", "yo", "ri", "an", "de", "lu"]
+
+
+def make_vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def legacy_search(q):
+    # search_content before the search documents
+    return (
+        Episode.objects.select_related("thumbnail", "series__owner")
+        .filter(
+            Q(title__icontains=q)
+            | Q(series__title__icontains=q)
+            | Q(series__owner__display_name__icontains=q)
+            | Q(series__tags__name__icontains=q)
+            & Q(
+                status__in=[
+                    Episode.EpisodeStatus.PUBLIC,
+                    Episode.EpisodeStatus.PRE_RELEASE,
+                ]
+            )
+            & Q(series__status__exact=Series.SeriesStatus.PUBLIC)
+            & Q(is_banned=False)
+            & Q(series__is_banned=False)
+            & Q(series__owner__is_banned=False)
+        )
+        .distinct()
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare search_content latency of the icontains query against the "
+        "search documents on seeded data. Seeded rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--series", type=int, default=2000)
+        parser.add_argument("--episodes-per-series", type=int, default=25)
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--words", type=int, default=3000)
+        parser.add_argument("--tags", type=int, default=200)
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def seed(self, num_series, episodes_per_series, words, tags, rng):
+        profiles = MokaProfile.objects.bulk_create(
+            [
+                MokaProfile(firebase_uid=f"bench-{i}", display_name=f"artist {i}")
+                for i in range(num_series // 10 + 1)
+            ]
+        )
+        series_list = Series.objects.bulk_create(
+            [
+                Series(
+                    owner=rng.choice(profiles),
+                    title=" ".join(rng.sample(words, 2)),
+                    status=Series.SeriesStatus.PUBLIC,
+                )
+                for _ in range(num_series)
+            ]
+        )
+        for series in series_list:
+            series.tags.add(*rng.sample(tags, 3))
+        Episode.objects.bulk_create(
+            [
+                Episode(
+                    series=series,
+                    title=" ".join(rng.sample(words, 2)),
+                    status=Episode.EpisodeStatus.PUBLIC,
+                    episode_number=number,
+                    trend_score=rng.random() * 100,
+                )
+                for series in series_list
+                for number in range(episodes_per_series)
+            ]
+        )
+        search.refresh_series([series.id for series in series_list])
+        with connection.cursor() as cursor:
+            for model in [MokaProfile, Series, Episode]:
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+    def time_queries(self, get_queryset, queries, page_size):
+        latencies = []
+        for q in queries:
+            start = time.perf_counter()
+            queryset = get_queryset(q)
+            queryset.count()
+            list(queryset[:page_size])
+            latencies.append((time.perf_counter() - start) * 1000)
+        return statistics.median(latencies), max(latencies)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        words = make_vocabulary(rng, options["words"] + options["tags"])
+        tags, words = words[: options["tags"]], words[options["tags"] :]
+        # Whole words, tags, creators and word prefixes
+        queries = [
+            rng.choice([rng.choice(words), rng.choice(tags), rng.choice(words)[:4]])
+            for _ in range(options["queries"])
+        ] + ["artist 12"]
+
+        with transaction.atomic():
+            self.seed(
+                options["series"], options["episodes_per_series"], words, tags, rng
+            )
+            for name, get_queryset in [
+                ("icontains", legacy_search),
+                ("search document", search.search_episodes),
+            ]:
+                median, worst = self.time_queries(
+                    get_queryset, queries, options["page_size"]
+                )
+                self.stdout.write(
+                    f"{name:>16}: median {median:.1f} ms, max {worst:.1f} ms"
+                )
+            transaction.set_rollback(True)
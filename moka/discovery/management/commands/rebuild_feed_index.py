@@ -0,0 +1,10 @@
+from discovery.service import feed_index
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Redis trending and new feed indexes from Postgres"
+
+    def handle(self, *args, **options):
+        num_episodes = feed_index.rebuild()
+        self.stdout.write(f"Indexed {num_episodes} episodes")
@@ -0,0 +1,17 @@
+from discovery.service import search
+from django.core.management.base import BaseCommand
+from series.models import Series
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search documents of all series and episodes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        series_ids = list(Series.objects.order_by("id").values_list("id", flat=True))
+        for start in range(0, len(series_ids), chunk_size):
+            search.refresh_series(series_ids[start : start + chunk_size])
+        self.stdout.write(f"Refreshed {len(series_ids)} series")
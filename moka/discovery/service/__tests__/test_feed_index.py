@@ -0,0 +1,196 @@
+import datetime
+from unittest import mock
+
+import django.test
+from discovery.service import feed_index
+from django.core.cache import cache
+from django.test import Client
+from django_redis import get_redis_connection
+from episode.factory import EpisodeFactory
+from episode.models import Episode
+from image.models import Thumbnail
+from redis.exceptions import ConnectionError
+from series.factory import SeriesFactory
+from series.models import Series
+
+
+class TestFeedIndex(django.test.TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        self.mock_signed_cookie = mock.patch.object(
+            Thumbnail, "signed_cookie", return_value="test_signed_cookie"
+        )
+        self.mock_signed_cookie.start()
+        self.addCleanup(self.mock_signed_cookie.stop)
+
+        cache.delete_many(
+            [feed_index.NEW_FEED_CACHE_KEY, feed_index.TRENDING_FEED_CACHE_KEY]
+        )
+        self.series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        now = datetime.datetime.now().replace(tzinfo=datetime.timezone.utc)
+        self.episodes = [
+            EpisodeFactory(
+                series=self.series,
+                status=Episode.EpisodeStatus.PUBLIC,
+                publish_date=now - datetime.timedelta(hours=i + 1),
+                trend_score=i,
+            )
+            for i in range(5)
+        ]
+        EpisodeFactory(series=self.series, status=Episode.EpisodeStatus.DRAFT)
+
+    def get_feed_ids(self, path):
+        response = self.client.get(path).json()
+        return response["count"], [
+            int(item["episode_id"]) for item in response["items"]
+        ]
+
+    def test_rebuild(self):
+        self.assertEqual(feed_index.rebuild(), 5)
+
+        count, episode_ids = self.get_feed_ids("/v1/discovery/new?limit=2&offset=1")
+        self.assertEqual(count, 5)
+        self.assertEqual(episode_ids, [self.episodes[1].id, self.episodes[2].id])
+
+        count, episode_ids = self.get_feed_ids("/v1/discovery/trending?limit=2")
+        self.assertEqual(count, 5)
+        self.assertEqual(episode_ids, [self.episodes[4].id, self.episodes[3].id])
+
+    def test_pages_are_read_from_index(self):
+        feed_index.rebuild()
+        get_redis_connection("default").zadd(
+            cache.make_key(feed_index.NEW_FEED_CACHE_KEY),
+            {feed_index.get_member(999999999): 1e18},
+        )
+
+        count, episode_ids = self.get_feed_ids("/v1/discovery/new?limit=1")
+        # Count comes from the index, stale ids are dropped when hydrating
+        self.assertEqual(count, 6)
+        self.assertEqual(episode_ids, [self.episodes[0].id])
+
+    def test_cursor_pages_continue_index_pages(self):
+        publish_date = self.episodes[0].publish_date + datetime.timedelta(hours=1)
+        # Ties across digit counts, ordered numerically
+        tied_ids = [9_999_999, 10_000_000, 10_000_001]
+        for episode_id in tied_ids:
+            episode = EpisodeFactory(
+                series=self.series,
+                status=Episode.EpisodeStatus.PUBLIC,
+                publish_date=publish_date,
+            )
+            Episode.objects.filter(id=episode.id).update(id=episode_id)
+        tied = list(Episode.objects.filter(id__in=tied_ids))
+        undated = EpisodeFactory(
+            series=self.series, status=Episode.EpisodeStatus.PUBLIC
+        )
+        undated.publish_date = None
+        undated.save()
+        feed_index.rebuild()
+        expected_ids = [
+            episode.id
+            for episode in sorted(
+                self.episodes + tied,
+                key=lambda episode: (episode.publish_date, episode.id),
+                reverse=True,
+            )
+        ]
+
+        # Offset pages from the index
+        count, episode_ids = self.get_feed_ids("/v1/discovery/new?limit=20")
+        self.assertEqual(count, 8)
+        self.assertEqual(episode_ids, expected_ids)
+
+        # The first page from the index, the rest seek in Postgres
+        response = self.client.get("/v1/discovery/new?limit=2").json()
+        episode_ids = [int(item["episode_id"]) for item in response["items"]]
+        while response["next_cursor"] is not None:
+            response = self.client.get(
+                f"/v1/discovery/new?limit=2&cursor={response['next_cursor']}"
+            ).json()
+            episode_ids += [int(item["episode_id"]) for item in response["items"]]
+        self.assertEqual(episode_ids, expected_ids)
+
+        # Without the index
+        cache.delete(feed_index.NEW_FEED_CACHE_KEY)
+        count, episode_ids = self.get_feed_ids("/v1/discovery/new?limit=20")
+        self.assertEqual(count, 8)
+        self.assertEqual(episode_ids, expected_ids)
+
+    def test_signals_keep_index_in_sync(self):
+        feed_index.rebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_episode = EpisodeFactory(
+                series=self.series,
+                status=Episode.EpisodeStatus.PUBLIC,
+                publish_date=datetime.datetime.now().replace(
+                    tzinfo=datetime.timezone.utc
+                ),
+            )
+        _, episode_ids = self.get_feed_ids("/v1/discovery/new?limit=1")
+        self.assertEqual(episode_ids, [new_episode.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.series.is_banned = True
+            self.series.save()
+        redis = get_redis_connection("default")
+        self.assertEqual(redis.zcard(cache.make_key(feed_index.NEW_FEED_CACHE_KEY)), 0)
+        self.assertEqual(
+            redis.zcard(cache.make_key(feed_index.TRENDING_FEED_CACHE_KEY)), 0
+        )
+
+    # The module the app config connected
+    @mock.patch("moka.discovery.signals.handlers.search")
+    @mock.patch("moka.discovery.signals.handlers.feed_index")
+    def test_signals_skip_saves_of_unindexed_fields(self, mock_feed_index, mock_search):
+        episode = Episode.objects.get(id=self.episodes[0].id)
+        owner = self.series.owner
+        with self.captureOnCommitCallbacks(execute=True):
+            episode.views += 1
+            episode.save()
+            episode.likes_count += 1
+            episode.save(update_fields=["likes_count"])
+            owner.photo_url = "https://example.com/photo.png"
+            owner.save()
+            # Unchanged value
+            self.series.save(update_fields=["status"])
+        mock_feed_index.sync_episodes.assert_not_called()
+        mock_search.refresh_series.assert_not_called()
+        mock_search.refresh_episodes.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            owner.is_banned = True
+            owner.save()
+        mock_feed_index.sync_episodes.assert_called_once()
+        mock_search.refresh_series.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            episode.title = "renamed"
+            episode.save(update_fields=["title"])
+        mock_search.refresh_episodes.assert_called_once_with([episode.id])
+        mock_feed_index.sync_episodes.assert_called_once()
+
+    def test_signals_do_not_create_partial_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            EpisodeFactory(series=self.series, status=Episode.EpisodeStatus.PUBLIC)
+        self.assertFalse(
+            get_redis_connection("default").exists(
+                cache.make_key(feed_index.NEW_FEED_CACHE_KEY)
+            )
+        )
+
+    def test_falls_back_to_db_without_index(self):
+        count, episode_ids = self.get_feed_ids("/v1/discovery/new?limit=2")
+        self.assertEqual(count, 5)
+        self.assertEqual(episode_ids, [self.episodes[0].id, self.episodes[1].id])
+
+    def test_falls_back_to_db_when_redis_is_down(self):
+        feed_index.rebuild()
+        with mock.patch(
+            "discovery.service.feed_index.get_redis_connection",
+            side_effect=ConnectionError,
+        ):
+            count, episode_ids = self.get_feed_ids("/v1/discovery/trending?limit=2")
+        self.assertEqual(count, 5)
+        self.assertEqual(episode_ids, [self.episodes[4].id, self.episodes[3].id])
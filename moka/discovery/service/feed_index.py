@@ -0,0 +1,268 @@
+"""
+Redis sorted sets of visible episode ids backing the trending and new feeds.
+
+Pages are read with ZREVRANGE and hydrated with a single id__in query instead
+of running the feed join with ORDER BY/OFFSET per request. Pages follow the
+same order as the queryset, so cursor pages can continue in Postgres where
+the index left off: members are zero padded ids, which ZREVRANGE sorts
+descending on equal scores like the "-id" tie breaker. The sets are kept
+in sync by the trend job (trending), the publish job and model signals
+(discovery.signals.handlers), and can be rebuilt with `rebuild_feed_index`.
+Whenever Redis is unavailable or a set was never built, feeds are served from
+Postgres.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from common.logger import StructuredLogger
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.utils import timezone
+from django_redis import get_redis_connection
+from episode.models import Episode
+from redis.exceptions import RedisError
+from series.models import Series
+
+logger = StructuredLogger(__name__)
+
+# Renamed with the member and score encoding, run `rebuild_feed_index`
+TRENDING_FEED_CACHE_KEY = "discovery_trending_feed_by_id"
+NEW_FEED_CACHE_KEY = "discovery_new_feed_by_id"
+TRENDING_MAX_AGE = timedelta(days=200)
+WRITE_CHUNK_SIZE = 1000
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def get_visible_episodes() -> QuerySet:
+    return Episode.objects.select_related("thumbnail", "series__owner",).filter(
+        status__in=[
+            Episode.EpisodeStatus.PUBLIC,
+            Episode.EpisodeStatus.PRE_RELEASE,
+        ],
+        series__status=Series.SeriesStatus.PUBLIC,
+        is_banned=False,
+        series__is_banned=False,
+        series__owner__is_banned=False,
+    )
+
+
+def get_new_feed_queryset() -> QuerySet:
+    # Episodes published before publish_date existed are left out, Postgres
+    # sorts NULLs first descending and the cursor seeks past them
+    return (
+        get_visible_episodes()
+        .filter(publish_date__isnull=False)
+        .order_by("-publish_date", "-id")
+    )
+
+
+def get_trending_feed_queryset(now: Optional[datetime] = None) -> QuerySet:
+    now = now or timezone.now()
+    return (
+        get_visible_episodes()
+        .filter(publish_date__gt=now - TRENDING_MAX_AGE)
+        .order_by("-trend_score", "-id")
+    )
+
+
+def get_member(episode_id: int) -> str:
+    # Ids up to 20 digits, bigint included
+    return f"{episode_id:020d}"
+
+
+def get_publish_score(publish_date: datetime) -> int:
+    # Microseconds, distinct dates never share a score and stay exact in a
+    # double until the year 2255
+    return (publish_date - EPOCH) // timedelta(microseconds=1)
+
+
+class IndexedFeed:
+    """
+    Read-only sequence over a feed sorted set, accepted by the paginators in
+    place of a queryset (slicing and len). `fallback` is the equivalent
+    queryset, used for hydration and whenever the index can't be used.
+    """
+
+    def __init__(self, cache_key: str, fallback: QuerySet):
+        self.key = cache.make_key(cache_key)
+        self.fallback = fallback
+        self._size = None
+
+    def as_queryset(self) -> QuerySet:
+        """
+        Cursor pages seek in Postgres, see common.pagination.CursorPagination
+        """
+        return self.fallback
+
+    def _get_size(self) -> int:
+        """
+        Size of the index, 0 when it can't be used
+        """
+        if self._size is None:
+            try:
+                self._size = get_redis_connection("default").zcard(self.key)
+            except RedisError:
+                logger.exception(
+                    event_name="FEED_INDEX_READ_ERROR", msg="Serving feed from DB"
+                )
+                self._size = 0
+        return self._size
+
+    def __len__(self) -> int:
+        size = self._get_size()
+        return size if size else self.fallback.count()
+
+    def __getitem__(self, index: slice) -> List[Episode]:
+        if not self._get_size():
+            return list(self.fallback[index])
+        try:
+            episode_ids = [
+                int(episode_id)
+                for episode_id in get_redis_connection("default").zrevrange(
+                    self.key, index.start or 0, index.stop - 1
+                )
+            ]
+        except RedisError:
+            logger.exception(
+                event_name="FEED_INDEX_READ_ERROR", msg="Serving feed from DB"
+            )
+            return list(self.fallback[index])
+
+        # Filtering again drops episodes hidden since they were indexed
+        episodes = self.fallback.order_by().in_bulk(episode_ids)
+        return [
+            episodes[episode_id] for episode_id in episode_ids if episode_id in episodes
+        ]
+
+
+def write_index(redis, key: str, scores: dict):
+    """
+    Replaces the sorted set at once, readers never see a partial set
+    """
+    tmp_key = f"{key}:rebuild"
+    pipe = redis.pipeline(transaction=False)
+    pipe.delete(tmp_key)
+    items = [(get_member(episode_id), score) for episode_id, score in scores.items()]
+    for start in range(0, len(items), WRITE_CHUNK_SIZE):
+        pipe.zadd(tmp_key, dict(items[start : start + WRITE_CHUNK_SIZE]))
+    if items:
+        pipe.rename(tmp_key, key)
+    else:
+        pipe.delete(key)
+    pipe.execute()
+
+
+def replace_trending(episode_ids: Iterable[int], trend_scores: Iterable[float]):
+    """
+    Called by the trend job with every trending candidate and its score
+    """
+    try:
+        write_index(
+            get_redis_connection("default"),
+            cache.make_key(TRENDING_FEED_CACHE_KEY),
+            {
+                int(episode_id): float(score)
+                for episode_id, score in zip(episode_ids, trend_scores)
+            },
+        )
+    except RedisError:
+        logger.exception(
+            event_name="FEED_INDEX_WRITE_ERROR", msg="Failed to replace trending feed"
+        )
+
+
+def rebuild():
+    """
+    Rebuilds both feeds from Postgres. Returns the number of indexed episodes
+    """
+    now = timezone.now()
+    redis = get_redis_connection("default")
+    rows = list(get_visible_episodes().values_list("id", "publish_date", "trend_score"))
+    write_index(
+        redis,
+        cache.make_key(NEW_FEED_CACHE_KEY),
+        {
+            episode_id: get_publish_score(publish_date)
+            for episode_id, publish_date, _ in rows
+            if publish_date is not None
+        },
+    )
+    write_index(
+        redis,
+        cache.make_key(TRENDING_FEED_CACHE_KEY),
+        {
+            episode_id: trend_score
+            for episode_id, publish_date, trend_score in rows
+            if publish_date is not None and publish_date > now - TRENDING_MAX_AGE
+        },
+    )
+    return len(rows)
+
+
+def sync_episodes(episodes: QuerySet):
+    """
+    Adds or removes the given episodes according to their current visibility
+    """
+    now = timezone.now()
+    episode_ids = set(episodes.values_list("id", flat=True))
+    if not episode_ids:
+        return
+    visible_rows = list(
+        get_visible_episodes()
+        .filter(id__in=episode_ids)
+        .values_list("id", "publish_date", "trend_score")
+    )
+    new_feed = {}
+    trending = {}
+    for episode_id, publish_date, trend_score in visible_rows:
+        if publish_date is None:
+            continue
+        new_feed[episode_id] = get_publish_score(publish_date)
+        if publish_date > now - TRENDING_MAX_AGE:
+            trending[episode_id] = trend_score
+
+    try:
+        redis = get_redis_connection("default")
+        pipe = redis.pipeline(transaction=False)
+        for cache_key, scores in [
+            (NEW_FEED_CACHE_KEY, new_feed),
+            (TRENDING_FEED_CACHE_KEY, trending),
+        ]:
+            key = cache.make_key(cache_key)
+            # Adding to a set that was never built would serve a partial feed,
+            # leave it to the rebuild
+            if scores and redis.exists(key):
+                pipe.zadd(
+                    key,
+                    {
+                        get_member(episode_id): score
+                        for episode_id, score in scores.items()
+                    },
+                )
+            removed_ids = episode_ids - scores.keys()
+            if removed_ids:
+                pipe.zrem(key, *map(get_member, removed_ids))
+        pipe.execute()
+    except RedisError:
+        logger.exception(
+            event_name="FEED_INDEX_WRITE_ERROR",
+            msg="Failed to sync episodes",
+            episode_ids=list(episode_ids),
+        )
+
+
+def remove_episodes(episode_ids: List[int]):
+    if not episode_ids:
+        return
+    try:
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+        members = [get_member(episode_id) for episode_id in episode_ids]
+        pipe.zrem(cache.make_key(NEW_FEED_CACHE_KEY), *members)
+        pipe.zrem(cache.make_key(TRENDING_FEED_CACHE_KEY), *members)
+        pipe.execute()
+    except RedisError:
+        logger.exception(
+            event_name="FEED_INDEX_WRITE_ERROR",
+            msg="Failed to remove episodes",
+            episode_ids=episode_ids,
+        )
@@ -0,0 +1,129 @@
+"""
+Full-text and trigram search over episodes and series.
+
+Each Episode and Series row keeps a search document: a weighted tsvector of
+episode title, series title, creator name and tags (GIN indexed), and the
+same words as lowercase plain text with a trigram GIN index so substring
+matches keep working. The text is lowercased up front because icontains
+compiles to UPPER(...) LIKE, which the trigram index can't serve.
+Documents are refreshed from discovery.signals.handlers and can be rebuilt
+with `refresh_search_documents`.
+"""
+from typing import Iterable
+
+from discovery.service import feed_index
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db.models import F, Q, QuerySet, TextField, Value
+from django.db.models.functions import Concat, Greatest, Ln, Lower
+from episode.models import Episode
+from series.models import Series
+
+# Titles and names are not in one language, don't stem
+SEARCH_CONFIG = "simple"
+
+# How much popularity counts next to relevance:
+# score = relevance * (1 + TREND_SCORE_WEIGHT * ln(1 + trend_score))
+TREND_SCORE_WEIGHT = 0.2
+
+
+def get_series_search_parts(series: Series):
+    """
+    Words an episode inherits from its series
+    """
+    tags = " ".join(series.get_tags())
+    owner_name = series.owner.display_name or ""
+    vector = (
+        SearchVector(
+            Value(series.title, output_field=TextField()),
+            weight="A",
+            config=SEARCH_CONFIG,
+        )
+        + SearchVector(
+            Value(owner_name, output_field=TextField()),
+            weight="B",
+            config=SEARCH_CONFIG,
+        )
+        + SearchVector(
+            Value(tags, output_field=TextField()), weight="C", config=SEARCH_CONFIG
+        )
+    )
+    return vector, " ".join([series.title, owner_name, tags]).lower()
+
+
+def refresh_series(series_ids: Iterable[int]):
+    """
+    Refreshes the documents of the given series and all of their episodes
+    """
+    for series in (
+        Series.objects.select_related("owner")
+        .prefetch_related("tags")
+        .filter(id__in=series_ids)
+    ):
+        vector, text = get_series_search_parts(series)
+        Series.objects.filter(id=series.id).update(
+            search_document=vector, search_text=text
+        )
+        Episode.objects.filter(series=series).update(
+            search_document=SearchVector("title", weight="A", config=SEARCH_CONFIG)
+            + vector,
+            search_text=Lower(
+                Concat("title", Value(" " + text), output_field=TextField())
+            ),
+        )
+
+
+def refresh_episodes(episode_ids: Iterable[int]):
+    series_ids = set(
+        Episode.objects.filter(id__in=episode_ids).values_list("series_id", flat=True)
+    )
+    for series in (
+        Series.objects.select_related("owner")
+        .prefetch_related("tags")
+        .filter(id__in=series_ids)
+    ):
+        vector, text = get_series_search_parts(series)
+        Episode.objects.filter(id__in=episode_ids, series=series).update(
+            search_document=SearchVector("title", weight="A", config=SEARCH_CONFIG)
+            + vector,
+            search_text=Lower(
+                Concat("title", Value(" " + text), output_field=TextField())
+            ),
+        )
+
+
+def get_search_filter(q: str) -> Q:
+    return Q(
+        search_document=SearchQuery(q, search_type="websearch", config=SEARCH_CONFIG)
+    ) | Q(search_text__contains=q.lower())
+
+
+def get_relevance(q: str):
+    return SearchRank(
+        F("search_document"),
+        SearchQuery(q, search_type="websearch", config=SEARCH_CONFIG),
+    ) + TrigramSimilarity("search_text", q.lower())
+
+
+def search_episodes(q: str) -> QuerySet:
+    return (
+        feed_index.get_visible_episodes()
+        .filter(get_search_filter(q))
+        .annotate(
+            search_score=get_relevance(q)
+            * (1 + TREND_SCORE_WEIGHT * Ln(1 + Greatest(F("trend_score"), Value(0.0))))
+        )
+        .order_by("-search_score", "-id")
+    )
+
+
+def search_series(queryset: QuerySet, q: str) -> QuerySet:
+    return (
+        queryset.filter(get_search_filter(q))
+        .annotate(search_score=get_relevance(q))
+        .order_by("-search_score", "-id")
+    )
@@ -0,0 +1,86 @@
+from common.field_tracker import FieldTracker
+from discovery.service import feed_index, search
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from episode.models import Episode
+from moka_profile.models import MokaProfile
+from series.models import Series
+
+# Feed index and search document updates run after commit so they read the
+# committed rows. Saves that don't change what they store are skipped.
+
+# Attributes the feed index stores or filters on, see feed_index.sync_episodes
+FEED_FIELDS = {
+    Episode: {"status", "is_banned", "publish_date", "trend_score", "series_id"},
+    Series: {"status", "is_banned"},
+    MokaProfile: {"is_banned"},
+}
+# Attributes the search documents are made of, see discovery.service.search.
+# Series tags are handled by m2m_changed.
+SEARCH_FIELDS = {
+    Episode: {"title", "series_id"},
+    Series: {"title", "owner_id"},
+    MokaProfile: {"display_name"},
+}
+
+
+indexed_fields = FieldTracker(
+    "discovery_indexes",
+    {model: FEED_FIELDS[model] | SEARCH_FIELDS[model] for model in FEED_FIELDS},
+)
+
+
+@receiver(post_save, sender=Episode)
+def sync_episode_indexes(sender, instance, created, update_fields, **kwargs):
+    changed = indexed_fields.pop_changes(instance, created, update_fields).keys()
+    if changed & FEED_FIELDS[Episode]:
+        transaction.on_commit(
+            lambda: feed_index.sync_episodes(Episode.objects.filter(id=instance.id))
+        )
+    if changed & SEARCH_FIELDS[Episode]:
+        transaction.on_commit(lambda: search.refresh_episodes([instance.id]))
+
+
+@receiver(post_save, sender=Series)
+def sync_series_indexes(sender, instance, created, update_fields, **kwargs):
+    changed = indexed_fields.pop_changes(instance, created, update_fields).keys()
+    if changed & FEED_FIELDS[Series]:
+        transaction.on_commit(
+            lambda: feed_index.sync_episodes(Episode.objects.filter(series=instance))
+        )
+    if changed & SEARCH_FIELDS[Series]:
+        transaction.on_commit(lambda: search.refresh_series([instance.id]))
+
+
+@receiver(post_save, sender=MokaProfile)
+def sync_profile_indexes(sender, instance, created, update_fields, **kwargs):
+    changed = indexed_fields.pop_changes(instance, created, update_fields).keys()
+    if changed & FEED_FIELDS[MokaProfile]:
+        transaction.on_commit(
+            lambda: feed_index.sync_episodes(
+                Episode.objects.filter(series__owner=instance)
+            )
+        )
+    if changed & SEARCH_FIELDS[MokaProfile]:
+        transaction.on_commit(
+            lambda: search.refresh_series(
+                instance.owning_series.values_list("id", flat=True)
+            )
+        )
+
+
+@receiver(post_delete, sender=Episode)
+def remove_episode_from_feed_index(sender, instance, **kwargs):
+    episode_id = instance.id
+    transaction.on_commit(lambda: feed_index.remove_episodes([episode_id]))
+
+
+@receiver(m2m_changed, sender=Series.tags.through)
+def refresh_series_search_document_on_tags(sender, instance, action, **kwargs):
+    if isinstance(instance, Series) and action in [
+        "post_add",
+        "post_remove",
+        "post_clear",
+    ]:
+        transaction.on_commit(lambda: search.refresh_series([instance.id]))
@@ -3,10 +3,22 @@ import datetime
 from unittest import mock
 
 import django.test
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.db.models import F
 from django.test import Client
-from episode.api.schema import EpisodeFetchStatus, EpisodeSchema
+from django_redis import get_redis_connection
+from episode.api.schema import EpisodeFetchStatus, EpisodeNeighborsSchema, EpisodeSchema
 from episode.factory import EpisodeFactory
-from episode.models import Episode, PurchaseEpisode
+from episode.models import (
+    DIRTY_EPISODES_CACHE_KEY,
+    Episode,
+    LikeEpisode,
+    PurchaseEpisode,
+)
+from episode.service import likes, neighbors, trend
+from episode.service.view_counter import view_counter
 from image.factory import PageFactory, ThumbnailFactory
 from image.models import Image, Page, Thumbnail
 from moka_profile.factory import MokaProfileFactory
@@ -29,6 +41,18 @@ class TestEpisodeAPI(django.test.TestCase):
         self.mock_signed_cookie.start()
         self.addCleanup(self.mock_signed_cookie.stop)
 
+        # Ids are reused across test databases, drop leftover view and like
+        # counts and neighbor indexes
+        cache.delete(DIRTY_EPISODES_CACHE_KEY)
+        cache.delete_pattern("episode_daily_likes_*")
+        cache.delete(neighbors.NEIGHBORS_CACHE_KEY)
+        cache.delete_pattern("series_*_episode_numbers")
+        get_redis_connection("default").delete(
+            trend.get_daily_views_key(
+                datetime.datetime.now(datetime.timezone.utc).date()
+            )
+        )
+
     def test_next_episode(self):
         series = SeriesFactory()
         episode = EpisodeFactory(
@@ -97,6 +121,31 @@ class TestEpisodeAPI(django.test.TestCase):
         # Next and Prev always called with NEED_PURCHASE level
         self.assertEqual(response_parsed.fetch_status, EpisodeFetchStatus.NEED_PURCHASE)
 
+    def test_episode_neighbors(self):
+        series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        first, second, third = [
+            EpisodeFactory(
+                series=series,
+                episode_number=number,
+                status=Episode.EpisodeStatus.PUBLIC,
+                is_banned=False,
+            )
+            for number in range(1, 4)
+        ]
+        neighbors.rebuild_series(series.id)
+
+        response = self.client.get(f"/v1/episode/{second.id}/neighbors")
+        self.assertEqual(response.status_code, 200)
+        response_parsed = EpisodeNeighborsSchema.parse_obj(response.json())
+        self.assertEqual(response_parsed.prev.id, str(first.id))
+        self.assertEqual(response_parsed.next.id, str(third.id))
+
+        response = self.client.get(f"/v1/episode/{third.id}/neighbors")
+        self.assertIsNone(response.json()["next"])
+
+        response = self.client.get("/v1/episode/0/neighbors")
+        self.assertEqual(response.status_code, 404)
+
     def test_get_public_episode(self):
         series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
         public_episode = EpisodeFactory(
@@ -294,6 +343,66 @@ class TestEpisodeAPI(django.test.TestCase):
                 response_parsed.fetch_status, EpisodeFetchStatus.ACCESSIBLE
             )
 
+    def test_get_public_episode_round_trips(self):
+        reader = MokaProfileFactory()
+        series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        episode = EpisodeFactory(
+            series=series,
+            episode_number=8,
+            status=Episode.EpisodeStatus.PUBLIC,
+            is_premium=True,
+            price=10,
+            views=0,
+            thumbnail=ThumbnailFactory(),
+        )
+        PageFactory.create_batch(
+            size=5, episode=episode, status=Image.ImageStatus.PUBLIC
+        )
+        PurchaseEpisode.objects.create(episode=episode, profile=reader)
+        likes.like(episode, reader)
+        episode.delete_cached_views()
+
+        with mock.patch(
+            "episode.api.v1.FirebaseOptionalAuthentication.authenticate",
+            return_value=reader,
+        ), mock.patch(
+            "image.gateway.google.gateway.GoogleCloudStorageGateway.get_view_urls",
+            side_effect=lambda external_ids, variant_name=None: external_ids,
+        ):
+            # Episode with access and like state, then its pages
+            with self.assertNumQueries(2):
+                response = self.client.get(f"/v1/episode/{episode.id}/public")
+
+        response_parsed = EpisodeSchema.parse_obj(response.json())
+        self.assertEqual(response_parsed.fetch_status, EpisodeFetchStatus.ACCESSIBLE)
+        self.assertEqual(len(response_parsed.pages), 5)
+        self.assertTrue(response_parsed.metadata.is_liked)
+        self.assertEqual(response_parsed.metadata.likes, 1)
+        self.assertEqual(response_parsed.metadata.views, 1)
+
+        # No pages without access
+        with mock.patch(
+            "episode.api.v1.FirebaseOptionalAuthentication.authenticate",
+            return_value=MokaProfileFactory(),
+        ):
+            with self.assertNumQueries(1):
+                response = self.client.get(f"/v1/episode/{episode.id}/public")
+        self.assertEqual(
+            response.json()["fetch_status"], EpisodeFetchStatus.NEED_PURCHASE
+        )
+        self.assertEqual(response.json()["metadata"]["views"], 2)
+
+    def test_get_public_episode_unique_readers(self):
+        series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        episode = EpisodeFactory(series=series, status=Episode.EpisodeStatus.PUBLIC)
+        cache.delete_pattern(f"episode_{episode.id}_readers_*")
+        for address in ["203.0.113.1", "203.0.113.1", "203.0.113.2"]:
+            self.client.get(f"/v1/episode/{episode.id}/public", REMOTE_ADDR=address)
+        view_counter.flush()
+
+        response = self.client.get(f"/v1/episode/{episode.id}/public")
+        self.assertEqual(response.json()["metadata"]["unique_readers"], 2)
+
     def test_get_public_episode_liked(self):
         profile = MokaProfileFactory()
         series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
@@ -680,10 +789,21 @@ class TestEpisodeAPI(django.test.TestCase):
             self.assertEqual(series.owner.liked_episodes.first(), episode1)
 
             # Check from episode
+            episode1.refresh_from_db()
+            episode2.refresh_from_db()
             self.assertEqual(episode1.get_likes(), 1)
             self.assertEqual(episode2.get_likes(), 0)
             self.assertEqual(episode1.likes.first(), series.owner)
 
+            response = self.client.post(
+                path=f"/v1/episode/{episode1.id}/unlike",
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200)
+            episode1.refresh_from_db()
+            self.assertEqual(episode1.get_likes(), 0)
+            self.assertEqual(series.owner.liked_episodes.count(), 0)
+
     def test_sync_views_and_update_trend_score(self):
         series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
         episodes = EpisodeFactory.create_batch(
@@ -710,12 +830,136 @@ class TestEpisodeAPI(django.test.TestCase):
             )
             self.assertEqual(response.status_code, 200)
 
-        for i, episode in enumerate(episodes):
+        for episode in episodes:
             episode.refresh_from_db()
+        # Same publish date, so scores only differ by views
+        self.assertGreater(episodes[1].trend_score, 0)
+        self.assertLess(episodes[1].trend_score, 1)
+        for i, episode in enumerate(episodes):
             self.assertEqual(episode.views, i)
-            self.assertEqual(episode.trend_score, i * 1.0)
+            self.assertAlmostEqual(episode.trend_score, i * episodes[1].trend_score)
             self.assertEqual(episode.get_buffer_views(), 0)
 
+    def sync_views_and_update_trend_score(self):
+        with mock.patch(
+            "image.api.v1.CloudSchedulerAuthentication.authenticate",
+            return_value=1,  # Arbitrary fake data
+        ):
+            response = self.client.post(
+                path="/v1/episode/view-sync-and-update-trend-score",
+                **{"HTTP_AUTHORIZATION": "Bearer "},
+            )
+            self.assertEqual(response.status_code, 200)
+
+    def test_sync_only_drains_dirty_episodes(self):
+        series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        idle_episode = EpisodeFactory(
+            views=10, status=Episode.EpisodeStatus.PUBLIC, series=series
+        )
+        viewed_episode = EpisodeFactory(
+            views=10, status=Episode.EpisodeStatus.PUBLIC, series=series
+        )
+        # Buffered without being marked dirty
+        cache.set(idle_episode.get_cache_key(), 5, timeout=None)
+        for _ in range(3):
+            viewed_episode.incr_view()
+
+        self.sync_views_and_update_trend_score()
+
+        idle_episode.refresh_from_db()
+        viewed_episode.refresh_from_db()
+        self.assertEqual(idle_episode.views, 10)
+        self.assertEqual(idle_episode.get_buffer_views(), 5)
+        self.assertEqual(viewed_episode.views, 13)
+        self.assertEqual(viewed_episode.get_buffer_views(), 0)
+
+    def test_trend_score_ignores_lifetime_views(self):
+        series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        publish_date = datetime.datetime.now().replace(
+            tzinfo=datetime.timezone.utc
+        ) - datetime.timedelta(days=1)
+        old_hit = EpisodeFactory(
+            views=1000,
+            trend_score=1000,
+            status=Episode.EpisodeStatus.PUBLIC,
+            series=series,
+            publish_date=publish_date,
+        )
+        liked_episode = EpisodeFactory(
+            views=0,
+            status=Episode.EpisodeStatus.PUBLIC,
+            series=series,
+            publish_date=publish_date,
+        )
+        likes.like(liked_episode, series.owner)
+
+        self.sync_views_and_update_trend_score()
+
+        old_hit.refresh_from_db()
+        liked_episode.refresh_from_db()
+        self.assertEqual(old_hit.trend_score, 0)
+        self.assertGreater(liked_episode.trend_score, 0)
+        self.assertLess(liked_episode.trend_score, 0.7)
+
+    def test_trend_score_ignores_expired_likes(self):
+        series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        episode = EpisodeFactory(
+            views=0, trend_score=0.7, status=Episode.EpisodeStatus.PUBLIC, series=series
+        )
+        likes.like(episode, series.owner)
+        # Older than every day covered by the window
+        LikeEpisode.objects.filter(episode=episode).update(
+            created_at=datetime.datetime.now().replace(tzinfo=datetime.timezone.utc)
+            - datetime.timedelta(days=settings.TREND_SCORE_WINDOW_DAYS + 1)
+        )
+        likes.rebuild_daily_likes()
+
+        self.sync_views_and_update_trend_score()
+        episode.refresh_from_db()
+        self.assertEqual(episode.trend_score, 0)
+
+    def test_sync_keeps_views_when_write_fails(self):
+        series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        episode = EpisodeFactory(
+            views=0, trend_score=0, status=Episode.EpisodeStatus.PUBLIC, series=series
+        )
+        episode.incr_view()
+        episode.incr_view()
+
+        with mock.patch(
+            "episode.service.trend.add_views",
+            side_effect=DatabaseError,
+        ):
+            with self.assertRaises(DatabaseError):
+                trend.sync_views_and_trend_scores()
+        self.assertEqual(episode.get_buffer_views(), 2)
+
+        trend.sync_views_and_trend_scores()
+        episode.refresh_from_db()
+        self.assertEqual(episode.views, 2)
+        self.assertEqual(episode.get_buffer_views(), 0)
+
+    def test_sync_adds_views_to_concurrent_writes(self):
+        series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        episode = EpisodeFactory(
+            views=10, status=Episode.EpisodeStatus.PUBLIC, series=series
+        )
+        for _ in range(3):
+            episode.incr_view()
+        # Written by an overlapping run after the views were drained
+        add_views = trend.add_views
+
+        def add_views_after_another_run(views_by_id):
+            Episode.objects.filter(id=episode.id).update(views=F("views") + 5)
+            add_views(views_by_id)
+
+        with mock.patch(
+            "episode.service.trend.add_views", side_effect=add_views_after_another_run
+        ):
+            trend.sync_views_and_trend_scores()
+        episode.refresh_from_db()
+        self.assertEqual(episode.views, 18)
+
     def test_scheduled_release(self):
         release_date = datetime.datetime.now().replace(tzinfo=datetime.timezone.utc)
         episodes = EpisodeFactory.create_batch(
@@ -5,7 +5,7 @@ from common.logger import StructuredLogger
 from common.schema_utils import datetime_encoder
 from episode.models import Episode
 from image.api.schema import PageIdSchema, PageSchema
-from image.models import Image
+from image.models import Image, Page
 from moka_profile.models import MokaProfile
 from ninja import Schema
 from pydantic import Field
@@ -45,6 +45,7 @@ class EpisodeMetaDataSchema(Schema):
     thumbnail_url: Optional[str]
     thumbnail_id: Optional[str]
     views: int
+    unique_readers: int
     is_premium: bool
     price: int
     release_date: Optional[datetime]
@@ -67,6 +68,15 @@ class EpisodeMetaDataSchema(Schema):
     class Config(Schema.Config):
         json_encorders = {datetime: datetime_encoder}
 
+    @staticmethod
+    def prefetch(episodes: List[Episode]):
+        """
+        Batch resolve views and readers for a page of episodes
+        """
+        Episode.prefetch_buffer_views(episodes)
+        Episode.prefetch_unique_readers(episodes)
+        Image.prefetch_signed_cookies([episode.thumbnail for episode in episodes])
+
     @staticmethod
     def resolve_id(obj: Episode):
         return obj.id
@@ -97,6 +107,10 @@ class EpisodeMetaDataSchema(Schema):
     def resolve_views(obj: Episode):
         return obj.get_views()
 
+    @staticmethod
+    def resolve_unique_readers(obj: Episode):
+        return obj.get_unique_readers()
+
     @staticmethod
     def resolve_is_premium(obj: Episode):
         return obj.is_premium
@@ -147,6 +161,7 @@ class EpisodeMetaDataSchema(Schema):
         ret = {
             "id": EpisodeMetaDataSchema.resolve_id(obj),
             "views": EpisodeMetaDataSchema.resolve_views(obj),
+            "unique_readers": EpisodeMetaDataSchema.resolve_unique_readers(obj),
             "is_premium": EpisodeMetaDataSchema.resolve_is_premium(obj),
             "price": EpisodeMetaDataSchema.resolve_price(obj),
             "release_date": EpisodeMetaDataSchema.resolve_release_date(obj),
@@ -172,6 +187,11 @@ class EpisodeMetaDataSchema(Schema):
         return ret
 
 
+class EpisodeNeighborsSchema(Schema):
+    prev: Optional[EpisodeMetaDataSchema]
+    next: Optional[EpisodeMetaDataSchema]
+
+
 class EpisodeSchema(Schema):
     metadata: EpisodeMetaDataSchema
     pages: List[PageSchema]
@@ -187,12 +207,15 @@ class EpisodeSchema(Schema):
 
     @staticmethod
     def resolve_pages(obj: Episode):
-        return [
-            PageSchema.resolve_from_page(page)
-            for page in obj.pages.filter(
+        pages = list(
+            obj.pages.filter(
                 status=Image.ImageStatus.PUBLIC,
-            ).order_by("order")
-        ]
+            )
+            .only("id", "order", "external_id", "storage", "episode_id")
+            .order_by("order")
+        )
+        Page.prefetch_signed_cookies(pages)
+        return [PageSchema.resolve_from_page(page) for page in pages]
 
     @staticmethod
     def resolve_with_episode(obj: Episode):
@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from typing import List, Optional
 
 from common.auth import (
@@ -8,7 +8,10 @@ from common.auth import (
 )
 from common.errors import ErrorResponse, MokaBackendGenericError, UnauthorizedError
 from common.logger import StructuredLogger
+from discovery.service import feed_index
 from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.views.decorators import csrf
 from episode.api.schema import (
@@ -16,9 +19,11 @@ from episode.api.schema import (
     EpisodeEditInputSchema,
     EpisodeFetchStatus,
     EpisodeMetaDataSchema,
+    EpisodeNeighborsSchema,
     EpisodeSchema,
 )
 from episode.models import Episode, LikeEpisode, PurchaseEpisode
+from episode.service import likes, neighbors, readers, trend
 from image.models import Image, Page, Thumbnail
 from moka_profile.models import MokaProfile
 from ninja import Router
@@ -82,6 +87,30 @@ def prev_public_episode(request, id: int):
     )
 
 
+@router.get(
+    "/{int:id}/neighbors",
+    response=EpisodeNeighborsSchema,
+    description="Previous and next episodes of the series, for page turns.",
+)
+@csrf.csrf_exempt
+def get_episode_neighbors(request, id: int):
+    episode_neighbors = neighbors.get_neighbors(id)
+    if episode_neighbors is None:
+        raise Http404
+    episodes = feed_index.get_visible_episodes().in_bulk(
+        [
+            episode_id
+            for episode_id in [episode_neighbors.prev_id, episode_neighbors.next_id]
+            if episode_id is not None
+        ]
+    )
+    EpisodeMetaDataSchema.prefetch(list(episodes.values()))
+    return {
+        "prev": episodes.get(episode_neighbors.prev_id),
+        "next": episodes.get(episode_neighbors.next_id),
+    }
+
+
 @router.get(
     "/{int:id}",
     response=EpisodeSchema,
@@ -108,9 +137,15 @@ def get_episode(request, id: int):
 
 
 def incr_view_and_resolve_episode_with_profile(
-    episode: Episode, profile: Optional[MokaProfile], fetch_status: str
+    episode: Episode,
+    profile: Optional[MokaProfile],
+    fetch_status: str,
+    reader_id: Optional[str] = None,
 ):
-    episode.incr_view()
+    buffer_views = episode.incr_view(reader_id)
+    if buffer_views is not None:
+        # Known from the last flush, saves reading the buffer
+        episode._prefetched_buffer_views = buffer_views
     return EpisodeSchema.resolve_with_episode_and_caller(
         obj=episode,
         caller=profile,
@@ -118,6 +153,24 @@ def incr_view_and_resolve_episode_with_profile(
     )
 
 
+def get_reader_queryset(caller: Optional[MokaProfile]):
+    """
+    Episodes with everything the reader needs to decide access and render
+    the metadata: whether the caller purchased and liked it.
+    """
+    queryset = Episode.objects.select_related("series__owner", "thumbnail")
+    if caller is None:
+        return queryset
+    return queryset.annotate(
+        is_purchased=Exists(
+            PurchaseEpisode.objects.filter(episode=OuterRef("pk"), profile=caller)
+        ),
+        is_liked=Exists(
+            LikeEpisode.objects.filter(episode=OuterRef("pk"), profile=caller)
+        ),
+    )
+
+
 @router.get(
     "/{int:id}/public",
     response=EpisodeSchema,
@@ -125,8 +178,9 @@ def incr_view_and_resolve_episode_with_profile(
     description="Fetch episode as a reader, not the author.",
 )
 def get_public_episode(request, id: int):
+    caller = request.auth if isinstance(request.auth, MokaProfile) else None
     episode = get_object_or_404(
-        Episode.objects.select_related("series__owner"),
+        get_reader_queryset(caller),
         id=id,
         status__in=[
             Episode.EpisodeStatus.PUBLIC,
@@ -137,35 +191,26 @@ def get_public_episode(request, id: int):
         series__is_banned=False,
         series__owner__is_banned=False,
     )
+    if caller is not None:
+        episode._prefetched_is_liked = episode.is_liked
+
     if episode.status == Episode.EpisodeStatus.PRE_RELEASE or episode.is_premium:
         # Needs to be authenticated
-        if isinstance(request.auth, MokaProfile):
-            if (
-                episode.series.is_owner(request.auth)
-                or episode.price <= 0
-                or PurchaseEpisode.objects.filter(
-                    episode=episode,
-                    profile=request.auth,
-                ).exists()
-            ):
-                return incr_view_and_resolve_episode_with_profile(
-                    episode=episode,
-                    profile=request.auth
-                    if isinstance(request.auth, MokaProfile)
-                    else None,
-                    fetch_status=EpisodeFetchStatus.ACCESSIBLE,
-                )
-        return incr_view_and_resolve_episode_with_profile(
-            episode=episode,
-            profile=request.auth if isinstance(request.auth, MokaProfile) else None,
-            fetch_status=EpisodeFetchStatus.NEED_PURCHASE,
+        is_accessible = caller is not None and (
+            episode.series.is_owner(caller)
+            or episode.price <= 0
+            or episode.is_purchased
         )
     else:
-        return incr_view_and_resolve_episode_with_profile(
-            episode=episode,
-            profile=request.auth if isinstance(request.auth, MokaProfile) else None,
-            fetch_status=EpisodeFetchStatus.ACCESSIBLE,
-        )
+        is_accessible = True
+    return incr_view_and_resolve_episode_with_profile(
+        episode=episode,
+        profile=caller,
+        fetch_status=EpisodeFetchStatus.ACCESSIBLE
+        if is_accessible
+        else EpisodeFetchStatus.NEED_PURCHASE,
+        reader_id=readers.get_reader_id(request, caller),
+    )
 
 
 @router.post(
@@ -393,11 +438,7 @@ def like_episode(request, id: int):
         Episode.objects,
         id=id,
     )
-    like = LikeEpisode(
-        episode=episode,
-        profile=profile,
-    )
-    like.save()
+    likes.like(episode, profile)
 
 
 @router.post(
@@ -411,10 +452,7 @@ def unlike_episode(request, id: int):
         Episode.objects,
         id=id,
     )
-    LikeEpisode.objects.filter(
-        episode=episode,
-        profile=profile,
-    ).delete()
+    likes.unlike(episode, profile)
 
 
 @router.post(
@@ -424,40 +462,10 @@ def unlike_episode(request, id: int):
 @csrf.csrf_exempt
 def sync_views_and_update_trend_score(request):
     logger.info(event_name="SYNC_VIEW_AND_TREND_SCORE_UPDATE_START")
-    bulk_episode_update = []
-
-    # This should match trending_feed episode filter query params
-    public_episodes = Episode.objects.select_related(
-        "thumbnail",
-        "series__owner",
-    ).filter(
-        status=Episode.EpisodeStatus.PUBLIC,
-        series__status=Series.SeriesStatus.PUBLIC,
-    )
-
-    for episode in public_episodes:
-        # Get last 5 days of likes
-        num_recent_likes = LikeEpisode.objects.filter(
-            episode=episode,
-            created_at__gt=datetime.now().replace(tzinfo=timezone.utc)
-            - timedelta(days=5),
-        ).count()
-        num_views = episode.get_buffer_views()
-
-        episode.views += num_views
-
-        # Calculate trend_score
-        episode.trend_score = num_recent_likes * 0.7 + episode.views * 1
-
-        # Clear out view count
-        episode.clear_cached_views()
-        bulk_episode_update.append(episode)
-
-    Episode.objects.bulk_update(bulk_episode_update, ["views", "trend_score"])
-
+    updated_cnt = trend.sync_views_and_trend_scores()
     logger.info(
         event_name="SYNC_VIEW_AND_TREND_SCORE_UPDATE_DONE",
-        updated_cnt=len(bulk_episode_update),
+        updated_cnt=updated_cnt,
     )
 
 
@@ -485,6 +493,12 @@ def publish_episodes(request):
     Episode.objects.bulk_update(
         bulk_episode_update, ["status", "publish_date", "price"]
     )
+    # bulk_update skips the signals that keep the feed and neighbor indexes in sync
+    feed_index.sync_episodes(
+        Episode.objects.filter(id__in=[episode.id for episode in bulk_episode_update])
+    )
+    for series_id in {episode.series_id for episode in bulk_episode_update}:
+        neighbors.rebuild_series(series_id)
 
     logger.info(
         event_name="PUBLISH_EPISODES_DONE",
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class EpisodeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'episode'
+
+    def ready(self):
+        # pylint: disable=import-outside-toplevel
+        import moka.episode.signals.handlers  # noqa: F401
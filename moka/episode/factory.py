@@ -52,3 +52,5 @@ class EpisodeFactory(factory.django.DjangoModelFactory):
 
         # Add the iterable of groups using bulk addition
         self.likes.add(*extracted)
+        self.likes_count = self.likes.count()
+        Episode.objects.filter(id=self.id).update(likes_count=self.likes_count)
@@ -0,0 +1,55 @@
+import math
+import timeit
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from episode.service.scoring import TrendScoreConfig, compute_trend_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare scoring synthetic episodes with the vectorized trend score "
+        "against a per-row Python loop"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--episodes", type=int, default=1_000_000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        num_episodes = options["episodes"]
+        rng = np.random.default_rng(options["seed"])
+        config = TrendScoreConfig(
+            like_weight=0.7,
+            view_weight=1.0,
+            half_life=timedelta(hours=72),
+            window=timedelta(days=5),
+        )
+
+        recent_likes = rng.poisson(3, num_episodes).astype(np.float64)
+        recent_views = rng.poisson(50, num_episodes).astype(np.float64)
+        age_seconds = rng.uniform(0, 200 * 24 * 60 * 60, num_episodes)
+        rows = list(
+            zip(recent_likes.tolist(), recent_views.tolist(), age_seconds.tolist())
+        )
+        half_life_seconds = config.half_life.total_seconds()
+
+        def score_per_row():
+            return [
+                (config.like_weight * likes + config.view_weight * views)
+                * math.pow(2, -max(age, 0) / half_life_seconds)
+                for likes, views, age in rows
+            ]
+
+        def score_vectorized():
+            return compute_trend_scores(recent_likes, recent_views, age_seconds, config)
+
+        per_row = timeit.timeit(score_per_row, number=1)
+        vectorized = timeit.timeit(score_vectorized, number=1)
+        np.testing.assert_allclose(score_vectorized(), score_per_row())
+
+        self.stdout.write(f"Scored {num_episodes} episodes")
+        self.stdout.write(f"Per row:    {per_row:.3f} s")
+        self.stdout.write(f"Vectorized: {vectorized:.3f} s")
+        self.stdout.write(f"Speedup: {per_row / vectorized:.1f}x")
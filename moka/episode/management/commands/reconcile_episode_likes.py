@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from episode.service import likes
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute episode like counts and the daily like buckets of the "
+        "trend window from LikeEpisode."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=likes.RECONCILE_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        fixed_cnt = likes.reconcile_counts(chunk_size=options["chunk_size"])
+        recent_likes = likes.rebuild_daily_likes()
+        self.stdout.write(
+            f"Fixed {fixed_cnt} like counts, "
+            f"rebuilt buckets of {recent_likes} recent likes"
+        )
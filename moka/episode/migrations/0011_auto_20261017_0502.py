@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('episode', '0010_episode_is_nsfw'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='episode',
+            index=models.Index(fields=['publish_date', 'id'], name='episode_epi_publish_60af42_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='episode',
+            index=models.Index(fields=['series', 'episode_number', 'id'], name='episode_epi_series__07ad88_idx'),
+        ),
+    ]
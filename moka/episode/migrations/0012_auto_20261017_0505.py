@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('episode', '0011_auto_20261017_0502'),
+        ('series', '0006_auto_20261017_0505'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='episode',
+            name='search_document',
+            field=django.contrib.postgres.search.SearchVectorField(null=True),
+        ),
+        migrations.AddField(
+            model_name='episode',
+            name='search_text',
+            field=models.TextField(default=''),
+        ),
+        migrations.AddIndex(
+            model_name='episode',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='episode_epi_search__f94b22_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='episode',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='episode_search_text_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('episode', '0012_auto_20261017_0505'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='episode',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        # Backfill, episode.service.likes.reconcile_counts fixes later drift
+        migrations.RunSQL(
+            sql="""
+            UPDATE episode_episode SET likes_count = (
+                SELECT COUNT(*) FROM episode_likeepisode
+                WHERE episode_likeepisode.episode_id = episode_episode.id
+            )
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('episode', '0013_episode_likes_count'),
+    ]
+
+    operations = [
+        # Keep the first like of every (episode, profile) pair
+        migrations.RunSQL(
+            sql="""
+            DELETE FROM episode_likeepisode AS duplicate
+            USING episode_likeepisode AS first
+            WHERE duplicate.episode_id = first.episode_id
+                AND duplicate.profile_id = first.profile_id
+                AND duplicate.id > first.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE episode_episode SET likes_count = (
+                SELECT COUNT(*) FROM episode_likeepisode
+                WHERE episode_likeepisode.episode_id = episode_episode.id
+            )
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='likeepisode',
+            constraint=models.UniqueConstraint(fields=('episode', 'profile'), name='unique_episode_likes'),
+        ),
+    ]
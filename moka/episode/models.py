@@ -1,5 +1,15 @@
+from typing import List, Optional
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.cache import cache
 from django.db import models
+from episode.service import readers
+from episode.service.view_counter import (  # noqa: F401
+    DIRTY_EPISODES_CACHE_KEY,
+    get_views_key,
+    view_counter,
+)
 from image.models import Thumbnail
 from moka_profile.models import MokaProfile
 from series.models import Series
@@ -30,6 +40,8 @@ class Episode(models.Model):
         MokaProfile, through="LikeEpisode", related_name="liked_episodes"
     )
     views = models.PositiveBigIntegerField(default=0)
+    # Maintained by episode.service.likes
+    likes_count = models.PositiveIntegerField(default=0)
 
     is_premium = models.BooleanField(default=False)
     price = models.PositiveBigIntegerField(default=0)
@@ -49,36 +61,61 @@ class Episode(models.Model):
 
     is_nsfw = models.BooleanField(default=False)
 
+    # Maintained by discovery.service.search
+    search_document = SearchVectorField(null=True)
+    search_text = models.TextField(default="")
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the new feed and series episode lists
+            models.Index(fields=["publish_date", "id"]),
+            models.Index(fields=["series", "episode_number", "id"]),
+            GinIndex(fields=["search_document"]),
+            GinIndex(
+                name="episode_search_text_trgm",
+                fields=["search_text"],
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
+
     def get_likes(self):
-        return self.likes.count()
+        return self.likes_count
 
     def is_liked_by(self, profile: MokaProfile):
+        # Annotated for the caller by the reader query
+        if hasattr(self, "_prefetched_is_liked"):
+            return self._prefetched_is_liked
         return self.likes.filter(id=profile.id).exists()
 
     def get_cache_key(self):
-        return f"episode_{self.id}_views"
+        return get_views_key(self.id)
 
     def get_buffer_views(self):
+        if hasattr(self, "_prefetched_buffer_views"):
+            return self._prefetched_buffer_views
         return cache.get_or_set(
             key=self.get_cache_key(),
             default=0,
             timeout=None,
-        )
+        ) + view_counter.get_pending(self.id)
 
     def get_views(self):
         return self.views + self.get_buffer_views()
 
-    def incr_view(self):
-        try:
-            cache.incr(self.get_cache_key())
-        except ValueError:
-            cache.set(
-                key=self.get_cache_key(),
-                value=1,
-                timeout=None,  # Don't stale the cache
-            )
+    def incr_view(self, reader_id: Optional[str] = None):
+        # Counted in process, see episode.service.view_counter. Returns the
+        # buffered views after the increment when known without a read.
+        return view_counter.add(self.id, self.series_id, reader_id)
+
+    def get_unique_readers(self):
+        if hasattr(self, "_prefetched_unique_readers"):
+            return self._prefetched_unique_readers
+        return readers.get_unique_readers(
+            readers.EPISODE_READERS_CACHE_KEY, [self.id]
+        ).get(self.id, 0)
 
     def clear_cached_views(self):
+        view_counter.discard([self.id])
         cache.set(
             key=self.get_cache_key(),
             value=0,
@@ -86,8 +123,31 @@ class Episode(models.Model):
         )
 
     def delete_cached_views(self):
+        view_counter.discard([self.id])
         cache.delete(self.get_cache_key())
 
+    @staticmethod
+    def prefetch_buffer_views(episodes: List["Episode"]):
+        """
+        Attach buffered view counts to the given episodes with a single MGET
+        """
+        buffer_views = cache.get_many([episode.get_cache_key() for episode in episodes])
+        for episode in episodes:
+            episode._prefetched_buffer_views = buffer_views.get(
+                episode.get_cache_key(), 0
+            ) + view_counter.get_pending(episode.id)
+
+    @staticmethod
+    def prefetch_unique_readers(episodes: List["Episode"]):
+        """
+        Attach unique reader counts to the given episodes with one pipeline
+        """
+        unique_readers = readers.get_unique_readers(
+            readers.EPISODE_READERS_CACHE_KEY, [episode.id for episode in episodes]
+        )
+        for episode in episodes:
+            episode._prefetched_unique_readers = unique_readers.get(episode.id, 0)
+
 
 class LikeEpisode(models.Model):
     episode = models.ForeignKey(Episode, on_delete=models.CASCADE)
@@ -95,6 +155,13 @@ class LikeEpisode(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["episode", "profile"], name="unique_episode_likes"
+            )
+        ]
+
 
 class PurchaseEpisode(models.Model):
     episode = models.ForeignKey(Episode, on_delete=models.CASCADE)
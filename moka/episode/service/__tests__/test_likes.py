@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django_redis import get_redis_connection
+from episode.factory import EpisodeFactory
+from episode.models import Episode, LikeEpisode
+from episode.service import likes
+from moka_profile.factory import MokaProfileFactory
+from redis.exceptions import RedisError
+
+
+class EpisodeLikesTests(TestCase):
+    def setUp(self):
+        # Ids are reused across test databases
+        cache.delete_pattern("episode_daily_likes_*")
+        self.redis = get_redis_connection("default")
+        self.now = datetime.now(timezone.utc)
+        self.window = timedelta(days=settings.TREND_SCORE_WINDOW_DAYS)
+        self.episode = EpisodeFactory()
+        self.profiles = MokaProfileFactory.create_batch(3)
+
+    def get_recent_likes(self):
+        return likes.get_recent_likes(
+            self.redis,
+            self.now,
+            self.window,
+            list(Episode.objects.values_list("id", flat=True)),
+        )
+
+    def age_likes(self, profile, days):
+        LikeEpisode.objects.filter(episode=self.episode, profile=profile).update(
+            created_at=self.now - timedelta(days=days)
+        )
+
+    def test_like_and_unlike(self):
+        for profile in self.profiles:
+            likes.like(self.episode, profile)
+        self.episode.refresh_from_db()
+        self.assertEqual(self.episode.likes_count, 3)
+        self.assertEqual(self.get_recent_likes(), {self.episode.id: 3})
+        self.assertGreater(
+            self.redis.ttl(likes.get_daily_likes_key(self.now.date())), 0
+        )
+
+        self.assertTrue(likes.unlike(self.episode, self.profiles[0]))
+        self.assertFalse(likes.unlike(self.episode, self.profiles[0]))
+        self.episode.refresh_from_db()
+        self.assertEqual(self.episode.likes_count, 2)
+        self.assertEqual(self.get_recent_likes(), {self.episode.id: 2})
+
+    def test_like_is_idempotent(self):
+        self.assertTrue(likes.like(self.episode, self.profiles[0]))
+        self.assertFalse(likes.like(self.episode, self.profiles[0]))
+        self.episode.refresh_from_db()
+        self.assertEqual(self.episode.likes_count, 1)
+        self.assertEqual(LikeEpisode.objects.filter(episode=self.episode).count(), 1)
+        self.assertEqual(self.get_recent_likes(), {self.episode.id: 1})
+
+    def test_unlike_leaves_other_days(self):
+        for profile in self.profiles:
+            likes.like(self.episode, profile)
+        self.age_likes(self.profiles[0], days=2)
+        self.age_likes(self.profiles[1], days=settings.TREND_SCORE_WINDOW_DAYS + 1)
+        likes.rebuild_daily_likes(self.now)
+        self.assertEqual(self.get_recent_likes(), {self.episode.id: 2})
+
+        # Taken out of the bucket of two days ago
+        likes.unlike(self.episode, self.profiles[0])
+        self.assertEqual(
+            self.redis.hget(
+                likes.get_daily_likes_key(self.now.date() - timedelta(days=2)),
+                self.episode.id,
+            ),
+            b"0",
+        )
+        # Outside the window, no bucket to take it from
+        likes.unlike(self.episode, self.profiles[1])
+        self.assertEqual(self.get_recent_likes(), {self.episode.id: 1})
+        self.episode.refresh_from_db()
+        self.assertEqual(self.episode.likes_count, 1)
+
+    def test_redis_failure_keeps_the_like(self):
+        with mock.patch(
+            "episode.service.likes.get_redis_connection", side_effect=RedisError
+        ):
+            likes.like(self.episode, self.profiles[0])
+        self.episode.refresh_from_db()
+        self.assertEqual(self.episode.likes_count, 1)
+        self.assertEqual(self.get_recent_likes(), {})
+
+        # An unlike of a like missing from the buckets doesn't go negative
+        likes.unlike(self.episode, self.profiles[0])
+        self.assertEqual(self.get_recent_likes(), {})
+
+    def test_reconcile(self):
+        other_episode = EpisodeFactory()
+        for profile in self.profiles:
+            likes.like(self.episode, profile)
+        likes.like(other_episode, self.profiles[0])
+        # Drift from a cascading delete and a flushed Redis
+        self.profiles[1].delete()
+        Episode.objects.filter(id=other_episode.id).update(likes_count=5)
+        cache.delete_pattern("episode_daily_likes_*")
+
+        self.assertEqual(likes.reconcile_counts(chunk_size=1), 2)
+        self.assertEqual(likes.reconcile_counts(), 0)
+        self.episode.refresh_from_db()
+        other_episode.refresh_from_db()
+        self.assertEqual(self.episode.likes_count, 2)
+        self.assertEqual(other_episode.likes_count, 1)
+
+        self.assertEqual(likes.rebuild_daily_likes(self.now), 3)
+        self.assertEqual(
+            self.get_recent_likes(), {self.episode.id: 2, other_episode.id: 1}
+        )
+        # Only the requested episodes are read
+        self.assertEqual(
+            likes.get_recent_likes(
+                self.redis, self.now, self.window, [other_episode.id]
+            ),
+            {other_episode.id: 1},
+        )
@@ -0,0 +1,125 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from episode.factory import EpisodeFactory
+from episode.models import Episode
+from episode.service import neighbors
+from redis.exceptions import RedisError
+from series.factory import SeriesFactory
+from series.models import Series
+
+
+class EpisodeNeighborsTests(TestCase):
+    def setUp(self):
+        # Ids are reused across test databases
+        cache.delete(neighbors.NEIGHBORS_CACHE_KEY)
+        cache.delete_pattern("series_*_episode_numbers")
+
+        self.series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        self.episodes = [
+            EpisodeFactory(
+                series=self.series,
+                episode_number=number,
+                status=Episode.EpisodeStatus.PUBLIC,
+                is_banned=False,
+            )
+            for number in range(1, 5)
+        ]
+
+    def assertNeighbors(self, episode, prev_episode, next_episode):
+        self.assertEqual(
+            neighbors.get_neighbors(episode.id),
+            neighbors.Neighbors(
+                self.series.id,
+                prev_episode.id if prev_episode else None,
+                next_episode.id if next_episode else None,
+            ),
+        )
+
+    def test_neighbors(self):
+        first, second, third, last = self.episodes
+        self.assertNeighbors(first, None, second)
+        # Served from the index once built
+        with self.assertNumQueries(0):
+            self.assertNeighbors(second, first, third)
+            self.assertNeighbors(last, third, None)
+        self.assertIsNone(neighbors.get_neighbors(0))
+
+    def test_skips_hidden_episodes(self):
+        first, second, third, _ = self.episodes
+        with self.captureOnCommitCallbacks(execute=True):
+            second.status = Episode.EpisodeStatus.DRAFT
+            second.save()
+        self.assertNeighbors(first, None, third)
+        self.assertNeighbors(third, first, self.episodes[3])
+        # Hidden episodes still find their way back into the series
+        self.assertNeighbors(second, first, third)
+        self.assertIsNone(neighbors.get_episode_id(self.series.id, 2))
+
+    def test_rebuilt_on_delete_and_ban(self):
+        first, second, third, last = self.episodes
+        neighbors.rebuild_series(self.series.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertNeighbors(first, None, third)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.series.owner.is_banned = True
+            self.series.owner.save()
+        self.assertIsNone(neighbors.get_episode_id(self.series.id, 1))
+        self.assertNeighbors(first, None, None)
+
+    def test_jump_to_number(self):
+        self.assertEqual(
+            neighbors.get_episode_id(self.series.id, 3), self.episodes[2].id
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                neighbors.get_episode_id(self.series.id, 4), self.episodes[3].id
+            )
+            self.assertIsNone(neighbors.get_episode_id(self.series.id, 5))
+
+    def test_redis_down(self):
+        first, second, _, _ = self.episodes
+        with mock.patch(
+            "episode.service.neighbors.get_redis_connection",
+            side_effect=RedisError,
+        ):
+            self.assertNeighbors(second, first, self.episodes[2])
+            self.assertEqual(neighbors.get_episode_id(self.series.id, 1), first.id)
+
+    # The module the app config connected
+    @mock.patch("moka.episode.signals.handlers.neighbors")
+    def test_rebuilt_only_on_neighbor_changes(self, mock_neighbors):
+        episode = Episode.objects.get(id=self.episodes[0].id)
+        owner = self.series.owner
+        with self.captureOnCommitCallbacks(execute=True):
+            episode.views += 1
+            episode.save()
+            episode.title = "renamed"
+            episode.save(update_fields=["title"])
+            self.series.title = "renamed"
+            self.series.save()
+            owner.display_name = "renamed"
+            owner.save()
+        mock_neighbors.rebuild_series.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            episode.episode_number = 10
+            episode.save()
+        mock_neighbors.rebuild_series.assert_called_once_with(self.series.id)
+
+        mock_neighbors.reset_mock()
+        other_series = SeriesFactory(owner=owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            episode.series = other_series
+            episode.save()
+            owner.is_banned = True
+            owner.save()
+        self.assertEqual(
+            sorted(
+                call.args[0] for call in mock_neighbors.rebuild_series.call_args_list
+            ),
+            sorted([self.series.id, other_series.id] * 2),
+        )
@@ -0,0 +1,185 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django_redis import get_redis_connection
+from episode.factory import EpisodeFactory
+from episode.models import Episode
+from episode.service import readers, trend
+from episode.service.view_counter import ViewCounter
+from moka_profile.factory import MokaProfileFactory
+from series.factory import SeriesFactory
+from series.models import Series
+
+
+class UniqueReadersTests(TestCase):
+    def setUp(self):
+        # Ids are reused across test databases
+        cache.delete_pattern("episode_*_readers_*")
+        cache.delete_pattern("series_*_readers_*")
+        cache.delete(readers.DIRTY_EPISODE_READERS_CACHE_KEY)
+        cache.delete(readers.DIRTY_SERIES_READERS_CACHE_KEY)
+        self.redis = get_redis_connection("default")
+        self.now = datetime.now(timezone.utc)
+        self.series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        self.episodes = EpisodeFactory.create_batch(
+            size=2, series=self.series, status=Episode.EpisodeStatus.PUBLIC
+        )
+        self.counter = ViewCounter(flush_interval=60, flush_size=100)
+
+    def read(self, episode, reader_id, times=1):
+        for _ in range(times):
+            self.counter.add(episode.id, episode.series_id, reader_id)
+
+    def test_reader_id(self):
+        factory = RequestFactory()
+        profile = MokaProfileFactory()
+        request = factory.get(
+            "/", HTTP_X_FORWARDED_FOR="203.0.113.7", HTTP_USER_AGENT="a"
+        )
+        self.assertEqual(readers.get_reader_id(request, profile), f"p{profile.id}")
+
+        reader_id = readers.get_reader_id(request, None)
+        self.assertNotIn("203.0.113.7", reader_id)
+        self.assertNotEqual(
+            reader_id,
+            readers.get_reader_id(
+                factory.get(
+                    "/", HTTP_X_FORWARDED_FOR="203.0.113.7", HTTP_USER_AGENT="b"
+                ),
+                None,
+            ),
+        )
+
+    def test_reader_id_ignores_spoofed_addresses(self):
+        factory = RequestFactory()
+        reader_id = readers.get_reader_id(
+            factory.get("/", HTTP_X_FORWARDED_FOR="203.0.113.7"), None
+        )
+        # Entries sent by the client come before the one the proxy appends
+        self.assertEqual(
+            reader_id,
+            readers.get_reader_id(
+                factory.get("/", HTTP_X_FORWARDED_FOR="10.0.0.2, 203.0.113.7"),
+                None,
+            ),
+        )
+        self.assertNotEqual(
+            reader_id,
+            readers.get_reader_id(
+                factory.get("/", HTTP_X_FORWARDED_FOR="203.0.113.7, 10.0.0.2"),
+                None,
+            ),
+        )
+
+        with override_settings(TRUSTED_PROXY_COUNT=2):
+            self.assertEqual(
+                reader_id,
+                readers.get_reader_id(
+                    factory.get(
+                        "/", HTTP_X_FORWARDED_FOR="10.0.0.2, 203.0.113.7, 10.0.0.3"
+                    ),
+                    None,
+                ),
+            )
+        with override_settings(TRUSTED_PROXY_COUNT=0):
+            self.assertEqual(
+                readers.get_reader_id(
+                    factory.get(
+                        "/", HTTP_X_FORWARDED_FOR="10.0.0.2", REMOTE_ADDR="203.0.113.7"
+                    ),
+                    None,
+                ),
+                reader_id,
+            )
+
+    def test_counts_unique_readers(self):
+        first, second = self.episodes
+        self.read(first, "p1", times=5)
+        self.read(first, "p2")
+        self.read(second, "p1")
+        self.read(second, "c3")
+        self.counter.flush()
+
+        self.assertEqual(
+            readers.get_unique_readers(
+                readers.EPISODE_READERS_CACHE_KEY, [first.id, second.id]
+            ),
+            {first.id: 2, second.id: 2},
+        )
+        self.assertEqual(self.series.get_unique_readers(), 3)
+
+    def test_merges_into_lifetime(self):
+        first, second = self.episodes
+        self.read(first, "p1")
+        self.read(second, "p2")
+        self.counter.flush()
+        self.assertEqual(readers.merge_readers(self.redis, self.now, chunk_size=1), 3)
+        # Nothing read since
+        self.assertEqual(readers.merge_readers(self.redis, self.now), 0)
+
+        for key_format, id, count in [
+            (readers.EPISODE_READERS_CACHE_KEY, first.id, 1),
+            (readers.SERIES_READERS_CACHE_KEY, self.series.id, 2),
+        ]:
+            lifetime_key = readers.get_readers_key(
+                key_format, id, readers.LIFETIME_PERIOD
+            )
+            self.assertEqual(self.redis.pfcount(lifetime_key), count)
+            self.assertEqual(self.redis.ttl(lifetime_key), -1)
+
+        # Lifetime readers outlive the daily HLLs
+        cache.delete_pattern("episode_*_readers_????-??-??")
+        self.assertEqual(first.get_unique_readers(), 1)
+
+    @override_settings(TREND_SCORE_WINDOW_DAYS=30)
+    def test_daily_readers_outlive_the_window(self):
+        first, _ = self.episodes
+        self.read(first, "p1")
+        self.counter.flush()
+        daily_key = readers.get_readers_key(
+            readers.EPISODE_READERS_CACHE_KEY,
+            first.id,
+            readers.get_day_period(self.now.date()),
+        )
+        self.assertGreater(
+            self.redis.ttl(daily_key), timedelta(days=31).total_seconds()
+        )
+
+    def test_recent_readers(self):
+        first, _ = self.episodes
+        self.read(first, "p1", times=3)
+        self.counter.flush()
+        self.assertEqual(
+            readers.get_recent_readers(
+                self.redis, self.now, timedelta(days=5), [first.id]
+            ),
+            {first.id: 1},
+        )
+        self.assertEqual(
+            readers.get_recent_readers(
+                self.redis, self.now + timedelta(days=6), timedelta(days=5), [first.id]
+            ),
+            {first.id: 0},
+        )
+
+    @override_settings(TREND_SCORE_USE_UNIQUE_READERS=True)
+    def test_trend_score_counts_readers(self):
+        first, second = self.episodes
+        Episode.objects.filter(id__in=[first.id, second.id]).update(
+            views=0, trend_score=0, publish_date=self.now - timedelta(days=1)
+        )
+        # Refreshes of one reader weigh as much as one read
+        with mock.patch("episode.models.view_counter", self.counter):
+            for _ in range(5):
+                first.incr_view("p1")
+            second.incr_view("p1")
+            second.incr_view("p2")
+            self.counter.flush()
+        trend.sync_views_and_trend_scores()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.views, 5)
+        self.assertAlmostEqual(second.trend_score, 2 * first.trend_score)
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+import numpy as np
+from django.test import SimpleTestCase
+from episode.service.scoring import TrendScoreConfig, compute_trend_scores
+
+HOUR = 60 * 60
+
+
+class TrendScoreTests(SimpleTestCase):
+    config = TrendScoreConfig(
+        like_weight=0.7,
+        view_weight=1.0,
+        half_life=timedelta(hours=24),
+        window=timedelta(days=5),
+    )
+
+    def score(self, likes, views, age_seconds):
+        return compute_trend_scores(
+            np.array(likes, dtype=np.float64),
+            np.array(views, dtype=np.float64),
+            np.array(age_seconds, dtype=np.float64),
+            self.config,
+        )
+
+    def test_weights(self):
+        scores = self.score([10, 0, 10], [0, 10, 10], [0, 0, 0])
+        np.testing.assert_allclose(scores, [7.0, 10.0, 17.0])
+
+    def test_half_life(self):
+        scores = self.score([0, 0, 0], [100, 100, 100], [0, 24 * HOUR, 48 * HOUR])
+        np.testing.assert_allclose(scores, [100.0, 50.0, 25.0])
+
+    def test_future_publish_date_is_not_boosted(self):
+        scores = self.score([0], [100], [-24 * HOUR])
+        np.testing.assert_allclose(scores, [100.0])
@@ -0,0 +1,118 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django_redis import get_redis_connection
+from episode.factory import EpisodeFactory
+from episode.service import view_counter as view_counter_module
+from episode.service.view_counter import (
+    DIRTY_EPISODES_CACHE_KEY,
+    ViewCounter,
+    get_views_key,
+    view_counter,
+)
+from redis.exceptions import RedisError
+
+
+class ViewCounterTests(TestCase):
+    def setUp(self):
+        # Ids are reused across test databases
+        self.episode_ids = [episode.id for episode in EpisodeFactory.create_batch(2)]
+        for episode_id in self.episode_ids:
+            cache.delete(get_views_key(episode_id))
+        cache.delete(DIRTY_EPISODES_CACHE_KEY)
+        self.counter = ViewCounter(flush_interval=60, flush_size=100)
+
+    def get_buffered_views(self, episode_id):
+        return cache.get(get_views_key(episode_id))
+
+    def test_coalesces_views(self):
+        first_id, second_id = self.episode_ids
+        for _ in range(3):
+            self.assertIsNone(self.counter.add(first_id))
+        self.counter.add(second_id)
+        self.assertEqual(self.counter.pending_cnt, 4)
+        self.assertEqual(self.counter.get_pending(first_id), 3)
+        self.assertIsNone(self.get_buffered_views(first_id))
+
+        with mock.patch.object(
+            view_counter_module.flush_latency, "record"
+        ) as record_latency:
+            self.assertEqual(self.counter.flush(), 4)
+        record_latency.assert_called_once()
+        self.assertEqual(self.counter.pending_cnt, 0)
+        self.assertEqual(self.get_buffered_views(first_id), 3)
+        self.assertEqual(self.get_buffered_views(second_id), 1)
+        self.assertSetEqual(
+            {
+                int(episode_id)
+                for episode_id in get_redis_connection("default").smembers(
+                    cache.make_key(DIRTY_EPISODES_CACHE_KEY)
+                )
+            },
+            set(self.episode_ids),
+        )
+        # Nothing left to flush
+        self.assertEqual(self.counter.flush(), 0)
+
+    def test_flushes_per_batch_size_and_interval(self):
+        episode_id = self.episode_ids[0]
+        counter = ViewCounter(flush_interval=60, flush_size=2)
+        self.assertIsNone(counter.add(episode_id))
+        # Flushed with the second view, the buffer is known from the flush
+        self.assertEqual(counter.add(episode_id), 2)
+        self.assertEqual(counter.add(episode_id), 3)
+        self.assertEqual(self.get_buffered_views(episode_id), 2)
+
+        counter = ViewCounter(flush_interval=0, flush_size=100)
+        self.assertEqual(counter.add(episode_id), 3)
+        self.assertEqual(self.get_buffered_views(episode_id), 3)
+
+    def test_flusher_thread_flushes_for_requests(self):
+        episode_id = self.episode_ids[0]
+        counter = ViewCounter(flush_interval=60, flush_size=2)
+        flushed = threading.Event()
+        flush = counter.flush
+        flush_threads = []
+
+        def flush_and_notify():
+            flush_threads.append(threading.current_thread().name)
+            num_views = flush()
+            flushed.set()
+            return num_views
+
+        with mock.patch.object(counter, "flush", side_effect=flush_and_notify):
+            counter.start_flusher()
+            counter.add(episode_id)
+            counter.add(episode_id)
+            self.assertTrue(flushed.wait(timeout=5))
+        self.assertEqual(flush_threads, ["episode-view-flusher"])
+        self.assertEqual(self.get_buffered_views(episode_id), 2)
+
+    def test_redis_failure_keeps_views_pending(self):
+        episode_id = self.episode_ids[0]
+        self.counter.add(episode_id)
+        with mock.patch(
+            "episode.service.view_counter.get_redis_connection",
+            side_effect=RedisError,
+        ):
+            self.assertEqual(self.counter.flush(), 0)
+        self.counter.add(episode_id)
+        self.assertEqual(self.counter.get_pending(episode_id), 2)
+
+        self.assertEqual(self.counter.flush(), 2)
+        self.assertEqual(self.get_buffered_views(episode_id), 2)
+
+    def test_episode_views_include_pending(self):
+        episode = EpisodeFactory(views=10)
+        episode.delete_cached_views()
+        with mock.patch.object(view_counter, "flush_interval", 60), mock.patch.object(
+            view_counter, "flush_size", 100
+        ):
+            episode.incr_view()
+            episode.incr_view()
+            self.assertEqual(view_counter.get_pending(episode.id), 2)
+            self.assertEqual(episode.get_views(), 12)
+            view_counter.flush()
+        self.assertEqual(episode.get_views(), 12)
@@ -0,0 +1,45 @@
+"""
+Per-day Redis hashes of episode id -> count, kept for as long as they are
+inside the trend window. A count over the window is the sum of the few
+hashes covering it, e.g. views and likes in the last TREND_SCORE_WINDOW_DAYS.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List
+
+from django.core.cache import cache
+
+
+def get_daily_key(key_format: str, day: date) -> str:
+    return cache.make_key(key_format.format(day=day.isoformat()))
+
+
+def get_window_days(now: datetime, window: timedelta) -> List[date]:
+    return [now.date() - timedelta(days=i) for i in range(window.days + 1)]
+
+
+def get_expire_at(day: date, window: timedelta) -> datetime:
+    # The hash of a day is read until the window no longer covers that day
+    return (
+        datetime.combine(day, time(), tzinfo=timezone.utc) + window + timedelta(days=2)
+    )
+
+
+def sum_daily_counts(
+    redis, key_format: str, now: datetime, window: timedelta, episode_ids: List[int]
+) -> Dict[int, int]:
+    """
+    Counts per episode id over the days covering the window, of the given
+    episodes only
+    """
+    if not episode_ids:
+        return {}
+    pipe = redis.pipeline(transaction=False)
+    for day in get_window_days(now, window):
+        pipe.hmget(get_daily_key(key_format, day), episode_ids)
+
+    counts = {}
+    for daily_counts in pipe.execute():
+        for episode_id, count in zip(episode_ids, daily_counts):
+            if count is not None:
+                counts[episode_id] = counts.get(episode_id, 0) + int(count)
+    return counts
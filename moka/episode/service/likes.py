@@ -0,0 +1,200 @@
+"""
+Likes of episodes, counted twice so that neither count scans LikeEpisode:
+
+- Episode.likes_count, kept in step with F() updates in the same transaction
+  as the LikeEpisode row.
+- Per-day Redis hashes of episode id -> likes made that day, which give the
+  likes within the trend window used by episode.service.scoring.
+
+An unlike takes the like out of the day it was made. reconcile_counts and
+rebuild_daily_likes recompute both from LikeEpisode, catching drift from
+cascading deletes (e.g. a deleted profile's likes), failed Redis writes or
+a flushed Redis.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from common.logger import StructuredLogger
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest, TruncDate
+from django_redis import get_redis_connection
+from episode.models import Episode, LikeEpisode
+from episode.service import daily_counts
+from episode.service.scoring import TrendScoreConfig
+from moka_profile.models import MokaProfile
+from redis.exceptions import RedisError
+
+logger = StructuredLogger(__name__)
+
+DAILY_LIKES_CACHE_KEY = "episode_daily_likes_{day}"
+RECONCILE_CHUNK_SIZE = 1000
+
+
+def get_daily_likes_key(day: date) -> str:
+    return daily_counts.get_daily_key(DAILY_LIKES_CACHE_KEY, day)
+
+
+def get_recent_likes(
+    redis, now: datetime, window: timedelta, episode_ids: List[int]
+) -> Dict[int, int]:
+    """
+    Likes per episode id over the days covering the window
+    """
+    return {
+        episode_id: likes
+        for episode_id, likes in daily_counts.sum_daily_counts(
+            redis, DAILY_LIKES_CACHE_KEY, now, window, episode_ids
+        ).items()
+        # An unlike can reach a bucket that lost the like to a Redis failure
+        if likes > 0
+    }
+
+
+def incr_daily_likes(episode_id: int, days: Iterable[date], amount: int):
+    """
+    Adds amount to the buckets of the given days that are still in the window
+    """
+    window = TrendScoreConfig.from_settings().window
+    oldest_day = daily_counts.get_window_days(datetime.now(timezone.utc), window)[-1]
+    days = [day for day in days if day >= oldest_day]
+    if not days:
+        return
+    try:
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+        for day in days:
+            daily_likes_key = get_daily_likes_key(day)
+            pipe.hincrby(daily_likes_key, episode_id, amount)
+            pipe.expireat(daily_likes_key, daily_counts.get_expire_at(day, window))
+        pipe.execute()
+    except RedisError:
+        # Like the view buffer, the trend score can miss a like until the
+        # next rebuild_daily_likes
+        logger.exception(
+            event_name="EPISODE_DAILY_LIKES_ERROR",
+            msg="Failed to count daily likes",
+            episode_id=episode_id,
+        )
+
+
+def like(episode: Episode, profile: MokaProfile) -> bool:
+    """
+    Returns whether the episode wasn't liked by the profile yet
+    """
+    with transaction.atomic():
+        liked, created = LikeEpisode.objects.get_or_create(
+            episode=episode, profile=profile
+        )
+        if created:
+            Episode.objects.filter(id=episode.id).update(
+                likes_count=F("likes_count") + 1
+            )
+    if created:
+        incr_daily_likes(episode.id, [liked.created_at.date()], 1)
+    return created
+
+
+def unlike(episode: Episode, profile: MokaProfile) -> bool:
+    """
+    Returns whether the episode was liked by the profile
+    """
+    with transaction.atomic():
+        # Concurrent unlikes wait here and then find nothing to remove
+        liked = (
+            LikeEpisode.objects.select_for_update()
+            .filter(episode=episode, profile=profile)
+            .first()
+        )
+        if liked is None:
+            return False
+        liked.delete()
+        Episode.objects.filter(id=episode.id).update(
+            likes_count=Greatest(F("likes_count") - 1, 0)
+        )
+    incr_daily_likes(episode.id, [liked.created_at.date()], -1)
+    return True
+
+
+def count_likes():
+    return Coalesce(
+        Subquery(
+            LikeEpisode.objects.filter(episode=OuterRef("pk"))
+            .order_by()
+            .values("episode")
+            .annotate(count=Count("id"))
+            .values("count"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def reconcile_counts(chunk_size: int = RECONCILE_CHUNK_SIZE) -> int:
+    """
+    Walks all episodes in id order. Returns the number of fixed episodes
+    """
+    fixed_cnt = 0
+    last_id = 0
+    while True:
+        episodes = list(
+            Episode.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "likes_count")[:chunk_size]
+        )
+        if not episodes:
+            return fixed_cnt
+        last_id = episodes[-1][0]
+
+        like_counts = dict(
+            LikeEpisode.objects.filter(
+                episode_id__in=[episode_id for episode_id, _ in episodes]
+            )
+            .values("episode")
+            .annotate(count=Count("id"))
+            .values_list("episode", "count")
+        )
+        drifted_ids = [
+            episode_id
+            for episode_id, likes_count in episodes
+            if likes_count != like_counts.get(episode_id, 0)
+        ]
+        if not drifted_ids:
+            continue
+
+        # Recount in the UPDATE so likes since the read above are not lost
+        Episode.objects.filter(id__in=drifted_ids).update(likes_count=count_likes())
+        fixed_cnt += len(drifted_ids)
+
+
+def rebuild_daily_likes(now: Optional[datetime] = None) -> int:
+    """
+    Rewrites the buckets of every day in the window from LikeEpisode. Likes
+    made while a bucket is being rewritten can be missed until the next
+    rebuild. Returns the number of likes in the window.
+    """
+    now = now or datetime.now(timezone.utc)
+    window = TrendScoreConfig.from_settings().window
+    days = daily_counts.get_window_days(now, window)
+
+    likes_by_day = {day: {} for day in days}
+    for day, episode_id, count in (
+        LikeEpisode.objects.filter(
+            created_at__gte=datetime.combine(days[-1], time(), tzinfo=timezone.utc)
+        )
+        .annotate(day=TruncDate("created_at", tzinfo=timezone.utc))
+        .values("day", "episode")
+        .annotate(count=Count("id"))
+        .values_list("day", "episode", "count")
+    ):
+        if day in likes_by_day:
+            likes_by_day[day][episode_id] = count
+
+    pipe = get_redis_connection("default").pipeline(transaction=True)
+    for day, daily_likes in likes_by_day.items():
+        daily_likes_key = get_daily_likes_key(day)
+        pipe.delete(daily_likes_key)
+        if daily_likes:
+            pipe.hset(daily_likes_key, mapping=daily_likes)
+            pipe.expireat(daily_likes_key, daily_counts.get_expire_at(day, window))
+    pipe.execute()
+    return sum(sum(daily_likes.values()) for daily_likes in likes_by_day.values())
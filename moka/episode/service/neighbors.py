@@ -0,0 +1,187 @@
+"""
+Redis index of the visible episodes of each series, ordered by episode
+number, backing next/prev navigation and jumping to an episode number.
+
+NEIGHBORS_CACHE_KEY is one hash of episode id -> "series_id:prev_id:next_id"
+so that both neighbors of an episode are a single HGET. Each series also has
+a hash of episode number -> episode id. A series is rewritten as a whole by
+rebuild_series whenever one of its episodes is published, reordered, deleted
+or banned (episode.signals.handlers). Series that were never indexed are
+built on first read, and reads fall back to Postgres when Redis is down.
+"""
+import bisect
+from typing import List, NamedTuple, Optional, Tuple
+
+from common.logger import StructuredLogger
+from discovery.service.feed_index import get_visible_episodes
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from episode.models import Episode
+from redis.exceptions import RedisError
+
+logger = StructuredLogger(__name__)
+
+NEIGHBORS_CACHE_KEY = "episode_neighbors"
+SERIES_EPISODES_CACHE_KEY = "series_{series_id}_episode_numbers"
+# Marks a series as indexed, series without visible episodes have no other field
+BUILT_FIELD = "built"
+
+
+class Neighbors(NamedTuple):
+    series_id: int
+    prev_id: Optional[int]
+    next_id: Optional[int]
+
+
+def get_neighbors_key() -> str:
+    return cache.make_key(NEIGHBORS_CACHE_KEY)
+
+
+def get_series_key(series_id: int) -> str:
+    return cache.make_key(SERIES_EPISODES_CACHE_KEY.format(series_id=series_id))
+
+
+def encode_neighbors(neighbors: Neighbors) -> str:
+    return ":".join("" if value is None else str(value) for value in neighbors)
+
+
+def decode_neighbors(value: bytes) -> Neighbors:
+    series_id, prev_id, next_id = value.decode().split(":")
+    return Neighbors(
+        int(series_id),
+        int(prev_id) if prev_id else None,
+        int(next_id) if next_id else None,
+    )
+
+
+def get_series_episodes(series_id: int) -> List[Tuple[int, int]]:
+    """
+    (episode number, episode id) of the visible episodes, in reading order
+    """
+    return list(
+        get_visible_episodes()
+        .filter(series_id=series_id)
+        .order_by("episode_number", "id")
+        .values_list("episode_number", "id")
+    )
+
+
+def rebuild_series(series_id: int) -> List[Tuple[int, int]]:
+    episodes = get_series_episodes(series_id)
+    episode_ids = [episode_id for _, episode_id in episodes]
+    try:
+        redis = get_redis_connection("default")
+        series_key = get_series_key(series_id)
+        indexed_ids = {
+            int(episode_id)
+            for field, episode_id in redis.hgetall(series_key).items()
+            if field != BUILT_FIELD.encode()
+        }
+
+        pipe = redis.pipeline()
+        pipe.delete(series_key)
+        pipe.hset(
+            series_key,
+            mapping={BUILT_FIELD: 1, **dict(episodes)},
+        )
+        removed_ids = indexed_ids - set(episode_ids)
+        if removed_ids:
+            pipe.hdel(get_neighbors_key(), *removed_ids)
+        if episode_ids:
+            pipe.hset(
+                get_neighbors_key(),
+                mapping={
+                    episode_id: encode_neighbors(
+                        Neighbors(
+                            series_id,
+                            episode_ids[idx - 1] if idx > 0 else None,
+                            episode_ids[idx + 1]
+                            if idx + 1 < len(episode_ids)
+                            else None,
+                        )
+                    )
+                    for idx, episode_id in enumerate(episode_ids)
+                },
+            )
+        pipe.execute()
+    except RedisError:
+        logger.exception(
+            event_name="EPISODE_NEIGHBORS_REBUILD_ERROR",
+            msg="Failed to rebuild episode neighbors",
+            series_id=series_id,
+        )
+    return episodes
+
+
+def get_indexed_series_episodes(series_id: int) -> List[Tuple[int, int]]:
+    try:
+        indexed = get_redis_connection("default").hgetall(get_series_key(series_id))
+    except RedisError:
+        logger.exception(
+            event_name="EPISODE_NEIGHBORS_READ_ERROR",
+            msg="Failed to read episode neighbors",
+            series_id=series_id,
+        )
+        return get_series_episodes(series_id)
+    if BUILT_FIELD.encode() not in indexed:
+        return rebuild_series(series_id)
+    return sorted(
+        (int(number), int(episode_id))
+        for number, episode_id in indexed.items()
+        if number != BUILT_FIELD.encode()
+    )
+
+
+def get_neighbors(episode_id: int) -> Optional[Neighbors]:
+    """
+    Previous and next visible episodes of the series, None if the episode
+    doesn't exist
+    """
+    try:
+        value = get_redis_connection("default").hget(get_neighbors_key(), episode_id)
+        if value is not None:
+            return decode_neighbors(value)
+    except RedisError:
+        logger.exception(
+            event_name="EPISODE_NEIGHBORS_READ_ERROR",
+            msg="Failed to read episode neighbors",
+            episode_id=episode_id,
+        )
+
+    # The series was never indexed, or the episode itself isn't visible
+    episode = (
+        Episode.objects.filter(id=episode_id)
+        .values_list("series_id", "episode_number")
+        .first()
+    )
+    if episode is None:
+        return None
+    series_id, episode_number = episode
+    episodes = get_indexed_series_episodes(series_id)
+    numbers = [number for number, _ in episodes]
+    before = bisect.bisect_left(numbers, episode_number)
+    after = bisect.bisect_right(numbers, episode_number)
+    return Neighbors(
+        series_id,
+        episodes[before - 1][1] if before > 0 else None,
+        episodes[after][1] if after < len(episodes) else None,
+    )
+
+
+def get_episode_id(series_id: int, episode_number: int) -> Optional[int]:
+    """
+    Visible episode of the series with the given number
+    """
+    try:
+        episode_id, built = get_redis_connection("default").hmget(
+            get_series_key(series_id), [episode_number, BUILT_FIELD]
+        )
+        if built is not None:
+            return int(episode_id) if episode_id is not None else None
+    except RedisError:
+        logger.exception(
+            event_name="EPISODE_NEIGHBORS_READ_ERROR",
+            msg="Failed to read episode neighbors",
+            series_id=series_id,
+        )
+    return dict(get_indexed_series_episodes(series_id)).get(episode_number)
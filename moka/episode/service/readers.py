@@ -0,0 +1,192 @@
+"""
+Unique readers of episodes and series. Unlike views, refreshes of the same
+reader count once. Readers are counted with Redis HyperLogLogs, so memory
+per episode stays constant (at most 12kB per key) whatever their number.
+
+A reader is the profile id, or for anonymous readers a keyed hash of the
+client address and user agent so that neither is stored. Reads are added
+to per-day HLLs of the episode and its series by the view counter flush
+(episode.service.view_counter). merge_readers, run with the trend sync,
+PFMERGEs the daily HLLs of recently read episodes and series into lifetime
+ones. Daily HLLs are kept long enough to count readers within the trend
+window.
+"""
+import hashlib
+import hmac
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from common.logger import StructuredLogger
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = StructuredLogger(__name__)
+
+EPISODE_READERS_CACHE_KEY = "episode_{id}_readers_{period}"
+SERIES_READERS_CACHE_KEY = "series_{id}_readers_{period}"
+LIFETIME_PERIOD = "lifetime"
+# Ids read since the last merge
+DIRTY_EPISODE_READERS_CACHE_KEY = "episode_readers_dirty_ids"
+DIRTY_SERIES_READERS_CACHE_KEY = "series_readers_dirty_ids"
+
+# Merges also cover the previous days, in case a run was skipped
+MERGE_DAYS = 2
+MERGE_CHUNK_SIZE = 500
+COUNT_CHUNK_SIZE = 1000
+
+
+def get_client_address(request) -> str:
+    """
+    The address the trusted proxies saw, clients can prepend any entry to
+    X-Forwarded-For
+    """
+    forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
+    if not settings.TRUSTED_PROXY_COUNT or not forwarded_for:
+        return request.META.get("REMOTE_ADDR", "")
+    entries = [entry.strip() for entry in forwarded_for.split(",")]
+    return entries[-min(settings.TRUSTED_PROXY_COUNT, len(entries))]
+
+
+def get_reader_id(request, profile) -> str:
+    if profile is not None:
+        return f"p{profile.id}"
+    address = get_client_address(request)
+    user_agent = request.META.get("HTTP_USER_AGENT", "")
+    fingerprint = hmac.new(
+        settings.SECRET_KEY.encode(),
+        f"{address}|{user_agent}".encode(),
+        hashlib.sha256,
+    ).hexdigest()
+    return f"c{fingerprint[:16]}"
+
+
+def get_day_period(day: date) -> str:
+    return day.isoformat()
+
+
+def get_daily_readers_ttl() -> timedelta:
+    # The trend window covers TREND_SCORE_WINDOW_DAYS and today, plus a day
+    # of slack
+    return timedelta(days=settings.TREND_SCORE_WINDOW_DAYS + 2)
+
+
+def get_readers_key(key_format: str, id: int, period: str) -> str:
+    return cache.make_key(key_format.format(id=id, period=period))
+
+
+def add_reads(
+    pipe,
+    reads: Dict[int, Tuple[Optional[int], Set[str]]],
+    day: date,
+):
+    """
+    Queues PFADDs of readers per episode id, along with its series id
+    """
+    ttl = get_daily_readers_ttl()
+    series_reads = {}
+    for episode_id, (series_id, reader_ids) in reads.items():
+        key = get_readers_key(
+            EPISODE_READERS_CACHE_KEY, episode_id, get_day_period(day)
+        )
+        pipe.pfadd(key, *reader_ids)
+        pipe.expire(key, ttl)
+        if series_id is not None:
+            series_reads.setdefault(series_id, set()).update(reader_ids)
+    for series_id, reader_ids in series_reads.items():
+        key = get_readers_key(SERIES_READERS_CACHE_KEY, series_id, get_day_period(day))
+        pipe.pfadd(key, *reader_ids)
+        pipe.expire(key, ttl)
+
+    pipe.sadd(cache.make_key(DIRTY_EPISODE_READERS_CACHE_KEY), *reads.keys())
+    if series_reads:
+        pipe.sadd(cache.make_key(DIRTY_SERIES_READERS_CACHE_KEY), *series_reads.keys())
+
+
+def merge_readers(redis, now: datetime, chunk_size: int = MERGE_CHUNK_SIZE) -> int:
+    """
+    Returns the number of merged episodes and series
+    """
+    days = [now.date() - timedelta(days=i) for i in range(MERGE_DAYS)]
+    merged_cnt = 0
+    for key_format, dirty_key in [
+        (EPISODE_READERS_CACHE_KEY, DIRTY_EPISODE_READERS_CACHE_KEY),
+        (SERIES_READERS_CACHE_KEY, DIRTY_SERIES_READERS_CACHE_KEY),
+    ]:
+        dirty_key = cache.make_key(dirty_key)
+        # Ids read during the run are left for the next one
+        remaining = redis.scard(dirty_key)
+        while remaining > 0:
+            ids = redis.spop(dirty_key, min(chunk_size, remaining))
+            if not ids:
+                break
+            remaining -= len(ids)
+
+            pipe = redis.pipeline(transaction=False)
+            for id in ids:
+                id = int(id)
+                lifetime_key = get_readers_key(key_format, id, LIFETIME_PERIOD)
+                pipe.pfmerge(
+                    lifetime_key,
+                    *[
+                        get_readers_key(key_format, id, get_day_period(day))
+                        for day in days
+                    ],
+                )
+            pipe.execute()
+            merged_cnt += len(ids)
+    return merged_cnt
+
+
+def count_readers(
+    redis, key_format: str, ids: List[int], periods: List[str]
+) -> Dict[int, int]:
+    """
+    Readers of the union of the periods per id, with pipelined PFCOUNTs
+    """
+    counts = {}
+    for start in range(0, len(ids), COUNT_CHUNK_SIZE):
+        chunk = ids[start : start + COUNT_CHUNK_SIZE]
+        pipe = redis.pipeline(transaction=False)
+        for id in chunk:
+            pipe.pfcount(
+                *[get_readers_key(key_format, id, period) for period in periods]
+            )
+        counts.update(zip(chunk, pipe.execute()))
+    return counts
+
+
+def get_unique_readers(
+    key_format: str, ids: Iterable[int], now: Optional[datetime] = None
+) -> Dict[int, int]:
+    """
+    Lifetime readers per id, including the days not merged yet
+    """
+    ids = list(ids)
+    if not ids:
+        return {}
+    now = now or datetime.now(timezone.utc)
+    periods = [LIFETIME_PERIOD] + [
+        get_day_period(now.date() - timedelta(days=i)) for i in range(MERGE_DAYS)
+    ]
+    try:
+        return count_readers(get_redis_connection("default"), key_format, ids, periods)
+    except RedisError:
+        logger.exception(
+            event_name="EPISODE_READERS_READ_ERROR",
+            msg="Failed to count unique readers",
+        )
+        return {}
+
+
+def get_recent_readers(
+    redis, now: datetime, window: timedelta, episode_ids: List[int]
+) -> Dict[int, int]:
+    """
+    Readers per episode id over the days covering the window
+    """
+    periods = [
+        get_day_period(now.date() - timedelta(days=i)) for i in range(window.days + 1)
+    ]
+    return count_readers(redis, EPISODE_READERS_CACHE_KEY, episode_ids, periods)
@@ -0,0 +1,115 @@
+"""
+Time-decayed trend scores, computed for every trending candidate at once.
+
+    score = (like_weight * likes_in_window + view_weight * views_in_window)
+            * 0.5 ** (hours_since_publish / half_life_hours)
+
+where views can be unique readers instead, see TrendScoreConfig.
+
+Columns are loaded with one query into NumPy arrays, scored in vectorized
+form and only changed scores are written back, in chunks.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+import numpy as np
+from discovery.service import feed_index
+from django.conf import settings
+from episode.models import Episode
+
+WRITE_CHUNK_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class TrendScoreConfig:
+    like_weight: float
+    view_weight: float
+    half_life: timedelta
+    window: timedelta
+    # Count unique readers instead of views, see episode.service.readers
+    use_unique_readers: bool = False
+
+    @staticmethod
+    def from_settings() -> "TrendScoreConfig":
+        return TrendScoreConfig(
+            like_weight=settings.TREND_SCORE_LIKE_WEIGHT,
+            view_weight=settings.TREND_SCORE_VIEW_WEIGHT,
+            half_life=timedelta(hours=settings.TREND_SCORE_HALF_LIFE_HOURS),
+            window=timedelta(days=settings.TREND_SCORE_WINDOW_DAYS),
+            use_unique_readers=settings.TREND_SCORE_USE_UNIQUE_READERS,
+        )
+
+
+def compute_trend_scores(
+    recent_likes: np.ndarray,
+    recent_views: np.ndarray,
+    age_seconds: np.ndarray,
+    config: TrendScoreConfig,
+) -> np.ndarray:
+    # Scheduled episodes can be slightly in the future, don't boost them
+    age_seconds = np.maximum(age_seconds, 0)
+    decay = np.exp2(-age_seconds / config.half_life.total_seconds())
+    return (
+        config.like_weight * recent_likes + config.view_weight * recent_views
+    ) * decay
+
+
+def get_candidates(now: datetime):
+    return (
+        feed_index.get_trending_feed_queryset(now)
+        .select_related(None)
+        .order_by()
+        .values_list("id", "publish_date", "trend_score")
+    )
+
+
+def update_trend_scores(
+    now: datetime,
+    get_recent_views: Callable[[List[int]], Dict[int, int]],
+    get_recent_likes: Callable[[List[int]], Dict[int, int]],
+    config: TrendScoreConfig = None,
+    chunk_size: int = WRITE_CHUNK_SIZE,
+) -> int:
+    """
+    get_recent_views and get_recent_likes return views and likes within the
+    window per id of the given candidates. Also
+    replaces the trending feed index. Returns the number of updated episodes
+    """
+    config = config or TrendScoreConfig.from_settings()
+    rows = list(get_candidates(now))
+    if not rows:
+        feed_index.replace_trending([], [])
+        return 0
+
+    num_rows = len(rows)
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=num_rows)
+    publish_timestamps = np.fromiter(
+        (row[1].timestamp() for row in rows), dtype=np.float64, count=num_rows
+    )
+    old_scores = np.fromiter((row[2] for row in rows), dtype=np.float64, count=num_rows)
+
+    candidate_ids = ids.tolist()
+    views_by_id = get_recent_views(candidate_ids)
+    recent_views = np.fromiter(
+        (views_by_id.get(row[0], 0) for row in rows), dtype=np.float64, count=num_rows
+    )
+    likes_by_id = get_recent_likes(candidate_ids)
+    recent_likes = np.fromiter(
+        (likes_by_id.get(row[0], 0) for row in rows), dtype=np.float64, count=num_rows
+    )
+
+    scores = compute_trend_scores(
+        recent_likes, recent_views, now.timestamp() - publish_timestamps, config
+    )
+
+    changed = np.flatnonzero(~np.isclose(scores, old_scores, rtol=1e-6, atol=1e-9))
+    for start in range(0, len(changed), chunk_size):
+        chunk = changed[start : start + chunk_size]
+        Episode.objects.bulk_update(
+            [Episode(id=int(ids[i]), trend_score=float(scores[i])) for i in chunk],
+            ["trend_score"],
+        )
+
+    feed_index.replace_trending(ids, scores)
+    return len(changed)
@@ -0,0 +1,148 @@
+"""
+Moves buffered views from Redis into Postgres and refreshes trend scores.
+
+Only episodes in the dirty set (viewed since the last run) have their
+views synced, so that part costs as much as the activity since the previous
+run. Synced views are also added to per-day Redis hashes, which give the
+windowed view counts used by episode.service.scoring, like the daily like
+hashes of episode.service.likes. Daily unique reader HLLs are merged into
+lifetime ones, and replace views in the scores when
+TREND_SCORE_USE_UNIQUE_READERS is set.
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from django.core.cache import cache
+from django.db.models import Case, F, PositiveBigIntegerField, Value, When
+from django.utils import timezone
+from django_redis import get_redis_connection
+from episode.models import Episode
+from episode.service import daily_counts, likes, readers, scoring
+from episode.service.view_counter import (
+    DIRTY_EPISODES_CACHE_KEY,
+    get_views_key,
+    view_counter,
+)
+from series.models import Series
+
+SYNC_CHUNK_SIZE = 500
+DAILY_VIEWS_CACHE_KEY = "episode_daily_views_{day}"
+
+
+def get_daily_views_key(day: date) -> str:
+    return daily_counts.get_daily_key(DAILY_VIEWS_CACHE_KEY, day)
+
+
+def get_recent_views(
+    redis, now: datetime, window: timedelta, episode_ids: List[int]
+) -> Dict[int, int]:
+    """
+    Views per episode id over the days covering the window
+    """
+    return daily_counts.sum_daily_counts(
+        redis, DAILY_VIEWS_CACHE_KEY, now, window, episode_ids
+    )
+
+
+def add_views(views_by_id: Dict[int, int]):
+    # A delta, so that overlapping runs don't overwrite each other's views
+    Episode.objects.filter(id__in=views_by_id.keys()).update(
+        views=F("views")
+        + Case(
+            *[
+                When(id=episode_id, then=Value(views))
+                for episode_id, views in views_by_id.items()
+            ],
+            default=Value(0),
+            output_field=PositiveBigIntegerField(),
+        )
+    )
+
+
+def sync_chunk(redis, episode_ids: List[int], now: datetime, window: timedelta):
+    # Views of other episodes stay buffered, get_views still counts them
+    synced_ids = list(
+        Episode.objects.filter(
+            id__in=episode_ids,
+            status=Episode.EpisodeStatus.PUBLIC,
+            series__status=Series.SeriesStatus.PUBLIC,
+        ).values_list("id", flat=True)
+    )
+    if not synced_ids:
+        return
+
+    # Views that arrive after GETSET stay in the buffer for the next run
+    pipe = redis.pipeline(transaction=False)
+    for episode_id in synced_ids:
+        pipe.getset(cache.make_key(get_views_key(episode_id)), 0)
+    views_by_id = {
+        episode_id: int(views)
+        for episode_id, views in zip(synced_ids, pipe.execute())
+        if views and int(views)
+    }
+    if not views_by_id:
+        return
+
+    try:
+        add_views(views_by_id)
+    except Exception:
+        # Hand the drained views back so the next run retries them
+        pipe = redis.pipeline(transaction=False)
+        for episode_id, views in views_by_id.items():
+            pipe.incrby(cache.make_key(get_views_key(episode_id)), views)
+        pipe.sadd(cache.make_key(DIRTY_EPISODES_CACHE_KEY), *episode_ids)
+        pipe.execute()
+        raise
+
+    daily_views_key = get_daily_views_key(now.date())
+    pipe = redis.pipeline(transaction=False)
+    for episode_id, views in views_by_id.items():
+        pipe.hincrby(daily_views_key, episode_id, views)
+    pipe.expireat(daily_views_key, daily_counts.get_expire_at(now.date(), window))
+    pipe.execute()
+
+
+def sync_views_and_trend_scores(chunk_size: int = SYNC_CHUNK_SIZE) -> int:
+    """
+    Returns the number of episodes whose trend score changed
+    """
+    # Views of other workers are flushed within their flush interval
+    view_counter.flush()
+    now = timezone.now()
+    config = scoring.TrendScoreConfig.from_settings()
+    redis = get_redis_connection("default")
+    dirty_key = cache.make_key(DIRTY_EPISODES_CACHE_KEY)
+
+    # Only drain what is there now, episodes marked during the run are left
+    # for the next one
+    remaining = redis.scard(dirty_key)
+    while remaining > 0:
+        episode_ids = [
+            int(episode_id)
+            for episode_id in redis.spop(dirty_key, min(chunk_size, remaining))
+        ]
+        if not episode_ids:
+            break
+        remaining -= len(episode_ids)
+        sync_chunk(redis, episode_ids, now, config.window)
+
+    readers.merge_readers(redis, now)
+
+    if config.use_unique_readers:
+
+        def get_recent_reads(episode_ids):
+            return readers.get_recent_readers(redis, now, config.window, episode_ids)
+
+    else:
+
+        def get_recent_reads(episode_ids):
+            return get_recent_views(redis, now, config.window, episode_ids)
+
+    return scoring.update_trend_scores(
+        now,
+        get_recent_views=get_recent_reads,
+        get_recent_likes=lambda episode_ids: likes.get_recent_likes(
+            redis, now, config.window, episode_ids
+        ),
+        config=config,
+    )
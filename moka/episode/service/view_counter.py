@@ -0,0 +1,230 @@
+"""
+Per-process accumulator of episode views.
+
+Reading an episode only bumps an in-memory count. Counts are moved to the
+Redis view buffers (see Episode.get_cache_key) with one pipelined INCRBY
+batch, which also marks the episodes dirty for the next trend sync, once
+flush_interval has passed or flush_size views are pending. Under gunicorn a
+background thread (config/gunicorn_conf.py) runs the flushes, so that no
+request waits on the Redis round trip, and also flushes idle workers.
+worker_exit flushes what is left at shutdown. Without that thread, e.g. in
+management commands, the view that triggers a flush runs it.
+
+The same flush adds the readers of the episodes to their unique reader
+HLLs (episode.service.readers). Views pending in this process are added
+to the buffered views we display.
+
+Flush latency, flushed views and pending views are exported as
+OpenTelemetry metrics.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from common.logger import StructuredLogger
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from episode.service import readers
+from opentelemetry import metrics
+from redis.exceptions import RedisError
+
+logger = StructuredLogger(__name__)
+meter = metrics.get_meter(__name__)
+
+VIEWS_CACHE_KEY = "episode_{episode_id}_views"
+# Ids of episodes viewed since the last trend sync
+DIRTY_EPISODES_CACHE_KEY = "episode_dirty_ids"
+
+
+def get_views_key(episode_id: int) -> str:
+    return VIEWS_CACHE_KEY.format(episode_id=episode_id)
+
+
+flush_latency = meter.create_histogram(
+    "episode.view_counter.flush_latency",
+    unit="ms",
+    description="Duration of the pipelined flush of pending views to Redis",
+)
+flushed_views = meter.create_counter(
+    "episode.view_counter.flushed_views",
+    description="Views moved from the process to the Redis view buffers",
+)
+
+
+class ViewCounter:
+    def __init__(self, flush_interval: float, flush_size: int):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._lock = threading.Lock()
+        # Flushes run one at a time so that failed ones are put back in order
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[int, int] = {}
+        self._pending_cnt = 0
+        # episode id -> (series id, reader ids)
+        self._pending_reads: Dict[int, Tuple[Optional[int], Set[str]]] = {}
+        self._last_flush_at = time.monotonic()
+        # Buffered views returned by the last flush
+        self._flushed: Dict[int, int] = {}
+        self._flusher: Optional[threading.Thread] = None
+        self._flush_requested = threading.Event()
+        self._pid = os.getpid()
+
+    @property
+    def pending_cnt(self) -> int:
+        return self._pending_cnt
+
+    def add(
+        self,
+        episode_id: int,
+        series_id: Optional[int] = None,
+        reader_id: Optional[str] = None,
+    ) -> Optional[int]:
+        """
+        Counts a view, and the reader when given. Returns the buffered views
+        of the episode including this one when the last flush knows them,
+        None otherwise.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._reset_after_fork()
+            self._pending[episode_id] = self._pending.get(episode_id, 0) + 1
+            self._pending_cnt += 1
+            if reader_id is not None:
+                _, reader_ids = self._pending_reads.setdefault(
+                    episode_id, (series_id, set())
+                )
+                reader_ids.add(reader_id)
+            should_flush = (
+                self._pending_cnt >= self.flush_size
+                or now - self._last_flush_at >= self.flush_interval
+            )
+            has_flusher = self._flusher is not None
+        if should_flush:
+            if has_flusher:
+                self._flush_requested.set()
+            else:
+                self.flush()
+
+        with self._lock:
+            flushed = self._flushed.get(episode_id)
+            if flushed is None:
+                return None
+            return flushed + self._pending.get(episode_id, 0)
+
+    def get_pending(self, episode_id: int) -> int:
+        with self._lock:
+            return self._pending.get(episode_id, 0)
+
+    def discard(self, episode_ids: Iterable[int]):
+        with self._lock:
+            for episode_id in episode_ids:
+                self._pending_cnt -= self._pending.pop(episode_id, 0)
+                self._pending_reads.pop(episode_id, None)
+                self._flushed.pop(episode_id, None)
+
+    def flush(self) -> int:
+        """
+        Returns the number of flushed views. Views that could not be flushed
+        stay pending for the next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                pending_reads, self._pending_reads = self._pending_reads, {}
+                self._pending_cnt = 0
+                self._last_flush_at = time.monotonic()
+            if not pending:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                pipe = get_redis_connection("default").pipeline(transaction=False)
+                for episode_id, views in pending.items():
+                    pipe.incrby(cache.make_key(get_views_key(episode_id)), views)
+                pipe.sadd(cache.make_key(DIRTY_EPISODES_CACHE_KEY), *pending.keys())
+                if pending_reads:
+                    readers.add_reads(
+                        pipe, pending_reads, datetime.now(timezone.utc).date()
+                    )
+                buffer_views = pipe.execute()[: len(pending)]
+            except RedisError:
+                # Like the cache's IGNORE_EXCEPTIONS, losing Redis must not
+                # fail the request, retry with the next flush
+                logger.exception(
+                    event_name="EPISODE_VIEW_FLUSH_ERROR",
+                    msg="Failed to flush views",
+                    num_episodes=len(pending),
+                )
+                with self._lock:
+                    for episode_id, views in pending.items():
+                        self._pending[episode_id] = (
+                            self._pending.get(episode_id, 0) + views
+                        )
+                        self._pending_cnt += views
+                    for episode_id, (series_id, reader_ids) in pending_reads.items():
+                        _, pending_reader_ids = self._pending_reads.setdefault(
+                            episode_id, (series_id, set())
+                        )
+                        pending_reader_ids.update(reader_ids)
+                return 0
+            flush_latency.record((time.perf_counter() - start) * 1000)
+
+            num_views = sum(pending.values())
+            flushed_views.add(num_views)
+            with self._lock:
+                # Only what this flush returned is recent enough to display
+                self._flushed = dict(zip(pending.keys(), buffer_views))
+            return num_views
+
+    def start_flusher(self):
+        """
+        Flushes from a daemon thread when views ask for it, and every
+        flush_interval so that views of an idle worker don't wait for the
+        next view
+        """
+        with self._lock:
+            self._reset_after_fork()
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(
+                target=self._run_flusher, name="episode-view-flusher", daemon=True
+            )
+        self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            requested = self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            if (
+                requested
+                or time.monotonic() - self._last_flush_at >= self.flush_interval
+            ):
+                self.flush()
+
+    def _reset_after_fork(self):
+        # Counts and threads of the parent are not ours, e.g. with --preload
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pending = {}
+            self._pending_cnt = 0
+            self._pending_reads = {}
+            self._flushed = {}
+            self._flusher = None
+            self._flush_requested = threading.Event()
+
+
+view_counter = ViewCounter(
+    flush_interval=settings.EPISODE_VIEW_FLUSH_INTERVAL_MS / 1000,
+    flush_size=settings.EPISODE_VIEW_FLUSH_SIZE,
+)
+
+meter.create_observable_gauge(
+    "episode.view_counter.pending",
+    callbacks=[
+        lambda options: [metrics.Observation(view_counter.pending_cnt)],
+    ],
+    description="Views counted in the process and not flushed yet",
+)
@@ -0,0 +1,61 @@
+from common.field_tracker import FieldTracker
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from episode.models import Episode
+from episode.service import neighbors
+from moka_profile.models import MokaProfile
+from series.models import Series
+
+# Neighbor index rebuilds run after commit so they read the committed rows.
+# Saves that don't change the order or visibility of episodes are skipped.
+
+# Attributes ordering episodes or hiding them, see discovery's get_visible_episodes
+NEIGHBOR_FIELDS = {
+    Episode: {"episode_number", "status", "is_banned", "series_id"},
+    Series: {"status", "is_banned"},
+    MokaProfile: {"is_banned"},
+}
+neighbor_fields = FieldTracker("episode_neighbors", NEIGHBOR_FIELDS)
+
+
+@receiver(post_save, sender=Episode)
+def rebuild_episode_neighbors(sender, instance, created, update_fields, **kwargs):
+    changes = neighbor_fields.pop_changes(instance, created, update_fields)
+    if not changes:
+        return
+    series_ids = {instance.series_id}
+    # Moved to another series
+    if changes.get("series_id") is not None:
+        series_ids.add(changes["series_id"])
+
+    def rebuild():
+        for series_id in series_ids:
+            neighbors.rebuild_series(series_id)
+
+    transaction.on_commit(rebuild)
+
+
+@receiver(post_delete, sender=Episode)
+def rebuild_deleted_episode_neighbors(sender, instance, **kwargs):
+    series_id = instance.series_id
+    transaction.on_commit(lambda: neighbors.rebuild_series(series_id))
+
+
+@receiver(post_save, sender=Series)
+def rebuild_series_neighbors(sender, instance, created, update_fields, **kwargs):
+    if neighbor_fields.pop_changes(instance, created, update_fields):
+        transaction.on_commit(lambda: neighbors.rebuild_series(instance.id))
+
+
+@receiver(post_save, sender=MokaProfile)
+def rebuild_profile_neighbors(sender, instance, created, update_fields, **kwargs):
+    # New profiles own no series yet
+    if created or not neighbor_fields.pop_changes(instance, created, update_fields):
+        return
+
+    def rebuild():
+        for series_id in instance.owning_series.values_list("id", flat=True):
+            neighbors.rebuild_series(series_id)
+
+    transaction.on_commit(rebuild)
@@ -0,0 +1,44 @@
+import threading
+from unittest.mock import patch
+
+from django.test import TestCase
+from image.gateway.cloudflare.gateway import CloudflareImagesGateway
+from image.gateway.registry import clear_gateways, get_gateway
+
+
+class GatewayRegistryTests(TestCase):
+    def setUp(self):
+        clear_gateways()
+        self.addCleanup(clear_gateways)
+
+    def test_same_instance_per_gateway_class(self):
+        gateway = get_gateway(CloudflareImagesGateway)
+        self.assertIsInstance(gateway, CloudflareImagesGateway)
+        self.assertIs(get_gateway(CloudflareImagesGateway), gateway)
+
+    def test_constructed_once_across_threads(self):
+        with patch.object(
+            CloudflareImagesGateway,
+            "__init__",
+            return_value=None,
+        ) as mock_init:
+            gateways = []
+            threads = [
+                threading.Thread(
+                    target=lambda: gateways.append(get_gateway(CloudflareImagesGateway))
+                )
+                for _ in range(16)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            mock_init.assert_called_once()
+            self.assertEqual(len(gateways), 16)
+            self.assertEqual(len({id(gateway) for gateway in gateways}), 1)
+
+    def test_clear_gateways(self):
+        gateway = get_gateway(CloudflareImagesGateway)
+        clear_gateways()
+        self.assertIsNot(get_gateway(CloudflareImagesGateway), gateway)
@@ -1,4 +1,5 @@
 from abc import abstractmethod
+from typing import List
 
 
 class ImageStorageGateway:
@@ -19,6 +20,16 @@ class ImageStorageGateway:
     def get_view_url(self, external_id: str, variant_name: str):
         raise NotImplementedError
 
+    def get_view_urls(self, external_ids: List[str], variant_name: str = None):
+        """
+        Batch version of get_view_url. Override if the provider can do better
+        than one call per image.
+        """
+        return [
+            self.get_view_url(external_id=external_id, variant_name=variant_name)
+            for external_id in external_ids
+        ]
+
     @abstractmethod
     def delete(self, external_id: str):
         raise NotImplementedError
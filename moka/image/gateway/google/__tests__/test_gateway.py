@@ -0,0 +1,130 @@
+import datetime
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase, override_settings
+from image.gateway.google.gateway import (
+    SIGNED_URL_EXPIRY_WINDOW,
+    SIGNED_URL_MIN_VALIDITY,
+    GoogleCloudStorageGateway,
+    get_expiration_timestamp,
+    sign_url,
+)
+
+TEST_SIGNING_KEY = "aGVsbG8="  # base64 of "hello"
+
+
+def get_dummy_credentials(token=None, expires_in=None):
+    """
+    Returns dummy credentials compliant with google.auth.credentials
+    """
+    credentials = MagicMock()
+    credentials.token = token
+    credentials.expiry = (
+        datetime.datetime.utcnow() + expires_in if expires_in is not None else None
+    )
+    credentials.service_account_email = "test@test.com"
+    return credentials
+
+
+@override_settings(SYSTEM_ENV="prod", GC_CDN_SIGNING_KEY=TEST_SIGNING_KEY)
+class GoogleCloudStorageGatewayCredentialsTests(TestCase):
+    def setUp(self):
+        patcher = patch("google.cloud.storage.Client")
+        self.mock_client = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_gateway(self, credentials):
+        with patch("google.auth.default", return_value=(credentials, "project")):
+            return GoogleCloudStorageGateway()
+
+    def test_construction_does_not_refresh(self):
+        credentials = get_dummy_credentials()
+        self.get_gateway(credentials)
+        credentials.refresh.assert_not_called()
+
+    def test_view_url_does_not_refresh(self):
+        credentials = get_dummy_credentials()
+        gateway = self.get_gateway(credentials)
+        gateway.get_view_url("image_id")
+        credentials.refresh.assert_not_called()
+
+    def test_upload_url_refreshes_missing_token(self):
+        credentials = get_dummy_credentials()
+        gateway = self.get_gateway(credentials)
+        gateway.get_upload_url_with_external_id("image_id")
+        credentials.refresh.assert_called_once()
+
+    def test_upload_url_reuses_valid_token(self):
+        credentials = get_dummy_credentials(
+            token="token", expires_in=datetime.timedelta(minutes=30)
+        )
+        gateway = self.get_gateway(credentials)
+        gateway.get_upload_url_with_external_id("image_id")
+        gateway.get_upload_url_with_external_id("image_id")
+        credentials.refresh.assert_not_called()
+
+    def test_upload_url_refreshes_token_close_to_expiry(self):
+        credentials = get_dummy_credentials(
+            token="token", expires_in=datetime.timedelta(minutes=1)
+        )
+        gateway = self.get_gateway(credentials)
+        gateway.get_upload_url_with_external_id("image_id")
+        credentials.refresh.assert_called_once()
+
+
+@override_settings(
+    SYSTEM_ENV="prod",
+    GC_CDN_SIGNING_KEY=TEST_SIGNING_KEY,
+    GC_CDN_HOSTNAME="https://cdn.test",
+)
+class GoogleCloudStorageGatewaySigningTests(TestCase):
+    def setUp(self):
+        patcher = patch("google.cloud.storage.Client")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with patch(
+            "google.auth.default", return_value=(get_dummy_credentials(), "project")
+        ):
+            self.gateway = GoogleCloudStorageGateway()
+        sign_url.cache_clear()
+
+    def test_expiration_is_window_aligned(self):
+        window = int(SIGNED_URL_EXPIRY_WINDOW.total_seconds())
+        now = 1_700_000_123
+        expires = get_expiration_timestamp(now)
+        self.assertEqual(expires % window, 0)
+        self.assertGreaterEqual(expires - now, SIGNED_URL_MIN_VALIDITY.total_seconds())
+        self.assertLess(
+            expires - now,
+            (SIGNED_URL_MIN_VALIDITY + SIGNED_URL_EXPIRY_WINDOW).total_seconds(),
+        )
+
+    def test_view_url_is_stable_within_window(self):
+        window = int(SIGNED_URL_EXPIRY_WINDOW.total_seconds())
+        window_start = 1_700_000_000 // window * window
+        with patch("time.time", return_value=window_start + 1):
+            first = self.gateway.get_view_url("image_id")
+        with patch("time.time", return_value=window_start + window - 1):
+            second = self.gateway.get_view_url("image_id")
+        with patch("time.time", return_value=window_start + window + 1):
+            third = self.gateway.get_view_url("image_id")
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+        self.assertTrue(first.startswith("https://cdn.test/image_id?Expires="))
+
+    def test_view_url_is_memoized(self):
+        self.gateway.get_view_url("image_id")
+        self.gateway.get_view_url("image_id")
+        self.assertEqual(sign_url.cache_info().hits, 1)
+
+    def test_view_urls_matches_view_url(self):
+        external_ids = ["image_1", "image_2", "image_3"]
+        with patch("time.time", return_value=1_700_000_000):
+            urls = self.gateway.get_view_urls(external_ids)
+            self.assertEqual(
+                urls,
+                [
+                    self.gateway.get_view_url(external_id)
+                    for external_id in external_ids
+                ],
+            )
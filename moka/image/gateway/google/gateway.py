@@ -1,8 +1,12 @@
 # import datetime
 import base64
 import datetime
+import functools
 import hashlib
 import hmac
+import threading
+import time
+from typing import List
 
 import google.auth
 from django.conf import settings
@@ -12,13 +16,69 @@ from image.gateway.gateway import ImageStorageGateway
 from image.gateway.google.config import Config
 from six.moves import urllib
 
+# Refresh access tokens a little before they actually expire
+CREDENTIALS_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+# Signed view urls are valid for at least a day. Expiry is rounded up to the
+# next window boundary so an image keeps the same url within a window, which
+# lets browsers and the CDN cache it and lets us memoize the signature.
+SIGNED_URL_MIN_VALIDITY = datetime.timedelta(days=1)
+SIGNED_URL_EXPIRY_WINDOW = datetime.timedelta(hours=6)
+SIGNED_URL_CACHE_SIZE = 20000
+
+
+def get_expiration_timestamp(now: float = None) -> int:
+    if now is None:
+        now = time.time()
+    window = int(SIGNED_URL_EXPIRY_WINDOW.total_seconds())
+    earliest = int(now + SIGNED_URL_MIN_VALIDITY.total_seconds())
+    return -(-earliest // window) * window
+
+
+@functools.lru_cache(maxsize=None)
+def decode_signing_key(signing_key: str) -> bytes:
+    return base64.urlsafe_b64decode(signing_key)
+
+
+@functools.lru_cache(maxsize=SIGNED_URL_CACHE_SIZE)
+def sign_url(url: str, expiration_timestamp: int, key_name: str, signing_key: str):
+    """
+    Signs url for Cloud CDN. Memoized per (url, expiration window); entries of
+    past windows simply age out of the LRU.
+    """
+    stripped_url = url.strip()
+    parsed_url = urllib.parse.urlsplit(stripped_url)
+    query_params = urllib.parse.parse_qs(parsed_url.query, keep_blank_values=True)
+
+    url_pattern = "{url}{separator}Expires={expires}&KeyName={key_name}"
+
+    url_to_sign = url_pattern.format(
+        url=stripped_url,
+        separator="&" if query_params else "?",
+        expires=expiration_timestamp,
+        key_name=key_name,
+    )
+
+    digest = hmac.new(
+        decode_signing_key(signing_key), url_to_sign.encode("utf-8"), hashlib.sha1
+    ).digest()
+    signature = base64.urlsafe_b64encode(digest).decode("utf-8")
+
+    return "{url}&Signature={signature}".format(url=url_to_sign, signature=signature)
+
 
 class GoogleCloudStorageGateway(ImageStorageGateway):
+    """
+    Thread-safe once constructed. Get the shared instance through
+    image.gateway.registry.get_gateway instead of building one per call.
+    """
+
     def __init__(self, **kwargs):
         self.config = Config()
+        self.__credentials_lock = threading.Lock()
         if settings.SYSTEM_ENV == "prod":
+            # Token is fetched lazily, see __refresh_credentials_if_needed
             self.credentials, _project_id = google.auth.default()
-            self.credentials.refresh(requests.Request())
             self.client = storage.Client()
         else:
             self.credentials = settings.GS_CREDENTIALS
@@ -26,34 +86,31 @@ class GoogleCloudStorageGateway(ImageStorageGateway):
                 credentials=self.credentials,
             )
 
-    def __sign_url(
-        self,
-        url,
-    ):
-        stripped_url = url.strip()
-        parsed_url = urllib.parse.urlsplit(stripped_url)
-        query_params = urllib.parse.parse_qs(parsed_url.query, keep_blank_values=True)
-        epoch = datetime.datetime.utcfromtimestamp(0)
-        expiration_time = datetime.datetime.utcnow() + datetime.timedelta(days=1)
-        expiration_timestamp = int((expiration_time - epoch).total_seconds())
-        decoded_key = base64.urlsafe_b64decode(self.config.signing_key)
-
-        url_pattern = "{url}{separator}Expires={expires}&KeyName={key_name}"
-
-        url_to_sign = url_pattern.format(
-            url=stripped_url,
-            separator="&" if query_params else "?",
-            expires=expiration_timestamp,
-            key_name=self.config.signing_key_name,
+    def __credentials_need_refresh(self):
+        if not self.credentials.token or self.credentials.expiry is None:
+            return True
+        # google-auth keeps expiry as a naive UTC datetime
+        return (
+            self.credentials.expiry - datetime.datetime.utcnow()
+            < CREDENTIALS_REFRESH_MARGIN
         )
 
-        digest = hmac.new(
-            decoded_key, url_to_sign.encode("utf-8"), hashlib.sha1
-        ).digest()
-        signature = base64.urlsafe_b64encode(digest).decode("utf-8")
+    def __refresh_credentials_if_needed(self):
+        if settings.SYSTEM_ENV != "prod":
+            return
+        if not self.__credentials_need_refresh():
+            return
+        with self.__credentials_lock:
+            # Another thread might have refreshed while we were waiting
+            if self.__credentials_need_refresh():
+                self.credentials.refresh(requests.Request())
 
-        return "{url}&Signature={signature}".format(
-            url=url_to_sign, signature=signature
+    def __sign_url(self, url, expiration_timestamp):
+        return sign_url(
+            url,
+            expiration_timestamp,
+            self.config.signing_key_name,
+            self.config.signing_key,
         )
 
     def get_upload_url_with_external_id(self, external_id: str):
@@ -68,6 +125,7 @@ class GoogleCloudStorageGateway(ImageStorageGateway):
         "curl -X PUT -H 'Content-Type: application/octet-stream' "
         "--upload-file my-file generate-signed-url"
         """
+        self.__refresh_credentials_if_needed()
         bucket = self.client.bucket(self.config.bucket_name)
         blob = bucket.blob(external_id)  # external_id as blob_name
 
@@ -83,7 +141,21 @@ class GoogleCloudStorageGateway(ImageStorageGateway):
         return url
 
     def get_view_url(self, external_id: str, variant_name: str = None):
-        return self.__sign_url(f"{self.config.cdn_hostname}/{external_id}")
+        return self.__sign_url(
+            f"{self.config.cdn_hostname}/{external_id}",
+            get_expiration_timestamp(),
+        )
+
+    def get_view_urls(
+        self, external_ids: List[str], variant_name: str = None
+    ) -> List[str]:
+        # Every url of the batch shares one expiration window
+        expiration_timestamp = get_expiration_timestamp()
+        cdn_hostname = self.config.cdn_hostname
+        return [
+            self.__sign_url(f"{cdn_hostname}/{external_id}", expiration_timestamp)
+            for external_id in external_ids
+        ]
 
     def delete(self, external_id):
         bucket = self.client.bucket(self.config.bucket_name)
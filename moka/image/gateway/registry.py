@@ -0,0 +1,34 @@
+"""
+Process-wide registry of image storage gateways.
+
+Gateways are expensive to build (credentials lookup, storage client) but are
+safe to share between threads once built, so we keep a single instance per
+gateway class (= per storage backend) for the lifetime of the worker process.
+"""
+import threading
+from typing import Dict, Type
+
+from image.gateway.gateway import ImageStorageGateway
+
+_lock = threading.Lock()
+_gateways: Dict[Type[ImageStorageGateway], ImageStorageGateway] = {}
+
+
+def get_gateway(gateway_class: Type[ImageStorageGateway]) -> ImageStorageGateway:
+    gateway = _gateways.get(gateway_class)
+    if gateway is None:
+        with _lock:
+            # Another thread might have built it while we were waiting
+            gateway = _gateways.get(gateway_class)
+            if gateway is None:
+                gateway = gateway_class()
+                _gateways[gateway_class] = gateway
+    return gateway
+
+
+def clear_gateways():
+    """
+    Drop every cached gateway. Mostly useful for tests overriding settings.
+    """
+    with _lock:
+        _gateways.clear()
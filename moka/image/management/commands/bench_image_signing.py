@@ -0,0 +1,53 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from image.gateway.google.gateway import GoogleCloudStorageGateway, sign_url
+from image.gateway.registry import clear_gateways, get_gateway
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-URL signing cost of building a gateway per URL "
+        "against the shared gateway from the registry, and of batch signing "
+        "a page of urls"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--urls", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        num_urls = options["urls"]
+        external_ids = [f"bench-image-{i}" for i in range(num_urls)]
+
+        def sign_with_new_gateway():
+            for external_id in external_ids:
+                GoogleCloudStorageGateway().get_view_url(external_id=external_id)
+
+        def sign_with_registry():
+            for external_id in external_ids:
+                get_gateway(GoogleCloudStorageGateway).get_view_url(
+                    external_id=external_id
+                )
+
+        def sign_batch():
+            get_gateway(GoogleCloudStorageGateway).get_view_urls(external_ids)
+
+        clear_gateways()
+        sign_url.cache_clear()
+        before = timeit.timeit(sign_with_new_gateway, number=1)
+        sign_url.cache_clear()
+        after = timeit.timeit(sign_with_registry, number=1)
+        sign_url.cache_clear()
+        batch_cold = timeit.timeit(sign_batch, number=1)
+        batch_warm = timeit.timeit(sign_batch, number=1)
+
+        self.stdout.write(f"Signed {num_urls} urls")
+        self.stdout.write(
+            f"Gateway per url: {before / num_urls * 1e6:.1f} us/url ({before:.3f} s)"
+        )
+        self.stdout.write(
+            f"Shared gateway:  {after / num_urls * 1e6:.1f} us/url ({after:.3f} s)"
+        )
+        self.stdout.write(f"Batch, cold:     {batch_cold / num_urls * 1e6:.1f} us/url")
+        self.stdout.write(f"Batch, memoized: {batch_warm / num_urls * 1e6:.1f} us/url")
+        self.stdout.write(f"Speedup: {before / after:.1f}x")
@@ -1,9 +1,14 @@
-from typing import Any
+from collections import defaultdict
+from typing import Any, Iterable
 from uuid import uuid4
 
+from common.logger import StructuredLogger
 from django.db import models
 from image.gateway.cloudflare.gateway import CloudflareImagesGateway
 from image.gateway.google.gateway import GoogleCloudStorageGateway
+from image.gateway.registry import get_gateway
+
+logger = StructuredLogger(__name__)
 
 
 class Storage(models.TextChoices):
@@ -41,18 +46,55 @@ class Image(models.Model):
 
     @property
     def signed_cookie(self):
+        if hasattr(self, "_prefetched_signed_cookie"):
+            return self._prefetched_signed_cookie
         if self.storage == Storage.CLOUDFLARE_IMAGES:
-            return CloudflareImagesGateway().get_view_url(
+            return get_gateway(CloudflareImagesGateway).get_view_url(
                 external_id=self.external_id,
                 variant_name="public",
             )
         elif self.storage == Storage.GOOGLE_CLOUD_STORAGE:
-            return GoogleCloudStorageGateway().get_view_url(
+            return get_gateway(GoogleCloudStorageGateway).get_view_url(
                 external_id=self.external_id,
             )
         else:
             return None
 
+    @staticmethod
+    def prefetch_signed_cookies(images: Iterable["Image"]):
+        """
+        Signs the view urls of several images with one gateway call per storage.
+        Images that fail to sign fall back to signed_cookie on access.
+        """
+        images_by_storage = defaultdict(list)
+        for image in images:
+            if image is not None:
+                images_by_storage[image.storage].append(image)
+
+        for storage, storage_images in images_by_storage.items():
+            if storage == Storage.CLOUDFLARE_IMAGES:
+                gateway = get_gateway(CloudflareImagesGateway)
+                variant_name = "public"
+            elif storage == Storage.GOOGLE_CLOUD_STORAGE:
+                gateway = get_gateway(GoogleCloudStorageGateway)
+                variant_name = None
+            else:
+                continue
+            try:
+                urls = gateway.get_view_urls(
+                    external_ids=[image.external_id for image in storage_images],
+                    variant_name=variant_name,
+                )
+            except Exception:
+                logger.exception(
+                    event_name="IMAGE_BATCH_SIGN_ERROR",
+                    msg="Failed to batch sign image urls",
+                    storage=storage,
+                )
+                continue
+            for image, url in zip(storage_images, urls):
+                image._prefetched_signed_cookie = url
+
 
 class Thumbnail(Image):
     owner = models.ForeignKey(
@@ -68,10 +110,11 @@ class Thumbnail(Image):
         storage: Storage, owner: Any  # MokaProfile
     ):
         if storage == Storage.CLOUDFLARE_IMAGES:
+            gateway = get_gateway(CloudflareImagesGateway)
             (
                 cf_image_id,
                 signed_upload_url,
-            ) = CloudflareImagesGateway().get_external_image_id_and_upload_url()
+            ) = gateway.get_external_image_id_and_upload_url()
             new_draft_image = Thumbnail.objects.create(
                 status=Image.ImageStatus.DRAFT,
                 external_id=cf_image_id,
@@ -86,10 +129,9 @@ class Thumbnail(Image):
                 storage=storage,
                 owner=owner,
             )
-            signed_upload_url = (
-                GoogleCloudStorageGateway().get_upload_url_with_external_id(
-                    external_id=new_draft_image.external_id,
-                )
+            gateway = get_gateway(GoogleCloudStorageGateway)
+            signed_upload_url = gateway.get_upload_url_with_external_id(
+                external_id=new_draft_image.external_id,
             )
             return new_draft_image, signed_upload_url
         else:
@@ -124,10 +166,11 @@ class Page(Image):
         owner: Any,  # MokaProfile
     ):
         if storage == Storage.CLOUDFLARE_IMAGES:
+            gateway = get_gateway(CloudflareImagesGateway)
             (
                 cf_image_id,
                 signed_upload_url,
-            ) = CloudflareImagesGateway().get_external_image_id_and_upload_url()
+            ) = gateway.get_external_image_id_and_upload_url()
             new_draft_image = Page.objects.create(
                 status=Image.ImageStatus.DRAFT,
                 external_id=cf_image_id,
@@ -146,10 +189,9 @@ class Page(Image):
                 owner=owner,
                 order=0,  # Temporarily set as 0
             )
-            signed_upload_url = (
-                GoogleCloudStorageGateway().get_upload_url_with_external_id(
-                    external_id=new_draft_image.external_id,
-                )
+            gateway = get_gateway(GoogleCloudStorageGateway)
+            signed_upload_url = gateway.get_upload_url_with_external_id(
+                external_id=new_draft_image.external_id,
             )
             return new_draft_image, signed_upload_url
         else:
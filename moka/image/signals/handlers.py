@@ -4,6 +4,7 @@ from django.dispatch import receiver
 from episode.models import Episode
 from image.gateway.cloudflare.gateway import CloudflareImagesGateway
 from image.gateway.google.gateway import GoogleCloudStorageGateway
+from image.gateway.registry import get_gateway
 from image.models import Image, Page, Storage, Thumbnail
 from moka_profile.models import MokaProfile
 from series.models import Series
@@ -16,7 +17,7 @@ logger = StructuredLogger(__name__)
 def remove_image_source(sender, instance, **kwargs):
     if instance.storage == Storage.CLOUDFLARE_IMAGES:
         try:
-            CloudflareImagesGateway().delete(
+            get_gateway(CloudflareImagesGateway).delete(
                 external_id=instance.external_id,
             )
         except Exception as e:
@@ -28,7 +29,7 @@ def remove_image_source(sender, instance, **kwargs):
             )
     elif instance.storage == Storage.GOOGLE_CLOUD_STORAGE:
         try:
-            GoogleCloudStorageGateway().delete(
+            get_gateway(GoogleCloudStorageGateway).delete(
                 external_id=instance.external_id,
             )
         except Exception as e:
@@ -2,15 +2,15 @@
 from unittest import mock
 
 import django.test
+from collection.models import FollowingCollection
 from django.test import Client
-
-# from episode.factory import EpisodeFactory
-# from episode.models import Episode
+from episode.factory import EpisodeFactory
+from episode.models import LikeEpisode, PurchaseEpisode
 from image.factory import ThumbnailFactory
 from image.models import Thumbnail
 from moka_profile.api.schema import ProfileSchema
 from moka_profile.factory import MokaProfileFactory
-from moka_profile.models import MokaProfile
+from moka_profile.models import Follow, MokaProfile
 
 # from series.api.schema import SeriesMetaDataSchema
 from series.factory import SeriesFactory
@@ -44,6 +44,12 @@ class TestProfileAPI(django.test.TestCase):
         self.assertEqual(response_parsed.followers, 0)
         self.assertEqual(response_parsed.following, 0)
 
+    def test_get_profile_without_display_name(self):
+        profile = MokaProfileFactory(display_name=None)
+        response = self.client.get(f"/v1/profile/{profile.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()["display_name"])
+
     def test_get_profile_with_auth(self):
         thumbnail = ThumbnailFactory()
         profile = MokaProfileFactory(thumbnail=thumbnail)
@@ -187,3 +193,59 @@ class TestProfileAPI(django.test.TestCase):
 
         with self.assertRaises(MokaProfile.DoesNotExist):
             MokaProfile.objects.get(id=profile.id)
+
+    def test_viewer_state(self):
+        viewer = MokaProfileFactory()
+        liked, purchased, both, neither = EpisodeFactory.create_batch(size=4)
+        LikeEpisode.objects.create(episode=liked, profile=viewer)
+        PurchaseEpisode.objects.create(episode=purchased, profile=viewer)
+        LikeEpisode.objects.create(episode=both, profile=viewer)
+        PurchaseEpisode.objects.create(episode=both, profile=viewer)
+        # State of other profiles doesn't leak
+        LikeEpisode.objects.create(episode=neither, profile=MokaProfileFactory())
+
+        followed_series, other_series = SeriesFactory.create_batch(size=2)
+        FollowingCollection.objects.create(owner=viewer).series.add(followed_series)
+        followed_profile, other_profile = MokaProfileFactory.create_batch(size=2)
+        Follow.objects.create(follower=viewer, followee=followed_profile)
+
+        with mock.patch(
+            "moka_profile.api.v1.FirebaseAuthentication.authenticate",
+            return_value=viewer,
+        ):
+            with self.assertNumQueries(3):
+                response = self.client.post(
+                    path="/v1/profile/viewer-state",
+                    data={
+                        "episode_ids": [liked.id, purchased.id, both.id, neither.id],
+                        "series_ids": [followed_series.id, other_series.id],
+                        "profile_ids": [followed_profile.id, other_profile.id],
+                    },
+                    content_type="application/json",
+                )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                response.json(),
+                {
+                    "liked_episode_ids": [str(liked.id), str(both.id)],
+                    "purchased_episode_ids": [str(purchased.id), str(both.id)],
+                    "following_series_ids": [str(followed_series.id)],
+                    "following_profile_ids": [str(followed_profile.id)],
+                },
+            )
+
+            # Nothing to look up
+            with self.assertNumQueries(0):
+                response = self.client.post(
+                    path="/v1/profile/viewer-state",
+                    data={},
+                    content_type="application/json",
+                )
+            self.assertEqual(response.json()["liked_episode_ids"], [])
+
+            response = self.client.post(
+                path="/v1/profile/viewer-state",
+                data={"episode_ids": list(range(101))},
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 422)
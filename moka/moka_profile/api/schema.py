@@ -1,9 +1,10 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from common.logger import StructuredLogger
 from common.schema_utils import datetime_encoder
 from moka_profile.models import MokaProfile
+from moka_profile.service.viewer_state import MAX_IDS
 from ninja import Field, Schema
 
 logger = StructuredLogger(__name__)
@@ -25,11 +26,25 @@ class SessionLoginInputSchema(Schema):
     token: str
 
 
+class ViewerStateInputSchema(Schema):
+    episode_ids: List[int] = Field(default=[], max_items=MAX_IDS)
+    series_ids: List[int] = Field(default=[], max_items=MAX_IDS)
+    profile_ids: List[int] = Field(default=[], max_items=MAX_IDS)
+
+
+class ViewerStateSchema(Schema):
+    liked_episode_ids: List[str]
+    purchased_episode_ids: List[str]
+    following_series_ids: List[str]
+    following_profile_ids: List[str]
+
+
 class ProfileSchema(Schema):
     id: str
     profile_picture_url: Optional[str]
     profile_picture_id: Optional[str]
-    display_name: str
+    # Unset until synced from Firebase, see moka_profile.service.firebase_sync
+    display_name: Optional[str]
     description: Optional[str]
     is_owner: bool = Field(default=False)
     balance: Optional[int]
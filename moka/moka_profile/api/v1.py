@@ -2,6 +2,7 @@ import datetime
 import time
 from typing import List, Optional
 
+from common import session
 from common.auth import FirebaseAuthentication, FirebaseOptionalAuthentication
 from common.errors import (
     ErrorResponse,
@@ -10,11 +11,13 @@ from common.errors import (
     UnauthorizedError,
 )
 from common.logger import StructuredLogger
+from common.pagination import BatchedLimitOffsetPagination
 from django.conf import settings
 from django.db import IntegrityError, transaction
 from django.db.models import Q
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django.views.decorators import csrf
 from firebase_admin import auth as firebase_auth
 from firebase_admin.exceptions import FirebaseError
@@ -24,8 +27,11 @@ from moka_profile.api.schema import (
     ProfileEditInputSchema,
     ProfileSchema,
     SessionLoginInputSchema,
+    ViewerStateInputSchema,
+    ViewerStateSchema,
 )
 from moka_profile.models import Follow, MokaProfile
+from moka_profile.service import viewer_state
 from ninja import Router
 from ninja.pagination import LimitOffsetPagination, paginate
 from series.api.schema import SeriesMetaDataSchema
@@ -97,7 +103,7 @@ def get_my_profile(request):
     auth=FirebaseOptionalAuthentication(),
 )
 @csrf.csrf_exempt
-@paginate(LimitOffsetPagination)
+@paginate(BatchedLimitOffsetPagination, batch_resolver=SeriesMetaDataSchema.prefetch)
 def get_works(request, id: int, q: Optional[str] = None):
     # If authorized & owner, get draft series too
     profile = get_object_or_404(
@@ -113,14 +119,15 @@ def get_works(request, id: int, q: Optional[str] = None):
         )
     if isinstance(request.auth, MokaProfile) and request.auth.id == profile.id:
         return (
-            profile.owning_series.exclude(
+            profile.owning_series.select_related("thumbnail", "owner")
+            .exclude(
                 status=Series.SeriesStatus.REMOVED,
             )
             .filter(query_predicate)
             .all()
         )
     else:
-        return profile.owning_series.filter(
+        return profile.owning_series.select_related("thumbnail", "owner").filter(
             query_predicate & Q(status=Series.SeriesStatus.PUBLIC)
         )
 
@@ -161,11 +168,12 @@ def edit_profile(request, id: int, input: ProfileEditInputSchema):
                 if input.display_name:
                     profile.display_name = input.display_name[:100]
 
+                profile.photo_url = (
+                    profile.thumbnail.signed_cookie if profile.thumbnail else None
+                )
                 firebase_auth.update_user(
                     uid=profile.firebase_uid,
-                    photo_url=profile.thumbnail.signed_cookie
-                    if profile.thumbnail
-                    else None,
+                    photo_url=profile.photo_url,
                     display_name=profile.display_name,
                 )
 
@@ -218,6 +226,8 @@ def create_new_profile(request, input: ProfileCreateInputSchema):
         profile = MokaProfile.objects.create(
             firebase_uid=user.uid,
             display_name=input.username,
+            email=input.email,
+            firebase_synced_at=timezone.now(),
         )
         firebase_auth.update_user(
             uid=user.uid,
@@ -295,6 +305,12 @@ def session_login(
             session_cookie = firebase_auth.create_session_cookie(
                 input.token, expires_in=expires_in
             )
+            # The ID token carries the latest email and photo of the user
+            MokaProfile.objects.filter(firebase_uid=decoded_claims["uid"]).update(
+                email=decoded_claims.get("email"),
+                photo_url=decoded_claims.get("picture"),
+                firebase_synced_at=timezone.now(),
+            )
             # Set cookie policy for session cookie.
             expires = datetime.datetime.now() + expires_in
             response.set_cookie(
@@ -330,6 +346,7 @@ def session_logout(request: HttpRequest, response: HttpResponse):
         firebase_auth.revoke_refresh_tokens(profile.firebase_uid)
     except FirebaseError as e:
         raise FirebaseUserFacingError(e)
+    session.logout(request.COOKIES.get("session"), profile.firebase_uid)
     response.set_cookie("session", expires=0)
     return response
 
@@ -359,3 +376,19 @@ def unfollow(request: HttpRequest, id: int):
         follower=request.auth,
         followee__id=id,
     ).delete()
+
+
+@router.post(
+    "/viewer-state",
+    response=ViewerStateSchema,
+    auth=FirebaseAuthentication(),
+    description="Which of the given episodes the caller liked or purchased, "
+    "and which of the given series and profiles the caller follows.",
+)
+def get_viewer_state(request: HttpRequest, input: ViewerStateInputSchema):
+    return viewer_state.get_viewer_state(
+        request.auth,
+        episode_ids=input.episode_ids,
+        series_ids=input.series_ids,
+        profile_ids=input.profile_ids,
+    )._asdict()
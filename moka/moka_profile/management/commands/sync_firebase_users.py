@@ -0,0 +1,30 @@
+from discovery.service import search
+from django.core.management.base import BaseCommand
+from moka_profile.service import firebase_sync
+from series.models import Series
+
+
+class Command(BaseCommand):
+    help = (
+        "Mirror Firebase display names, emails and photo urls onto profiles. "
+        "Only profiles that were never synced unless --all is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            named_profile_ids = firebase_sync.sync_all_profiles()
+        else:
+            named_profile_ids = firebase_sync.sync_unsynced_profiles()
+
+        # Bulk updates skip the signals that keep search documents fresh
+        search.refresh_series(
+            list(
+                Series.objects.filter(owner_id__in=named_profile_ids).values_list(
+                    "id", flat=True
+                )
+            )
+        )
+        self.stdout.write(f"Named {len(named_profile_ids)} profiles")
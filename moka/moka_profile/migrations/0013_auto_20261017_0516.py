@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moka_profile', '0012_auto_20221012_0553'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mokaprofile',
+            name='email',
+            field=models.EmailField(max_length=320, null=True),
+        ),
+        migrations.AddField(
+            model_name='mokaprofile',
+            name='firebase_synced_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='mokaprofile',
+            name='photo_url',
+            field=models.TextField(null=True),
+        ),
+    ]
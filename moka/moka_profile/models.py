@@ -1,6 +1,5 @@
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
-from firebase_admin import auth
 from image.models import Thumbnail
 
 
@@ -21,6 +20,10 @@ class MokaProfile(models.Model):
         },
     )
     description = models.CharField(max_length=500, null=True)
+    # Mirror of the Firebase user record, see moka_profile/service/firebase_sync.py
+    email = models.EmailField(max_length=320, null=True)
+    photo_url = models.TextField(null=True)
+    firebase_synced_at = models.DateTimeField(null=True)
     followings = models.ManyToManyField(
         "self",
         through="Follow",
@@ -41,20 +44,10 @@ class MokaProfile(models.Model):
     is_banned = models.BooleanField(default=False)
 
     def get_display_name(self):
-        if self.display_name is not None:
-            return self.display_name
-        else:
-            user = auth.get_user(self.firebase_uid)
-            self.display_name = user.display_name
-            self.save()
-            return user.display_name
+        return self.display_name
 
     def get_email(self):
-        try:
-            user = auth.get_user(self.firebase_uid)
-            return user.email
-        except Exception:
-            return None
+        return self.email
 
     def get_balance(self):
         try:
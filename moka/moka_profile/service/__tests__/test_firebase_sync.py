@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.test import TestCase
+from moka_profile.factory import MokaProfileFactory
+from moka_profile.service import firebase_sync
+
+
+def user_record(uid, display_name=None, email=None, photo_url=None):
+    return mock.Mock(
+        uid=uid, display_name=display_name, email=email, photo_url=photo_url
+    )
+
+
+class FirebaseSyncTests(TestCase):
+    def test_sync_profiles_in_batches(self):
+        profiles = MokaProfileFactory.create_batch(size=150)
+        uids = [profile.firebase_uid for profile in profiles]
+
+        def get_users(identifiers):
+            return mock.Mock(
+                users=[
+                    user_record(identifier.uid, email=f"{identifier.uid}@moka.com")
+                    for identifier in identifiers
+                ]
+            )
+
+        with mock.patch(
+            "firebase_admin.auth.get_users", side_effect=get_users
+        ) as firebase_get_users:
+            firebase_sync.sync_profiles(uids)
+        self.assertEqual(firebase_get_users.call_count, 2)
+
+        for profile in profiles:
+            profile.refresh_from_db()
+            self.assertEqual(profile.email, f"{profile.firebase_uid}@moka.com")
+            self.assertIsNotNone(profile.firebase_synced_at)
+
+    def test_keeps_local_display_names(self):
+        named = MokaProfileFactory(display_name="local")
+        unnamed = MokaProfileFactory(display_name=None)
+        clashing = MokaProfileFactory(display_name=None)
+
+        records = [
+            user_record(named.firebase_uid, display_name="remote"),
+            user_record(unnamed.firebase_uid, display_name="mocha"),
+            user_record(clashing.firebase_uid, display_name="local"),
+        ]
+        self.assertEqual(firebase_sync.apply_user_records(records), [unnamed.id])
+
+        for profile, display_name in [
+            (named, "local"),
+            (unnamed, "mocha"),
+            (clashing, None),
+        ]:
+            profile.refresh_from_db()
+            self.assertEqual(profile.display_name, display_name)
+
+    def test_sync_all_profiles_pages(self):
+        profiles = MokaProfileFactory.create_batch(size=2)
+        last_page = mock.Mock(
+            users=[user_record(profiles[1].firebase_uid, photo_url="b.png")]
+        )
+        last_page.get_next_page.return_value = None
+        first_page = mock.Mock(
+            users=[user_record(profiles[0].firebase_uid, photo_url="a.png")]
+        )
+        first_page.get_next_page.return_value = last_page
+
+        with mock.patch("firebase_admin.auth.list_users", return_value=first_page):
+            firebase_sync.sync_all_profiles()
+
+        for profile, photo_url in zip(profiles, ["a.png", "b.png"]):
+            profile.refresh_from_db()
+            self.assertEqual(profile.photo_url, photo_url)
+
+    def test_reads_do_not_call_firebase(self):
+        profile = MokaProfileFactory(display_name=None, email="mocha@moka.com")
+        with mock.patch("firebase_admin.auth.get_user") as firebase_get_user:
+            self.assertIsNone(profile.get_display_name())
+            self.assertEqual(profile.get_email(), "mocha@moka.com")
+        firebase_get_user.assert_not_called()
@@ -0,0 +1,95 @@
+"""
+Keeps the Firebase user attributes mirrored on MokaProfile (display name,
+email and photo url) so that request paths never call auth.get_user.
+
+The edit paths write the mirror together with Firebase; this fills it for
+existing profiles in batches of get_users / list_users pages.
+"""
+from typing import Iterable, List
+
+from django.db.models import Q
+from django.utils import timezone
+from firebase_admin import auth
+from moka_profile.models import MokaProfile
+
+# auth.get_users accepts at most 100 identifiers
+GET_USERS_BATCH_SIZE = 100
+LIST_USERS_PAGE_SIZE = 1000
+
+
+def apply_user_records(records: Iterable[auth.UserRecord]) -> List[int]:
+    """
+    Copies the records onto the matching profiles. Display names set
+    locally are kept, they are the source of truth since the edit paths
+    write them. Returns ids of profiles whose display name was filled.
+    """
+    records = {record.uid: record for record in records}
+    profiles = list(
+        MokaProfile.objects.filter(firebase_uid__in=records.keys()).only(
+            "id", "firebase_uid", "display_name", "email", "photo_url"
+        )
+    )
+    # display_name is unique, names taken by another profile stay empty
+    wanted_names = {
+        records[profile.firebase_uid].display_name
+        for profile in profiles
+        if profile.display_name is None
+    }
+    taken_names = set(
+        MokaProfile.objects.filter(display_name__in=wanted_names - {None}).values_list(
+            "display_name", flat=True
+        )
+    )
+
+    now = timezone.now()
+    named_profile_ids = []
+    for profile in profiles:
+        record = records[profile.firebase_uid]
+        profile.email = record.email
+        profile.photo_url = record.photo_url
+        profile.firebase_synced_at = now
+        if (
+            profile.display_name is None
+            and record.display_name is not None
+            and record.display_name not in taken_names
+        ):
+            profile.display_name = record.display_name
+            taken_names.add(record.display_name)
+            named_profile_ids.append(profile.id)
+    MokaProfile.objects.bulk_update(
+        profiles, ["display_name", "email", "photo_url", "firebase_synced_at"]
+    )
+    return named_profile_ids
+
+
+def sync_profiles(firebase_uids: List[str]) -> List[int]:
+    named_profile_ids = []
+    for start in range(0, len(firebase_uids), GET_USERS_BATCH_SIZE):
+        result = auth.get_users(
+            [
+                auth.UidIdentifier(uid)
+                for uid in firebase_uids[start : start + GET_USERS_BATCH_SIZE]
+            ]
+        )
+        named_profile_ids += apply_user_records(result.users)
+    return named_profile_ids
+
+
+def sync_unsynced_profiles() -> List[int]:
+    firebase_uids = list(
+        MokaProfile.objects.filter(
+            Q(firebase_synced_at__isnull=True) | Q(display_name__isnull=True)
+        )
+        .order_by("id")
+        .values_list("firebase_uid", flat=True)
+    )
+    return sync_profiles(firebase_uids)
+
+
+def sync_all_profiles() -> List[int]:
+    named_profile_ids = []
+    page = auth.list_users(max_results=LIST_USERS_PAGE_SIZE)
+    while page:
+        named_profile_ids += apply_user_records(page.users)
+        page = page.get_next_page()
+    return named_profile_ids
@@ -0,0 +1,80 @@
+"""
+Personal state of the viewer over a page of episodes, series and profiles,
+so that clients can render the same cacheable feed for everyone and overlay
+what the viewer liked, purchased and follows with one request.
+"""
+from typing import List, NamedTuple
+
+from collection.models import FollowingCollection
+from django.db.models import Exists, OuterRef, Q
+from episode.models import Episode, LikeEpisode, PurchaseEpisode
+from moka_profile.models import Follow, MokaProfile
+
+# Bounds the IN lists of the membership queries
+MAX_IDS = 100
+
+
+class ViewerState(NamedTuple):
+    liked_episode_ids: List[int]
+    purchased_episode_ids: List[int]
+    following_series_ids: List[int]
+    following_profile_ids: List[int]
+
+
+def get_viewer_state(
+    viewer: MokaProfile,
+    episode_ids: List[int],
+    series_ids: List[int],
+    profile_ids: List[int],
+) -> ViewerState:
+    """
+    One query per non-empty list of ids
+    """
+    liked_episode_ids, purchased_episode_ids = [], []
+    if episode_ids:
+        for episode_id, is_liked, is_purchased in (
+            Episode.objects.filter(id__in=episode_ids)
+            .annotate(
+                is_liked=Exists(
+                    LikeEpisode.objects.filter(episode=OuterRef("pk"), profile=viewer)
+                ),
+                is_purchased=Exists(
+                    PurchaseEpisode.objects.filter(
+                        episode=OuterRef("pk"), profile=viewer
+                    )
+                ),
+            )
+            .filter(Q(is_liked=True) | Q(is_purchased=True))
+            .order_by("id")
+            .values_list("id", "is_liked", "is_purchased")
+        ):
+            if is_liked:
+                liked_episode_ids.append(episode_id)
+            if is_purchased:
+                purchased_episode_ids.append(episode_id)
+
+    following_series_ids = []
+    if series_ids:
+        following_series_ids = list(
+            FollowingCollection.series.through.objects.filter(
+                followingcollection__owner=viewer, series_id__in=series_ids
+            )
+            .order_by("series_id")
+            .values_list("series_id", flat=True)
+            .distinct()
+        )
+
+    following_profile_ids = []
+    if profile_ids:
+        following_profile_ids = list(
+            Follow.objects.filter(follower=viewer, followee_id__in=profile_ids)
+            .order_by("followee_id")
+            .values_list("followee_id", flat=True)
+        )
+
+    return ViewerState(
+        liked_episode_ids,
+        purchased_episode_ids,
+        following_series_ids,
+        following_profile_ids,
+    )
@@ -1,5 +1,13 @@
 from django.contrib import admin
-from money.models import Transaction, Wallet
+from money.models import (
+    MonthlyRollover,
+    Payout,
+    PayoutRun,
+    RecipientCredit,
+    StripeEvent,
+    Transaction,
+    Wallet,
+)
 
 
 class WalletAdmin(admin.ModelAdmin):
@@ -16,6 +24,7 @@ class WalletAdmin(admin.ModelAdmin):
         "balance",
         "usd_value",
         "stripe_connect_account",
+        "stripe_account_status",
     )
     search_fields = (
         "id",
@@ -61,5 +70,131 @@ class TransactionAdmin(admin.ModelAdmin):
     actions = None
 
 
+class StripeEventAdmin(admin.ModelAdmin):
+    readonly_fields = (
+        "id",
+        "event_id",
+        "type",
+        "payload",
+        "attempts",
+        "last_error",
+        "created_at",
+        "processed_at",
+    )
+    list_display = (
+        "id",
+        "event_id",
+        "type",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "created_at",
+    )
+    list_filter = ("status", "type")
+    search_fields = ("event_id",)
+    ordering = ("-created_at",)
+    actions = None
+
+
+class MonthlyRolloverAdmin(admin.ModelAdmin):
+    readonly_fields = (
+        "id",
+        "started_at",
+        "finished_at",
+        "wallet_cnt",
+        "coin_amount",
+        "usd_value",
+    )
+    list_display = (
+        "id",
+        "started_at",
+        "finished_at",
+        "wallet_cnt",
+        "coin_amount",
+        "usd_value",
+    )
+    ordering = ("-started_at",)
+    actions = None
+
+
+class RecipientCreditAdmin(admin.ModelAdmin):
+    readonly_fields = (
+        "id",
+        "recipient",
+        "transaction",
+        "coin_amount",
+        "usd_value",
+        "created_at",
+        "folded_at",
+    )
+    list_display = (
+        "id",
+        "recipient",
+        "coin_amount",
+        "usd_value",
+        "created_at",
+        "folded_at",
+    )
+    ordering = ("-id",)
+    actions = None
+
+
+class PayoutRunAdmin(admin.ModelAdmin):
+    readonly_fields = (
+        "id",
+        "status",
+        "created_at",
+        "finished_at",
+    )
+    list_display = (
+        "id",
+        "status",
+        "created_at",
+        "finished_at",
+    )
+    ordering = ("-created_at",)
+    actions = None
+
+
+class PayoutAdmin(admin.ModelAdmin):
+    readonly_fields = (
+        "id",
+        "run",
+        "wallet",
+        "stripe_connect_account",
+        "status",
+        "coin_amount",
+        "usd_value",
+        "platform_fee",
+        "transfer_amount",
+        "stripe_transfer_id",
+        "last_error",
+        "created_at",
+        "updated_at",
+    )
+    list_display = (
+        "id",
+        "run",
+        "wallet",
+        "status",
+        "coin_amount",
+        "transfer_amount",
+        "stripe_transfer_id",
+        "updated_at",
+    )
+    list_filter = ("status",)
+    search_fields = (
+        "stripe_connect_account",
+        "stripe_transfer_id",
+    )
+    ordering = ("-created_at",)
+    actions = None
+
+
 admin.site.register(Wallet, WalletAdmin)
 admin.site.register(Transaction, TransactionAdmin)
+admin.site.register(StripeEvent, StripeEventAdmin)
+admin.site.register(MonthlyRollover, MonthlyRolloverAdmin)
+admin.site.register(RecipientCredit, RecipientCreditAdmin)
+admin.site.register(PayoutRun, PayoutRunAdmin)
+admin.site.register(Payout, PayoutAdmin)
@@ -1,9 +1,15 @@
 from __future__ import division
 
+import hashlib
+import hmac
+import json
 import math
+import time
 from unittest import mock
 
 import django.test
+import stripe
+from django.conf import settings
 from django.test import Client
 from episode.factory import EpisodeFactory
 from episode.models import Episode, PurchaseEpisode
@@ -11,12 +17,15 @@ from moka_profile.factory import MokaProfileFactory
 from moka_profile.models import MokaProfile
 from money.factory import WalletFactory
 from money.gateway.stripe import StripeHandler
-from money.models import Wallet
+from money.models import Payout, StripeEvent, Transaction, Wallet
+from money.service.credits import fold_credits
+from money.service.payout import run_payouts
 from money.service.transaction import (
     add_balance_to_wallet,
     move_monthly_balance_to_payout_balance,
-    payout,
+    send_tip,
 )
+from series.factory import SeriesFactory
 
 from .test_data import (
     BALANCE_TRANSACTION,
@@ -129,6 +138,50 @@ class TestWebhook(django.test.TransactionTestCase):
     def setUp(self):
         self.client = Client()
 
+    def post_event(self, event, secret=settings.STRIPE_ENDPOINT_SECRET):
+        payload = json.dumps(event)
+        timestamp = int(time.time())
+        signature = hmac.new(
+            secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+        ).hexdigest()
+        return self.client.post(
+            path="/v1/money/webhook",
+            data=payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+        )
+
+    def test_webhook_records_event(self):
+        profile: MokaProfile = MokaProfileFactory()
+        Wallet.objects.create(owner=profile)
+        event = {
+            "id": "evt_1",
+            "object": "event",
+            "type": "checkout.session.completed",
+            "data": {"object": {**PAID_SESSION, "client_reference_id": profile.id}},
+        }
+        with mock.patch("stripe.PaymentIntent.retrieve") as mock_retrieve:
+            self.assertEqual(self.post_event(event).status_code, 200)
+            # Redelivery
+            self.assertEqual(self.post_event(event).status_code, 200)
+            mock_retrieve.assert_not_called()
+
+        stripe_event = StripeEvent.objects.get()
+        self.assertEqual(stripe_event.event_id, "evt_1")
+        self.assertEqual(stripe_event.status, StripeEvent.Status.PENDING)
+        self.assertEqual(stripe_event.payload, event)
+        # Processed later
+        profile.refresh_from_db()
+        self.assertEqual(profile.wallet.balance, 0)
+
+    def test_webhook_invalid_signature(self):
+        with self.assertRaises(stripe.error.SignatureVerificationError):
+            self.post_event(
+                {"id": "evt_1", "object": "event", "type": "ping"},
+                secret="not_the_secret",
+            )
+        self.assertFalse(StripeEvent.objects.exists())
+
     def test_checkout_complete_not_paid(self):
         profile: MokaProfile = MokaProfileFactory()
         Wallet.objects.create(owner=profile)
@@ -248,6 +301,13 @@ class TestPayoutAccountCreate(django.test.TransactionTestCase):
             mock_acct_create.assert_called()
             mock_acct_link_create.assert_called()
 
+            profile.wallet.refresh_from_db()
+            self.assertEqual(
+                profile.wallet.stripe_connect_account, PAYOUT_DISABLED_ACCT["id"]
+            )
+            self.assertFalse(profile.wallet.stripe_charges_enabled)
+            self.assertIsNotNone(profile.wallet.stripe_account_synced_at)
+
 
 class TestPurchaseEpisodes(django.test.TestCase):
     def test_not_enough_balance(self):
@@ -351,6 +411,10 @@ class TestPurchaseEpisodes(django.test.TestCase):
             seller_wallet = episode.series.owner.wallet
             self.assertEqual(buyer_wallet.usd_value, 899.1)
             self.assertEqual(buyer_wallet.balance, 900)
+            # Credited to the seller through the ledger
+            self.assertEqual(seller_wallet.monthly_profit_balance, 0)
+            self.assertEqual(fold_credits(), 1)
+            seller_wallet.refresh_from_db()
             self.assertEqual(seller_wallet.monthly_profit_usd_value, 99.9)
             self.assertEqual(seller_wallet.monthly_profit_balance, 100)
             self.assertEqual(seller_wallet.usd_value, 0)
@@ -364,6 +428,98 @@ class TestPurchaseEpisodes(django.test.TestCase):
             )
 
 
+class TestPurchaseEpisodesOfSeries(django.test.TestCase):
+    def setUp(self):
+        self.buyer = MokaProfileFactory()
+        self.series = SeriesFactory()
+        # Episode numbers 1 to 5, 2 is owned and 4 is not premium
+        self.episodes = [
+            EpisodeFactory(
+                series=self.series,
+                episode_number=number,
+                status=Episode.EpisodeStatus.PUBLIC,
+                is_premium=number != 4,
+                price=100,
+            )
+            for number in range(1, 6)
+        ]
+        PurchaseEpisode.objects.create(episode=self.episodes[1], profile=self.buyer)
+        # Another series
+        EpisodeFactory(
+            episode_number=3,
+            status=Episode.EpisodeStatus.PRE_RELEASE,
+            price=100,
+        )
+
+    def purchase(self, data):
+        with mock.patch(
+            "money.api.v1.FirebaseAuthentication.authenticate",
+            return_value=self.buyer,
+        ):
+            return self.client.post(
+                path="/v1/money/purchase-episodes",
+                data={"series_id": self.series.id, **data},
+                content_type="application/json",
+            )
+
+    def test_range(self):
+        buyer_wallet = Wallet.objects.create(
+            owner=self.buyer, usd_value=999, balance=1000
+        )
+        response = self.purchase({"from_episode_number": 1, "to_episode_number": 5})
+        self.assertEqual(response.status_code, 200)
+        purchased_ids = [str(self.episodes[i].id) for i in [0, 2, 4]]
+        self.assertEqual(response.json(), {"episode_ids": purchased_ids, "amount": 300})
+
+        # One debit and one credit for the whole range
+        buyer_wallet.refresh_from_db()
+        self.assertEqual(buyer_wallet.balance, 700)
+        self.assertAlmostEqual(buyer_wallet.usd_value, 699.3)
+        purchase = Transaction.objects.get(type=Transaction.Type.PURCHASE)
+        self.assertEqual(purchase.recipient, self.series.owner)
+        self.assertEqual(purchase.coin_amount, 300)
+        self.assertEqual(fold_credits(), 1)
+        self.assertEqual(self.series.owner.wallet.monthly_profit_balance, 300)
+        self.assertEqual(PurchaseEpisode.objects.filter(profile=self.buyer).count(), 4)
+
+        # Nothing left to purchase
+        response = self.purchase({"from_episode_number": 1, "to_episode_number": 5})
+        self.assertEqual(response.json(), {"episode_ids": [], "amount": 0})
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_episode_ids(self):
+        Wallet.objects.create(owner=self.buyer, usd_value=999, balance=1000)
+        response = self.purchase(
+            {"episode_ids": [episode.id for episode in self.episodes[:4]]}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "episode_ids": [str(self.episodes[i].id) for i in [0, 2]],
+                "amount": 200,
+            },
+        )
+
+    def test_not_enough_balance(self):
+        Wallet.objects.create(owner=self.buyer, usd_value=199, balance=200)
+        response = self.purchase({"from_episode_number": 1, "to_episode_number": 5})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Not enough balance")
+        self.assertEqual(PurchaseEpisode.objects.filter(profile=self.buyer).count(), 1)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_invalid_selection(self):
+        response = self.purchase({})
+        self.assertEqual(response.status_code, 400)
+        response = self.purchase({"from_episode_number": 5, "to_episode_number": 1})
+        self.assertEqual(response.status_code, 400)
+        response = self.purchase({"from_episode_number": 1, "to_episode_number": 100})
+        self.assertEqual(response.status_code, 400)
+        response = self.purchase({"episode_ids": list(range(101))})
+        self.assertEqual(response.status_code, 400)
+
+
 class TestWallet(django.test.TestCase):
     def test_new_wallet(self):
         profile = MokaProfileFactory()
@@ -398,15 +554,18 @@ class TestWallet(django.test.TestCase):
     def test_old_wallet_with_stripe_acct_payout_enabled(self):
         profile = MokaProfileFactory()
         Wallet.objects.create(
-            owner=profile, usd_value=876, balance=1345, stripe_connect_account="hello"
+            owner=profile,
+            usd_value=876,
+            balance=1345,
+            stripe_connect_account="hello",
+            stripe_charges_enabled=True,
+            stripe_account_email="creator@mochajump.com",
+            stripe_account_status=Wallet.StripeAccountStatus.ENABLED,
         )
         with mock.patch(
             "money.api.v1.FirebaseAuthentication.authenticate",
             return_value=profile,
-        ), mock.patch(
-            "stripe.Account.retrieve",
-            return_value=PAYOUT_ENABLED_ACCT,
-        ):
+        ), mock.patch("stripe.Account.retrieve") as mock_retrieve:
             response = self.client.get(
                 path=f"/v1/money/wallet",
                 content_type="application/json",
@@ -414,18 +573,23 @@ class TestWallet(django.test.TestCase):
             self.assertEqual(response["balance"], 1345)
             self.assertEqual(response["usd_value"], 876)
             self.assertEqual(response["payout_enabled"], True)
+            self.assertEqual(response["stripe_account_email"], "creator@mochajump.com")
+            # Read from the wallet
+            mock_retrieve.assert_not_called()
 
     def test_old_wallet_with_stripe_acct_payout_disabled(self):
         profile = MokaProfileFactory()
         Wallet.objects.create(
-            owner=profile, usd_value=876, balance=1345, stripe_connect_account="hello"
+            owner=profile,
+            usd_value=876,
+            balance=1345,
+            stripe_connect_account="hello",
+            stripe_charges_enabled=False,
+            stripe_account_status=Wallet.StripeAccountStatus.PENDING,
         )
         with mock.patch(
             "money.api.v1.FirebaseAuthentication.authenticate",
             return_value=profile,
-        ), mock.patch(
-            "stripe.Account.retrieve",
-            return_value=PAYOUT_DISABLED_ACCT,
         ):
             response = self.client.get(
                 path=f"/v1/money/wallet",
@@ -477,7 +641,7 @@ class TestPayout(django.test.TransactionTestCase):
                 monthly_profit_balance=10000,
                 payout_balance=299,
             )
-            payout(stripe_handler=StripeHandler())
+            run_payouts(stripe_handler=StripeHandler())
             mock_transfer_create.assert_not_called()
             wallet.refresh_from_db()
             self.assertEqual(wallet.payout_balance, 299)
@@ -494,7 +658,7 @@ class TestPayout(django.test.TransactionTestCase):
                 monthly_profit_balance=10000,
                 payout_balance=1500,
             )
-            payout(stripe_handler=StripeHandler())
+            run_payouts(stripe_handler=StripeHandler())
             mock_transfer_create.assert_not_called()
             wallet.refresh_from_db()
             self.assertEqual(wallet.payout_balance, 1500)
@@ -503,20 +667,18 @@ class TestPayout(django.test.TransactionTestCase):
         with mock.patch(
             "stripe.Transfer.create",
             return_value=None,
-        ) as mock_transfer_create, mock.patch(
-            "stripe.Account.retrieve",
-            return_value=PAYOUT_DISABLED_ACCT,
-        ):
+        ) as mock_transfer_create:
             wallet = WalletFactory(
                 usd_value=876,
                 balance=1345,
                 stripe_connect_account="hello",
+                stripe_charges_enabled=False,
                 monthly_profit_balance=10000,
                 monthly_profit_usd_value=9999,
                 payout_balance=10000,
                 payout_usd_value=9999,
             )
-            payout(stripe_handler=StripeHandler())
+            run_payouts(stripe_handler=StripeHandler())
             mock_transfer_create.assert_not_called()
             wallet.refresh_from_db()
             self.assertEqual(wallet.payout_balance, 10000)
@@ -525,20 +687,21 @@ class TestPayout(django.test.TransactionTestCase):
     def test_success(self):
         with mock.patch(
             "stripe.Transfer.create",
-            return_value=None,
+            return_value={"id": "tr_1"},
         ) as mock_transfer_create, mock.patch(
-            "stripe.Account.retrieve",
-            return_value=PAYOUT_ENABLED_ACCT,
-        ):
+            "stripe.Account.retrieve"
+        ) as mock_retrieve:
             wallet = WalletFactory(
                 usd_value=876,
                 balance=1345,
                 stripe_connect_account=PAYOUT_ENABLED_ACCT["id"],
+                stripe_charges_enabled=True,
                 monthly_profit_balance=10000,
                 payout_balance=1234,
                 payout_usd_value=1111.1234,
             )
-            payout(stripe_handler=StripeHandler())
+            run_payouts(stripe_handler=StripeHandler())
+            payout = Payout.objects.get(wallet=wallet)
             mock_transfer_create.assert_called_with(
                 amount=math.floor(1111.1234 * 0.9),
                 currency="usd",
@@ -547,8 +710,12 @@ class TestPayout(django.test.TransactionTestCase):
                     "coins": 1234,
                     "eligible_value": 1111.1234,
                     "platform_fee": 111,
+                    "payout_id": payout.id,
                 },
+                idempotency_key=f"moka-payout-{payout.id}",
+                transfer_group=f"moka-payout-{payout.id}",
             )
+            mock_retrieve.assert_not_called()
             wallet.refresh_from_db()
             self.assertEqual(wallet.balance, 1345)
             self.assertEqual(wallet.usd_value, 876)
@@ -556,3 +723,103 @@ class TestPayout(django.test.TransactionTestCase):
             self.assertEqual(wallet.monthly_profit_usd_value, 0)
             self.assertEqual(wallet.payout_balance, 0)
             self.assertEqual(wallet.payout_usd_value, 0)
+            self.assertEqual(payout.status, Payout.Status.TRANSFERRED)
+            self.assertEqual(payout.stripe_transfer_id, "tr_1")
+            self.assertTrue(
+                Transaction.objects.filter(
+                    type=Transaction.Type.WITHDRAW,
+                    recipient=wallet.owner,
+                    coin_amount=1234,
+                ).exists()
+            )
+
+
+class TestTransactions(django.test.TestCase):
+    def test_cursor_pagination(self):
+        profile = MokaProfileFactory()
+        other = MokaProfileFactory()
+        for coin_amount in range(1, 8):
+            Transaction.objects.create(
+                type=Transaction.Type.PURCHASE,
+                sender=other,
+                recipient=profile,
+                coin_amount=coin_amount,
+                usd_value=coin_amount / 100,
+            )
+        # Not visible to profile
+        Transaction.objects.create(
+            type=Transaction.Type.DEPOSIT,
+            recipient=other,
+            coin_amount=100,
+            usd_value=1,
+        )
+        # Ties on created_at are broken by id
+        Transaction.objects.filter(coin_amount__lte=4).update(
+            created_at=Transaction.objects.get(coin_amount=4).created_at
+        )
+
+        with mock.patch(
+            "money.api.v1.FirebaseAuthentication.authenticate",
+            return_value=profile,
+        ):
+            response = self.client.get("/v1/money/transactions?limit=3").json()
+            self.assertEqual(response["count"], 7)
+            coin_amounts = [item["coin_amount"] for item in response["items"]]
+            cursor = response["next_cursor"]
+            while cursor is not None:
+                response = self.client.get(
+                    f"/v1/money/transactions?limit=3&cursor={cursor}"
+                ).json()
+                self.assertIsNone(response["count"])
+                coin_amounts += [item["coin_amount"] for item in response["items"]]
+                cursor = response["next_cursor"]
+
+        self.assertEqual(coin_amounts, [7, 6, 5, 4, 3, 2, 1])
+
+
+class TestEarnings(django.test.TestCase):
+    def test_earnings_series(self):
+        creator = MokaProfileFactory()
+        fan = MokaProfileFactory()
+        WalletFactory(owner=fan, balance=1000, usd_value=500)
+        send_tip(recipient=creator, sender=fan, amount=100)
+        fold_credits()
+
+        with mock.patch(
+            "money.api.v1.FirebaseAuthentication.authenticate",
+            return_value=creator,
+        ):
+            response = self.client.get("/v1/money/earnings-series?days=6").json()
+            self.assertEqual(len(response), 7)
+            self.assertEqual(response[-1]["amount"], 100)
+            self.assertEqual(response[-1]["usd_value"], 50)
+            self.assertEqual(sum(bucket["amount"] for bucket in response), 100)
+
+            response = self.client.get("/v1/money/recent-income-amount?days=7")
+            self.assertEqual(response.json(), {"amount": 100, "usd_value": 50})
+
+            response = self.client.get("/v1/money/earnings-series?days=1000")
+            self.assertEqual(response.status_code, 400)
+
+    def test_wallet_includes_pending_credits(self):
+        creator = MokaProfileFactory()
+        fan = MokaProfileFactory()
+        WalletFactory(owner=fan, balance=1000, usd_value=500)
+        send_tip(recipient=creator, sender=fan, amount=100)
+
+        def get_wallet():
+            # A fresh profile per request, like the authentication
+            with mock.patch(
+                "money.api.v1.FirebaseAuthentication.authenticate",
+                return_value=MokaProfile.objects.get(id=creator.id),
+            ):
+                return self.client.get("/v1/money/wallet").json()
+
+        response = get_wallet()
+        self.assertEqual(response["monthly_profit_balance"], 100)
+        self.assertEqual(response["monthly_profit_usd_value"], 50)
+
+        fold_credits()
+        response = get_wallet()
+        self.assertEqual(response["monthly_profit_balance"], 100)
+        self.assertEqual(response["monthly_profit_usd_value"], 50)
@@ -1,12 +1,10 @@
 import datetime
-from typing import Optional
+from typing import List, Optional
 
-from money.gateway.stripe import StripeHandler
 from money.models import Transaction, Wallet
+from money.service.earnings import EarningsBucket
 from ninja import Schema
 
-stripe_handler = StripeHandler()
-
 
 class DepositCoinsInputSchema(Schema):
     current_path: str
@@ -30,6 +28,20 @@ class PurchaseEpisodeInputSchema(Schema):
     episode_id: str
 
 
+class PurchaseEpisodesInputSchema(Schema):
+    series_id: str
+    # Either a range of episode numbers, both included, or episode ids
+    from_episode_number: Optional[int]
+    to_episode_number: Optional[int]
+    episode_ids: Optional[List[str]]
+
+
+class PurchaseEpisodesOutputSchema(Schema):
+    # Already owned and ineligible episodes are skipped
+    episode_ids: List[str]
+    amount: int
+
+
 class TipInputSchema(Schema):
     profile_id: Optional[str]
     episode_id: Optional[str]
@@ -39,7 +51,7 @@ class TipInputSchema(Schema):
 class WalletMetaDataOutputSchema(Schema):
     balance: int
     usd_value: float
-    # Stripe account charges_enabled
+    # Stripe account charges_enabled, as last synced
     payout_enabled: bool
 
     creator_status: str
@@ -63,9 +75,7 @@ class WalletMetaDataOutputSchema(Schema):
     def resolve_payout_enabled(obj: Wallet):
         if obj.stripe_connect_account:
             # If they already submitted the full information, please wait until Stripe approves of payout
-            return stripe_handler.get_account(obj.stripe_connect_account)[
-                "charges_enabled"
-            ]
+            return obj.stripe_charges_enabled
         else:
             return False
 
@@ -76,17 +86,20 @@ class WalletMetaDataOutputSchema(Schema):
     @staticmethod
     def resolve_stripe_account_email(obj: Wallet):
         if obj.stripe_connect_account:
-            return stripe_handler.get_account(obj.stripe_connect_account)["email"]
+            return obj.stripe_account_email
         else:
             return None
 
+    # Including credits not folded yet, see money/service/credits.py
     @staticmethod
     def resolve_monthly_profit_balance(obj: Wallet):
-        return obj.monthly_profit_balance
+        return obj.monthly_profit_balance + getattr(obj, "_pending_credit_balance", 0)
 
     @staticmethod
     def resolve_monthly_profit_usd_value(obj: Wallet):
-        return obj.monthly_profit_usd_value
+        return obj.monthly_profit_usd_value + getattr(
+            obj, "_pending_credit_usd_value", 0
+        )
 
     @staticmethod
     def resolve_payout_balance(obj: Wallet):
@@ -143,3 +156,13 @@ class TransactionSchema(Schema):
 class RecentIncomeAmountSchema(Schema):
     amount: int
     usd_value: float
+
+
+class EarningsBucketSchema(Schema):
+    day: datetime.date
+    amount: int
+    usd_value: float
+
+    @staticmethod
+    def resolve_amount(obj: EarningsBucket):
+        return obj.coin_amount
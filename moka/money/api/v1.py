@@ -1,14 +1,16 @@
 import datetime
+import json
 from typing import List, Optional
 
 import stripe
 from common.auth import CloudSchedulerAuthentication, FirebaseAuthentication
 from common.errors import ErrorResponse, MokaBackendGenericError
 from common.logger import StructuredLogger
+from common.pagination import CursorPagination
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import IntegrityError
-from django.db.models import Q, Sum
+from django.db.models import Q
 from django.http import HttpRequest
 from django.shortcuts import get_object_or_404
 from django.views.decorators import csrf
@@ -19,7 +21,10 @@ from money.api.schema import (
     CreateConnectAccountOutputSchema,
     DepositCoinsInputSchema,
     DepositCoinsOutputSchema,
+    EarningsBucketSchema,
     PurchaseEpisodeInputSchema,
+    PurchaseEpisodesInputSchema,
+    PurchaseEpisodesOutputSchema,
     RecentIncomeAmountSchema,
     TipInputSchema,
     TransactionSchema,
@@ -27,17 +32,19 @@ from money.api.schema import (
 )
 from money.gateway.stripe import BelowMinimumCoinPurchase, StripeHandler
 from money.models import Transaction, Wallet
+from money.service import connect_account, credits, earnings, payout, webhook
 from money.service.transaction import (
+    MAX_EPISODES_PER_PURCHASE,
     NegativeAmount,
     NotEnoughBalance,
-    add_balance_to_wallet,
+    OverMaximumAmount,
     move_monthly_balance_to_payout_balance,
-    payout,
 )
 from money.service.transaction import purchase_episode as purchase_episode_transaction
-from money.service.transaction import remove_stored_connect_acct_id, send_tip
+from money.service.transaction import purchase_episodes, send_tip
 from ninja import Router
-from ninja.pagination import LimitOffsetPagination, paginate
+from ninja.pagination import paginate
+from series.models import Series
 
 router = Router()
 logger = StructuredLogger(__name__)
@@ -101,26 +108,38 @@ def stripe_webhook(request: HttpRequest):
         # Invalid signature
         raise e
 
-    if event["type"] == "checkout.session.completed":
-        session = event["data"]["object"]
-        try:
-            add_balance_to_wallet(stripe_handler, session)
-        except Exception as e:
-            logger.exception(
-                event_name="STRIPE_PURCHASE_FULFILL_FAILURE",
-                msg=str(e),
-                profile_id=session["client_reference_id"],
-                session_id=session["id"],
-            )
-            return 400
-    if event["type"] == "account.application.deauthorized":
-        connected_account_id = event["account"]
-        remove_stored_connect_acct_id(connected_account_id)
-    else:
-        print("Unhandled event type {}".format(event["type"]))
+    # Processed by process_stripe_events, Stripe only waits for the record
+    if not webhook.record_event(json.loads(payload)):
+        logger.info(
+            event_name="STRIPE_EVENT_DUPLICATE",
+            event_id=event["id"],
+            stripe_event_type=event["type"],
+        )
     return 200
 
 
+@router.post(
+    "/process-webhook-events",
+    auth=CloudSchedulerAuthentication(),
+)
+@csrf.csrf_exempt
+def process_stripe_events(request):
+    logger.info(event_name="PROCESS_STRIPE_EVENTS_START")
+    done_cnt = webhook.process_due_events(stripe_handler)
+    logger.info(event_name="PROCESS_STRIPE_EVENTS_DONE", done_cnt=done_cnt)
+
+
+@router.post(
+    "/refresh-connect-accounts",
+    auth=CloudSchedulerAuthentication(),
+)
+@csrf.csrf_exempt
+def refresh_connect_accounts(request):
+    logger.info(event_name="REFRESH_CONNECT_ACCOUNTS_START")
+    updated_cnt = connect_account.refresh_stale_accounts(stripe_handler)
+    logger.info(event_name="REFRESH_CONNECT_ACCOUNTS_DONE", updated_cnt=updated_cnt)
+
+
 @router.post(
     "/payout-account-create",
     response=CreateConnectAccountOutputSchema,
@@ -134,7 +153,11 @@ def create_stripe_connect_account(request, input: CreateConnectAccountInputSchem
     if profile.wallet.stripe_connect_account is None:
         account = stripe_handler.create_connect_account(profile)
 
-        profile.wallet.stripe_connect_account = account["id"]
+        connect_account.link_account(
+            profile.wallet,
+            account,
+            synced_at=datetime.datetime.now(datetime.timezone.utc),
+        )
         profile.wallet.save()
 
     onboard_url = stripe_handler.create_account_onboarding(
@@ -192,10 +215,57 @@ def purchase_episode(request, input: PurchaseEpisodeInputSchema):
         raise MokaBackendGenericError
 
 
+@router.post(
+    "/purchase-episodes",
+    response={
+        200: PurchaseEpisodesOutputSchema,
+        400: ErrorResponse,
+    },
+    auth=FirebaseAuthentication(),
+)
+def purchase_episodes_of_series(request, input: PurchaseEpisodesInputSchema):
+    buyer: MokaProfile = request.auth
+    series: Series = get_object_or_404(
+        Series.objects.select_related("owner"),
+        id=input.series_id,
+    )
+    if input.episode_ids is not None:
+        episode_cnt = len(input.episode_ids)
+        episode_filter = Q(id__in=input.episode_ids)
+    elif input.from_episode_number is not None and input.to_episode_number is not None:
+        episode_cnt = input.to_episode_number - input.from_episode_number + 1
+        episode_filter = Q(
+            episode_number__gte=input.from_episode_number,
+            episode_number__lte=input.to_episode_number,
+        )
+    else:
+        return 400, ErrorResponse(message="No episode range or episode_ids is provided")
+    if not 0 < episode_cnt <= MAX_EPISODES_PER_PURCHASE:
+        return 400, ErrorResponse(
+            message=f"Between 1 and {MAX_EPISODES_PER_PURCHASE} episodes can be purchased at once"
+        )
+
+    try:
+        episode_ids, amount = purchase_episodes(buyer, series, episode_filter)
+    except NotEnoughBalance:
+        return 400, ErrorResponse(message="Not enough balance")
+    except OverMaximumAmount:
+        return 400, ErrorResponse(message="Too many coins for a single purchase")
+    except IntegrityError as e:
+        logger.exception(
+            event_name="EPISODE_BULK_PURCHASE_ERROR",
+            msg=str(e),
+            buyer=buyer.id,
+            series_id=series.id,
+        )
+        raise MokaBackendGenericError
+    return PurchaseEpisodesOutputSchema(episode_ids=episode_ids, amount=amount)
+
+
 @router.post("/unlink-stripe-account", response=None, auth=FirebaseAuthentication())
 def unlink_stripe_account(request):
     profile: MokaProfile = request.auth
-    profile.wallet.stripe_connect_account = None
+    connect_account.unlink_account(profile.wallet)
     profile.wallet.save()
 
 
@@ -207,7 +277,12 @@ def unlink_stripe_account(request):
 def get_wallet(request):
     profile: MokaProfile = request.auth
     create_wallet_if_needed(profile)
-    return profile.wallet
+    wallet = profile.wallet
+    (
+        wallet._pending_credit_balance,
+        wallet._pending_credit_usd_value,
+    ) = credits.get_pending_credits(profile.id)
+    return wallet
 
 
 @router.get(
@@ -215,7 +290,7 @@ def get_wallet(request):
     response=List[TransactionSchema],
     auth=FirebaseAuthentication(),
 )
-@paginate(LimitOffsetPagination)
+@paginate(CursorPagination, ordering=("-created_at", "-id"))
 def get_transactions(request, type: Optional[str] = None):
     return (
         Transaction.objects.filter(
@@ -233,20 +308,32 @@ def get_transactions(request, type: Optional[str] = None):
     auth=FirebaseAuthentication(),
 )
 def get_recent_income(request, days: int = 0):
-    agg_transactions = Transaction.objects.filter(
-        type=Transaction.Type.PURCHASE,
-        recipient=request.auth,
-        created_at__gte=datetime.datetime.now().replace(tzinfo=datetime.timezone.utc)
-        - datetime.timedelta(days=days),
-    ).aggregate(
-        usd_value=Sum("usd_value"),
-        coin_amount=Sum("coin_amount"),
+    # Whole UTC days, from the daily earnings rollup
+    coin_amount, usd_value = earnings.get_earnings(
+        request.auth.id,
+        days=days,
+        today=datetime.datetime.now(datetime.timezone.utc).date(),
     )
-    coin_amount = agg_transactions["coin_amount"]
-    usd_value = agg_transactions["usd_value"]
     return RecentIncomeAmountSchema(
-        amount=coin_amount if coin_amount is not None else 0,
-        usd_value=usd_value if usd_value is not None else 0,
+        amount=coin_amount,
+        usd_value=usd_value,
+    )
+
+
+@router.get(
+    "/earnings-series",
+    response={200: List[EarningsBucketSchema], 400: ErrorResponse},
+    auth=FirebaseAuthentication(),
+)
+def get_earnings_series(request, days: int = 30):
+    if days < 0 or days > earnings.MAX_SERIES_DAYS:
+        return 400, ErrorResponse(
+            message=f"days must be between 0 and {earnings.MAX_SERIES_DAYS}"
+        )
+    return earnings.get_earnings_series(
+        request.auth.id,
+        days=days,
+        today=datetime.datetime.now(datetime.timezone.utc).date(),
     )
 
 
@@ -290,8 +377,22 @@ def tip(request, input: TipInputSchema):
 )
 @csrf.csrf_exempt
 def monthly_payout(request):
-    payout(stripe_handler=stripe_handler)
-    logger.info(event_name="PAYOUT_SUCCESSFUL")
+    result = payout.run_payouts(stripe_handler)
+    logger.info(
+        event_name="PAYOUT_SUCCESSFUL" if result.pending_cnt == 0 else "PAYOUT_PARTIAL",
+        **result._asdict(),
+    )
+
+
+@router.post(
+    "/fold-credits",
+    auth=CloudSchedulerAuthentication(),
+)
+@csrf.csrf_exempt
+def fold_credits(request):
+    logger.info(event_name="FOLD_CREDITS_START")
+    folded_cnt = credits.fold_credits()
+    logger.info(event_name="FOLD_CREDITS_DONE", folded_cnt=folded_cnt)
 
 
 @router.post(
@@ -300,5 +401,11 @@ def monthly_payout(request):
 )
 @csrf.csrf_exempt
 def move_monthly_to_payout(request):
-    move_monthly_balance_to_payout_balance()
-    logger.info(event_name="PAYOUT_SUCCESSFUL")
+    rollover = move_monthly_balance_to_payout_balance()
+    logger.info(
+        event_name="MONTHLY_ROLLOVER_SUCCESSFUL",
+        rollover_id=rollover.id,
+        wallet_cnt=rollover.wallet_cnt,
+        coin_amount=rollover.coin_amount,
+        usd_value=rollover.usd_value,
+    )
@@ -0,0 +1,153 @@
+"""
+In-memory stand-in for StripeHandler, for tests and benchmarks that must not
+reach Stripe. Calls sleep for the given latency and fail with the queued
+errors first, to exercise slow and flaky Stripe.
+"""
+import itertools
+import threading
+import time
+from typing import Dict, List, Tuple
+
+import stripe
+from moka_profile.models import MokaProfile
+
+
+class FakeStripeHandler:
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        # Errors raised by the next calls, in order
+        self.errors: List[Exception] = []
+        self.calls: List[str] = []
+        # payment intent id -> (amount, net) of its balance transactions
+        self.payment_intents: Dict[str, List[Tuple[int, int]]] = {}
+        self.accounts: Dict[str, dict] = {}
+        self.transfers: List[dict] = []
+        # Like Stripe, a retried request returns the result of the first one
+        self._transfers_by_key: Dict[str, dict] = {}
+
+    def fail_next(self, error: Exception = None, times: int = 1):
+        error = error or stripe.error.APIConnectionError("Stripe is unreachable")
+        with self._lock:
+            self.errors.extend([error] * times)
+
+    def add_payment_intent(self, payment_intent_id, amount, net):
+        self.payment_intents.setdefault(payment_intent_id, []).append((amount, net))
+
+    def add_account(self, account_id, charges_enabled=True, **fields):
+        self.accounts[account_id] = {
+            "id": account_id,
+            "email": None,
+            "charges_enabled": charges_enabled,
+            "details_submitted": charges_enabled,
+            **fields,
+        }
+        return self.accounts[account_id]
+
+    def _call(self, name):
+        with self._lock:
+            self.calls.append(name)
+            error = self.errors.pop(0) if self.errors else None
+        if self.latency:
+            time.sleep(self.latency)
+        if error is not None:
+            raise error
+
+    def _next_id(self, prefix):
+        with self._lock:
+            return f"{prefix}_fake_{next(self._ids)}"
+
+    def create_coin_purchase_checkout_session(
+        self,
+        profile: MokaProfile,
+        coins: int,
+        success_url: str,
+        cancel_url: str,
+    ):
+        self._call("create_coin_purchase_checkout_session")
+        session_id = self._next_id("cs")
+        return {
+            "id": session_id,
+            "url": f"https://checkout.stripe.test/{session_id}",
+            "client_reference_id": profile.id,
+        }
+
+    def retrieve_balance_transaction_nominal_and_net(self, payment_intent_id):
+        self._call("retrieve_balance_transaction_nominal_and_net")
+        try:
+            balance_transactions = self.payment_intents[payment_intent_id]
+        except KeyError:
+            raise stripe.error.InvalidRequestError(
+                f"No such payment_intent: '{payment_intent_id}'", "id"
+            )
+        return (
+            sum(amount for amount, _ in balance_transactions),
+            sum(net for _, net in balance_transactions),
+        )
+
+    def create_connect_account(self, profile: MokaProfile):
+        self._call("create_connect_account")
+        return self.add_account(self._next_id("acct"), charges_enabled=False)
+
+    def create_account_onboarding(
+        self,
+        account_id,
+        refresh_url,
+        return_url,
+    ):
+        self._call("create_account_onboarding")
+        return {"url": f"https://connect.stripe.test/setup/{account_id}"}
+
+    def get_account(
+        self,
+        account_id,
+    ):
+        self._call("get_account")
+        try:
+            return self.accounts[account_id]
+        except KeyError:
+            raise stripe.error.InvalidRequestError(
+                f"No such account: '{account_id}'", "id"
+            )
+
+    def create_transfer(
+        self,
+        usd_amount,
+        account_id,
+        metadata,
+        idempotency_key=None,
+        transfer_group=None,
+    ):
+        self._call("create_transfer")
+        transfer = {
+            "id": self._next_id("tr"),
+            "amount": usd_amount,
+            "currency": "usd",
+            "destination": account_id,
+            "metadata": metadata,
+            "transfer_group": transfer_group,
+        }
+        with self._lock:
+            if idempotency_key is not None:
+                if idempotency_key in self._transfers_by_key:
+                    return self._transfers_by_key[idempotency_key]
+                self._transfers_by_key[idempotency_key] = transfer
+            self.transfers.append(transfer)
+        return transfer
+
+    def find_transfer(
+        self,
+        transfer_group,
+    ):
+        self._call("find_transfer")
+        with self._lock:
+            for transfer in self.transfers:
+                if transfer["transfer_group"] == transfer_group:
+                    return transfer
+        return None
+
+    def forget_idempotency_keys(self):
+        # Stripe forgets them after 24 hours
+        with self._lock:
+            self._transfers_by_key.clear()
@@ -98,10 +98,21 @@ class StripeHandler:
         usd_amount,
         account_id,
         metadata,
+        idempotency_key=None,
+        transfer_group=None,
     ):
         return stripe.Transfer.create(
             amount=usd_amount,
             currency="usd",
             destination=account_id,
             metadata=metadata,
+            idempotency_key=idempotency_key,
+            transfer_group=transfer_group,
         )
+
+    def find_transfer(
+        self,
+        transfer_group,
+    ):
+        transfers = stripe.Transfer.list(transfer_group=transfer_group, limit=1)
+        return transfers["data"][0] if transfers["data"] else None
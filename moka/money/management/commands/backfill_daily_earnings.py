@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from money.service import earnings
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the daily earnings rollup of past days from purchase "
+        "transactions, the current day is left to the live rollup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=earnings.BACKFILL_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        row_cnt = earnings.backfill(chunk_size=options["chunk_size"])
+        self.stdout.write(f"Wrote {row_cnt} daily earnings")
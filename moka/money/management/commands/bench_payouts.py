@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand
+from moka_profile.models import MokaProfile
+from money.gateway.fake import FakeStripeHandler
+from money.models import Payout, PayoutRun, Transaction, Wallet
+from money.service import payout
+
+PROFILE_PREFIX = "bench_payouts_"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time run_payouts over synthetic wallets against a fake Stripe with "
+        "injected latency, per number of workers. Writes to the database, "
+        "run it against a development one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--wallets", type=int, default=200)
+        parser.add_argument("--latency-ms", type=float, default=100)
+        parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+
+    def handle(self, *args, **options):
+        num_wallets = options["wallets"]
+        latency = options["latency_ms"] / 1000
+        if PayoutRun.objects.filter(status=PayoutRun.Status.RUNNING).exists():
+            self.stderr.write("A payout run is in progress, not benchmarking")
+            return
+
+        profiles = MokaProfile.objects.bulk_create(
+            MokaProfile(
+                firebase_uid=f"{PROFILE_PREFIX}{i}",
+                display_name=f"{PROFILE_PREFIX}{i}",
+            )
+            for i in range(num_wallets)
+        )
+        wallets = Wallet.objects.bulk_create(
+            Wallet(
+                owner=profile,
+                stripe_connect_account=f"acct_{PROFILE_PREFIX}{i}",
+                stripe_charges_enabled=True,
+            )
+            for i, profile in enumerate(profiles)
+        )
+        wallet_ids = [wallet.id for wallet in wallets]
+        try:
+            for max_workers in options["workers"]:
+                Wallet.objects.filter(id__in=wallet_ids).update(
+                    payout_balance=1000, payout_usd_value=950
+                )
+                stripe_handler = FakeStripeHandler(latency=latency)
+
+                start = time.perf_counter()
+                result = payout.run_payouts(stripe_handler, max_workers=max_workers)
+                elapsed = time.perf_counter() - start
+
+                self.stdout.write(
+                    f"{max_workers:>3} workers: {elapsed:.2f}s "
+                    f"({result.transferred_cnt / elapsed:.1f} payouts/s), "
+                    f"{result.transferred_cnt} transferred"
+                )
+                PayoutRun.objects.filter(id=result.run_id).delete()
+        finally:
+            Payout.objects.filter(wallet_id__in=wallet_ids).delete()
+            Transaction.objects.filter(sender__in=profiles).delete()
+            MokaProfile.objects.filter(firebase_uid__startswith=PROFILE_PREFIX).delete()
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from money.gateway.stripe import StripeHandler
+from money.service import webhook
+
+
+class Command(BaseCommand):
+    help = (
+        "Process the recorded Stripe webhook events that are due, "
+        "or keep polling for them with --forever."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-workers", type=int, default=None)
+        parser.add_argument("--forever", action="store_true")
+        parser.add_argument("--poll-seconds", type=float, default=5)
+
+    def handle(self, *args, **options):
+        stripe_handler = StripeHandler()
+        kwargs = {}
+        if options["max_workers"] is not None:
+            kwargs["max_workers"] = options["max_workers"]
+
+        while True:
+            done_cnt = webhook.process_due_events(stripe_handler, **kwargs)
+            self.stdout.write(f"Processed {done_cnt} Stripe events")
+            if not options["forever"]:
+                break
+            time.sleep(options["poll_seconds"])
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from money.gateway.stripe import StripeHandler
+from money.service import payout
+
+
+class Command(BaseCommand):
+    help = (
+        "Pay out eligible wallets, resuming the run of the month if it didn't "
+        "finish. With --dry-run, only list the payouts it would make."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--max-workers", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            planned_payouts = payout.plan_payouts()
+            for planned in planned_payouts:
+                self.stdout.write(
+                    f"wallet {planned.wallet_id} -> {planned.stripe_connect_account}: "
+                    f"{planned.coin_amount} coins, {planned.transfer_amount} cents "
+                    f"(platform fee {planned.platform_fee})"
+                )
+            self.stdout.write(
+                f"{len(planned_payouts)} payouts, "
+                f"{sum(planned.transfer_amount for planned in planned_payouts)} cents"
+            )
+            return
+
+        kwargs = {}
+        if options["max_workers"] is not None:
+            kwargs["max_workers"] = options["max_workers"]
+        result = payout.run_payouts(StripeHandler(), **kwargs)
+        self.stdout.write(
+            f"Run {result.run_id}: {result.transferred_cnt} transferred, "
+            f"{result.failed_cnt} failed, {result.pending_cnt} pending"
+        )
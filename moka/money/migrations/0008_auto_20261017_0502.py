@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('money', '0007_auto_20220826_2010'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['recipient', 'created_at', 'id'], name='money_trans_recipie_df4e11_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['sender', 'created_at', 'id'], name='money_trans_sender__195019_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('money', '0009_stripeevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='stripe_account_email',
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='stripe_account_status',
+            field=models.CharField(choices=[('NONE', 'None'), ('ONBOARDING', 'Onboarding'), ('PENDING', 'Pending'), ('ENABLED', 'Enabled')], default='NONE', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='stripe_account_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='stripe_charges_enabled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='wallet',
+            name='stripe_connect_account',
+            field=models.CharField(db_index=True, max_length=500, null=True),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('money', '0010_wallet_stripe_account_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stripe_connect_account', models.CharField(max_length=500)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('TRANSFERRED', 'Transferred'), ('FAILED', 'Failed')], default='PENDING', max_length=50)),
+                ('coin_amount', models.PositiveBigIntegerField()),
+                ('usd_value', models.FloatField()),
+                ('platform_fee', models.FloatField()),
+                ('transfer_amount', models.PositiveBigIntegerField()),
+                ('stripe_transfer_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PayoutRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('DONE', 'Done')], default='RUNNING', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='payoutrun',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'RUNNING')), fields=('status',), name='unique_running_payout_run'),
+        ),
+        migrations.AddField(
+            model_name='payout',
+            name='run',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payouts', to='money.payoutrun'),
+        ),
+        migrations.AddField(
+            model_name='payout',
+            name='wallet',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payouts', to='money.wallet'),
+        ),
+        migrations.AddConstraint(
+            model_name='payout',
+            constraint=models.UniqueConstraint(fields=('run', 'wallet'), name='unique_payout_run_wallet'),
+        ),
+    ]
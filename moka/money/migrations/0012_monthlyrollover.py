@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('money', '0011_payout_run'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollover',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('wallet_cnt', models.PositiveIntegerField(default=0)),
+                ('coin_amount', models.PositiveBigIntegerField(default=0)),
+                ('usd_value', models.FloatField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moka_profile', '0013_auto_20261017_0516'),
+        ('money', '0012_monthlyrollover'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyEarnings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('coin_amount', models.PositiveBigIntegerField(default=0)),
+                ('usd_value', models.FloatField(default=0)),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_earnings', to='moka_profile.mokaprofile')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyearnings',
+            constraint=models.UniqueConstraint(fields=('recipient', 'day'), name='unique_daily_earnings'),
+        ),
+        # Backfill, the backfill_daily_earnings command rebuilds it later
+        migrations.RunSQL(
+            sql="""
+            INSERT INTO money_dailyearnings (recipient_id, day, coin_amount, usd_value)
+            SELECT
+                recipient_id,
+                (created_at AT TIME ZONE 'UTC')::date,
+                SUM(coin_amount),
+                SUM(usd_value)
+            FROM money_transaction
+            WHERE type = 'PURCHASE' AND recipient_id IS NOT NULL
+            GROUP BY 1, 2
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moka_profile', '0013_auto_20261017_0516'),
+        ('money', '0013_dailyearnings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipientCredit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('coin_amount', models.PositiveBigIntegerField()),
+                ('usd_value', models.FloatField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('folded_at', models.DateTimeField(blank=True, null=True)),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credits', to='moka_profile.mokaprofile')),
+                ('transaction', models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='credit', to='money.transaction')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipientcredit',
+            index=models.Index(condition=models.Q(('folded_at__isnull', True)), fields=['id'], name='money_credit_unfolded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipientcredit',
+            index=models.Index(condition=models.Q(('folded_at__isnull', True)), fields=['recipient'], name='money_credit_pending_idx'),
+        ),
+    ]
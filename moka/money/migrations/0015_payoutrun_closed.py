@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('money', '0014_recipientcredit'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payoutrun',
+            name='status',
+            field=models.CharField(choices=[('RUNNING', 'Running'), ('DONE', 'Done'), ('CLOSED', 'Closed')], default='RUNNING', max_length=50),
+        ),
+    ]
@@ -1,10 +1,19 @@
 from __future__ import division
 
 from django.db import models
+from django.utils import timezone
 from moka_profile.models import MokaProfile
 
 
 class Wallet(models.Model):
+    class StripeAccountStatus(models.TextChoices):
+        NONE = "NONE"
+        # Onboarding not completed
+        ONBOARDING = "ONBOARDING"
+        # Onboarded, waiting for Stripe to enable charges
+        PENDING = "PENDING"
+        ENABLED = "ENABLED"
+
     owner = models.OneToOneField(
         MokaProfile,
         on_delete=models.CASCADE,
@@ -16,7 +25,18 @@ class Wallet(models.Model):
     # Actual USD value corresponding to the coins owned
     usd_value = models.FloatField(default=0)
 
-    stripe_connect_account = models.CharField(max_length=500, null=True)
+    stripe_connect_account = models.CharField(max_length=500, null=True, db_index=True)
+    # Last known state of the connect account, so that wallet reads and payouts
+    # don't call Stripe. Kept up to date by account.updated webhooks and
+    # refresh_stale_accounts, see money/service/connect_account.py
+    stripe_charges_enabled = models.BooleanField(default=False)
+    stripe_account_email = models.CharField(max_length=500, null=True, blank=True)
+    stripe_account_status = models.CharField(
+        choices=StripeAccountStatus.choices,
+        default=StripeAccountStatus.NONE,
+        max_length=50,
+    )
+    stripe_account_synced_at = models.DateTimeField(null=True, blank=True)
 
     # Monthly profit received
     monthly_profit_balance = models.PositiveBigIntegerField(default=0)
@@ -32,6 +52,21 @@ class Wallet(models.Model):
         return self.usd_value / self.balance
 
 
+class MonthlyRollover(models.Model):
+    """
+    Audit entry of one move of monthly profits to payout balances, see
+    move_monthly_balance_to_payout_balance. Totals grow with each chunk,
+    in the transaction of the chunk.
+    """
+
+    started_at = models.DateTimeField(auto_now_add=True)
+    # Null while running, or if the run was interrupted
+    finished_at = models.DateTimeField(null=True, blank=True)
+    wallet_cnt = models.PositiveIntegerField(default=0)
+    coin_amount = models.PositiveBigIntegerField(default=0)
+    usd_value = models.FloatField(default=0)
+
+
 class Transaction(models.Model):
     class Type(models.TextChoices):
         WITHDRAW = "WITHDRAW"
@@ -60,3 +95,208 @@ class Transaction(models.Model):
     coin_amount = models.PositiveBigIntegerField(null=False)
     usd_value = models.FloatField(null=False)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Keyset pagination of a profile's transactions
+        indexes = [
+            models.Index(fields=["recipient", "created_at", "id"]),
+            models.Index(fields=["sender", "created_at", "id"]),
+        ]
+
+
+class StripeEvent(models.Model):
+    """
+    Inbox of verified Stripe webhook events. The webhook only records them,
+    see money/service/webhook.py for their processing.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING"
+        # Claimed by a worker until next_attempt_at, then claimable again
+        PROCESSING = "PROCESSING"
+        DONE = "DONE"
+        # Out of attempts
+        FAILED = "FAILED"
+
+    # Stripe retries deliveries with the same event id
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=255)
+    payload = models.JSONField()
+
+    status = models.CharField(
+        choices=Status.choices,
+        default=Status.PENDING,
+        max_length=50,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claim of due events
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+
+class PayoutRun(models.Model):
+    """
+    One payout of all eligible wallets per month, see
+    money/service/payout.py. A run that didn't finish is resumed by the next
+    one of the same month.
+    """
+
+    class Status(models.TextChoices):
+        RUNNING = "RUNNING"
+        DONE = "DONE"
+        # Left RUNNING by a past month, its PENDING payouts are resumed by
+        # later runs
+        CLOSED = "CLOSED"
+
+    status = models.CharField(
+        choices=Status.choices,
+        default=Status.RUNNING,
+        max_length=50,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Concurrent run_payouts share the run
+            models.UniqueConstraint(
+                fields=["status"],
+                condition=models.Q(status="RUNNING"),
+                name="unique_running_payout_run",
+            ),
+        ]
+
+
+class Payout(models.Model):
+    """
+    Transfer of the payout balance of one wallet within a run. The balance
+    is taken out of the wallet when the payout is created, and given back if
+    Stripe rejects the transfer.
+    """
+
+    class Status(models.TextChoices):
+        # Taken out of the wallet, the transfer may or may not have happened
+        PENDING = "PENDING"
+        TRANSFERRED = "TRANSFERRED"
+        # Rejected by Stripe, the balance is back in the wallet
+        FAILED = "FAILED"
+
+    run = models.ForeignKey(
+        PayoutRun,
+        on_delete=models.CASCADE,
+        related_name="payouts",
+    )
+    wallet = models.ForeignKey(
+        Wallet,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="payouts",
+    )
+    stripe_connect_account = models.CharField(max_length=500)
+    status = models.CharField(
+        choices=Status.choices,
+        default=Status.PENDING,
+        max_length=50,
+    )
+
+    coin_amount = models.PositiveBigIntegerField()
+    usd_value = models.FloatField()
+    platform_fee = models.FloatField()
+    # Cents transferred
+    transfer_amount = models.PositiveBigIntegerField()
+
+    stripe_transfer_id = models.CharField(max_length=255, null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["run", "wallet"], name="unique_payout_run_wallet"
+            ),
+        ]
+
+    @property
+    def idempotency_key(self) -> str:
+        # Retries of the payout within Stripe's idempotency window (24 hours)
+        # are applied once
+        return f"moka-payout-{self.id}"
+
+    @property
+    def transfer_group(self) -> str:
+        # Finds the transfer of the payout past that window
+        return f"moka-payout-{self.id}"
+
+
+class DailyEarnings(models.Model):
+    """
+    Coins and USD value received through purchases and tips per recipient
+    and UTC day, see money/service/earnings.py
+    """
+
+    recipient = models.ForeignKey(
+        MokaProfile,
+        on_delete=models.CASCADE,
+        related_name="daily_earnings",
+    )
+    day = models.DateField()
+    coin_amount = models.PositiveBigIntegerField(default=0)
+    usd_value = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index of a recipient's days
+            models.UniqueConstraint(
+                fields=["recipient", "day"], name="unique_daily_earnings"
+            ),
+        ]
+
+
+class RecipientCredit(models.Model):
+    """
+    Append-only ledger of coins owed to the recipient of a purchase or tip,
+    written without locking the recipient's wallet. Credits are folded into
+    Wallet.monthly_profit_* by money/service/credits.py.
+    """
+
+    recipient = models.ForeignKey(
+        MokaProfile,
+        on_delete=models.CASCADE,
+        related_name="credits",
+    )
+    transaction = models.OneToOneField(
+        Transaction,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="credit",
+    )
+    coin_amount = models.PositiveBigIntegerField()
+    usd_value = models.FloatField()
+    created_at = models.DateTimeField(default=timezone.now)
+    # Set once added to the wallet and daily earnings of the recipient
+    folded_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Credits to fold, in order
+            models.Index(
+                fields=["id"],
+                condition=models.Q(folded_at__isnull=True),
+                name="money_credit_unfolded_idx",
+            ),
+            # Pending credits of a recipient
+            models.Index(
+                fields=["recipient"],
+                condition=models.Q(folded_at__isnull=True),
+                name="money_credit_pending_idx",
+            ),
+        ]
@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from money.factory import WalletFactory
+from money.gateway.fake import FakeStripeHandler
+from money.models import Wallet
+from money.service import connect_account
+
+
+class ConnectAccountStateTests(TestCase):
+    def setUp(self):
+        self.stripe = FakeStripeHandler()
+        self.now = timezone.now()
+        self.max_staleness = timedelta(hours=1)
+
+    def refresh(self, **kwargs):
+        return connect_account.refresh_stale_accounts(
+            self.stripe, now=self.now, max_staleness=self.max_staleness, **kwargs
+        )
+
+    def test_account_status(self):
+        for account, status in [
+            ({"charges_enabled": True}, Wallet.StripeAccountStatus.ENABLED),
+            (
+                {"charges_enabled": False, "details_submitted": True},
+                Wallet.StripeAccountStatus.PENDING,
+            ),
+            ({"charges_enabled": False}, Wallet.StripeAccountStatus.ONBOARDING),
+        ]:
+            self.assertEqual(
+                connect_account.get_account_state(account)["stripe_account_status"],
+                status,
+            )
+
+    def test_older_state_is_ignored(self):
+        wallet = WalletFactory(stripe_connect_account="acct_1")
+        account = self.stripe.add_account("acct_1", email="new@mochajump.com")
+        self.assertEqual(connect_account.update_account_state(account, self.now), 1)
+
+        account = {**account, "charges_enabled": False, "email": "old@mochajump.com"}
+        self.assertEqual(
+            connect_account.update_account_state(
+                account, self.now - timedelta(minutes=1)
+            ),
+            0,
+        )
+        wallet.refresh_from_db()
+        self.assertTrue(wallet.stripe_charges_enabled)
+        self.assertEqual(wallet.stripe_account_email, "new@mochajump.com")
+        self.assertEqual(
+            wallet.stripe_account_status, Wallet.StripeAccountStatus.ENABLED
+        )
+
+    def test_refresh_stale_accounts(self):
+        never_synced = WalletFactory(stripe_connect_account="acct_never")
+        stale = WalletFactory(
+            stripe_connect_account="acct_stale",
+            stripe_account_synced_at=self.now - self.max_staleness * 2,
+        )
+        fresh = WalletFactory(
+            stripe_connect_account="acct_fresh",
+            stripe_account_synced_at=self.now - self.max_staleness / 2,
+        )
+        WalletFactory(stripe_connect_account=None)
+        for account_id in ["acct_never", "acct_stale", "acct_fresh"]:
+            self.stripe.add_account(account_id)
+
+        # Stalest first
+        self.assertEqual(self.refresh(batch_size=1), 1)
+        never_synced.refresh_from_db()
+        self.assertTrue(never_synced.stripe_charges_enabled)
+        self.assertEqual(never_synced.stripe_account_synced_at, self.now)
+
+        self.assertEqual(self.refresh(), 1)
+        self.assertEqual(self.refresh(), 0)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertTrue(stale.stripe_charges_enabled)
+        self.assertFalse(fresh.stripe_charges_enabled)
+        self.assertEqual(self.stripe.calls, ["get_account"] * 2)
+
+    def test_refresh_failure_leaves_state(self):
+        wallet = WalletFactory(stripe_connect_account="acct_1")
+        self.stripe.fail_next()
+        self.assertEqual(self.refresh(), 0)
+        wallet.refresh_from_db()
+        self.assertIsNone(wallet.stripe_account_synced_at)
@@ -0,0 +1,126 @@
+import threading
+import time
+
+from django.db import connection
+from django.db.models import Sum
+from django.test import TransactionTestCase
+from moka_profile.factory import MokaProfileFactory
+from money.factory import WalletFactory
+from money.models import DailyEarnings, RecipientCredit, Wallet
+from money.service import credits
+from money.service.transaction import send_tip
+
+
+class RecipientCreditTests(TransactionTestCase):
+    def setUp(self):
+        self.creator = MokaProfileFactory()
+        WalletFactory(owner=self.creator)
+
+    def make_fans(self, num_fans, balance):
+        fans = MokaProfileFactory.create_batch(num_fans)
+        for fan in fans:
+            WalletFactory(owner=fan, balance=balance, usd_value=balance / 2)
+        return fans
+
+    def run_threads(self, targets):
+        errors = []
+
+        def run(target):
+            try:
+                target()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(errors, [])
+        return time.perf_counter() - start
+
+    def test_fold(self):
+        fan = self.make_fans(1, balance=1000)[0]
+        send_tip(recipient=self.creator, sender=fan, amount=100)
+        send_tip(recipient=self.creator, sender=fan, amount=20)
+        self.assertEqual(credits.get_pending_credits(self.creator.id), (120, 60))
+
+        self.assertEqual(credits.fold_credits(chunk_size=1), 2)
+        self.assertEqual(credits.fold_credits(), 0)
+        self.assertEqual(credits.get_pending_credits(self.creator.id), (0, 0))
+        wallet = Wallet.objects.get(owner=self.creator)
+        self.assertEqual(wallet.monthly_profit_balance, 120)
+        self.assertEqual(wallet.monthly_profit_usd_value, 60)
+        self.assertEqual(
+            DailyEarnings.objects.get(recipient=self.creator).coin_amount, 120
+        )
+
+    def test_hammer_one_creator(self):
+        num_fans, tips_per_fan = 8, 30
+        fans = self.make_fans(num_fans, balance=1000)
+
+        def tip(fan):
+            for _ in range(tips_per_fan):
+                send_tip(recipient=self.creator, sender=fan, amount=3)
+
+        done = threading.Event()
+
+        def fold():
+            try:
+                while not done.is_set():
+                    credits.fold_credits(chunk_size=20)
+            finally:
+                connection.close()
+
+        folder = threading.Thread(target=fold)
+        folder.start()
+        try:
+            elapsed = self.run_threads([lambda fan=fan: tip(fan) for fan in fans])
+        finally:
+            done.set()
+            folder.join()
+        credits.fold_credits()
+
+        num_tips = num_fans * tips_per_fan
+        # Generous floor, buyers only wait on their own wallet
+        self.assertGreater(num_tips / elapsed, 20)
+
+        self.assertEqual(
+            RecipientCredit.objects.filter(
+                recipient=self.creator, folded_at__isnull=False
+            ).count(),
+            num_tips,
+        )
+        creator_wallet = Wallet.objects.get(owner=self.creator)
+        self.assertEqual(creator_wallet.monthly_profit_balance, num_tips * 3)
+        self.assertAlmostEqual(creator_wallet.monthly_profit_usd_value, num_tips * 1.5)
+        self.assertEqual(
+            Wallet.objects.filter(owner__in=fans).aggregate(total=Sum("balance"))[
+                "total"
+            ],
+            num_fans * (1000 - tips_per_fan * 3),
+        )
+        self.assertEqual(
+            DailyEarnings.objects.filter(recipient=self.creator).aggregate(
+                total=Sum("coin_amount")
+            )["total"],
+            num_tips * 3,
+        )
+
+    def test_mutual_tips_dont_deadlock(self):
+        a, b = self.make_fans(2, balance=1000)
+
+        def tip(sender, recipient):
+            for _ in range(50):
+                send_tip(recipient=recipient, sender=sender, amount=1)
+
+        self.run_threads([lambda: tip(a, b), lambda: tip(b, a)])
+        credits.fold_credits()
+        for profile in [a, b]:
+            wallet = Wallet.objects.get(owner=profile)
+            self.assertEqual(wallet.balance, 950)
+            self.assertEqual(wallet.monthly_profit_balance, 50)
@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from moka_profile.factory import MokaProfileFactory
+from money.factory import WalletFactory
+from money.models import DailyEarnings, RecipientCredit, Transaction
+from money.service import earnings
+from money.service.credits import fold_credits
+from money.service.transaction import send_tip
+
+
+class DailyEarningsTests(TestCase):
+    def setUp(self):
+        self.creator = MokaProfileFactory()
+        self.fan = MokaProfileFactory()
+        WalletFactory(owner=self.fan, balance=1000, usd_value=1000)
+        self.today = timezone.now().date()
+
+    def age_transactions(self, days):
+        created_at = timezone.now() - timedelta(days=days)
+        Transaction.objects.filter(recipient=self.creator).update(created_at=created_at)
+        RecipientCredit.objects.filter(recipient=self.creator).update(
+            created_at=created_at
+        )
+
+    def test_purchases_add_to_the_day(self):
+        send_tip(recipient=self.creator, sender=self.fan, amount=100)
+        send_tip(recipient=self.creator, sender=self.fan, amount=50)
+        # Added when folded
+        self.assertFalse(DailyEarnings.objects.exists())
+        fold_credits()
+        row = DailyEarnings.objects.get(recipient=self.creator)
+        self.assertEqual(row.day, self.today)
+        self.assertEqual(row.coin_amount, 150)
+        self.assertEqual(row.usd_value, 150)
+        self.assertEqual(
+            earnings.get_earnings(self.creator.id, days=0, today=self.today),
+            (150, 150),
+        )
+
+    def test_series(self):
+        send_tip(recipient=self.creator, sender=self.fan, amount=30)
+        self.age_transactions(days=2)
+        send_tip(recipient=self.creator, sender=self.fan, amount=20)
+        fold_credits()
+        # Rows of older days come from the backfill
+        DailyEarnings.objects.filter(day__lt=self.today).delete()
+        self.assertEqual(earnings.backfill(chunk_size=1), 1)
+
+        with self.assertNumQueries(1):
+            series = earnings.get_earnings_series(
+                self.creator.id, days=3, today=self.today
+            )
+        self.assertEqual(
+            [(bucket.day, bucket.coin_amount) for bucket in series],
+            [
+                (self.today - timedelta(days=3), 0),
+                (self.today - timedelta(days=2), 30),
+                (self.today - timedelta(days=1), 0),
+                (self.today, 20),
+            ],
+        )
+        self.assertEqual(
+            earnings.get_earnings(self.creator.id, days=1, today=self.today),
+            (20, 20),
+        )
+        self.assertEqual(
+            earnings.get_earnings(self.creator.id, days=2, today=self.today),
+            (50, 50),
+        )
+
+    def test_backfill_overwrites(self):
+        tomorrow = timezone.now() + timedelta(days=1)
+        send_tip(recipient=self.creator, sender=self.fan, amount=30)
+        fold_credits()
+        DailyEarnings.objects.update(coin_amount=999)
+        earnings.backfill(now=tomorrow)
+        earnings.backfill(now=tomorrow)
+        self.assertEqual(DailyEarnings.objects.get().coin_amount, 30)
+
+        # Not folded yet, left to the fold
+        send_tip(recipient=self.creator, sender=self.fan, amount=10)
+        earnings.backfill(now=tomorrow)
+        self.assertEqual(DailyEarnings.objects.get().coin_amount, 30)
+        fold_credits()
+        self.assertEqual(DailyEarnings.objects.get().coin_amount, 40)
+
+    def test_backfill_leaves_today_to_the_rollup(self):
+        send_tip(recipient=self.creator, sender=self.fan, amount=30)
+        fold_credits()
+        DailyEarnings.objects.update(coin_amount=999)
+        self.assertEqual(earnings.backfill(), 0)
+        self.assertEqual(DailyEarnings.objects.get().coin_amount, 999)
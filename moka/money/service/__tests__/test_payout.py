@@ -0,0 +1,220 @@
+from datetime import timedelta
+
+import stripe
+from django.db.models import F
+from django.test import TransactionTestCase
+from django.utils import timezone
+from money.factory import WalletFactory
+from money.gateway.fake import FakeStripeHandler
+from money.models import Payout, PayoutRun, Transaction, Wallet
+from money.service import payout
+
+
+class PayoutEngineTests(TransactionTestCase):
+    def setUp(self):
+        self.stripe = FakeStripeHandler()
+        self.wallets = [
+            WalletFactory(
+                stripe_connect_account=f"acct_{i}",
+                stripe_charges_enabled=True,
+                payout_balance=1000,
+                payout_usd_value=950,
+            )
+            for i in range(5)
+        ]
+        # Not eligible
+        self.small_wallet = WalletFactory(
+            stripe_connect_account="acct_small",
+            stripe_charges_enabled=True,
+            payout_balance=299,
+            payout_usd_value=280,
+        )
+        self.disabled_wallet = WalletFactory(
+            stripe_connect_account="acct_disabled",
+            stripe_charges_enabled=False,
+            payout_balance=1000,
+            payout_usd_value=950,
+        )
+
+    def assert_paid_out(self, wallet):
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.payout_balance, 0)
+        self.assertEqual(wallet.payout_usd_value, 0)
+        self.assertEqual(
+            Transaction.objects.filter(
+                type=Transaction.Type.WITHDRAW, recipient=wallet.owner
+            ).count(),
+            1,
+        )
+
+    def test_run_payouts(self):
+        result = payout.run_payouts(self.stripe, max_workers=3)
+        self.assertEqual(result.transferred_cnt, 5)
+        self.assertEqual(result.failed_cnt, 0)
+        self.assertEqual(result.pending_cnt, 0)
+        self.assertEqual(
+            PayoutRun.objects.get(id=result.run_id).status, PayoutRun.Status.DONE
+        )
+
+        self.assertEqual(len(self.stripe.transfers), 5)
+        # 10% platform fee
+        self.assertEqual({t["amount"] for t in self.stripe.transfers}, {855})
+        for wallet in self.wallets:
+            self.assert_paid_out(wallet)
+        for wallet in [self.small_wallet, self.disabled_wallet]:
+            wallet.refresh_from_db()
+            self.assertGreater(wallet.payout_balance, 0)
+
+        # Nothing left to pay out
+        result = payout.run_payouts(self.stripe)
+        self.assertEqual(result.transferred_cnt, 0)
+        self.assertEqual(len(self.stripe.transfers), 5)
+
+    def test_dry_run(self):
+        planned_payouts = payout.plan_payouts()
+        self.assertEqual(
+            [planned.wallet_id for planned in planned_payouts],
+            [wallet.id for wallet in self.wallets],
+        )
+        self.assertEqual(planned_payouts[0].transfer_amount, 855)
+        self.assertEqual(self.stripe.calls, [])
+        self.assertFalse(PayoutRun.objects.exists())
+        self.wallets[0].refresh_from_db()
+        self.assertEqual(self.wallets[0].payout_balance, 1000)
+
+    def test_resume_interrupted_run(self):
+        # Stripe unreachable for two of the transfers
+        self.stripe.fail_next(times=2)
+        result = payout.run_payouts(self.stripe, max_workers=1)
+        self.assertEqual(result.transferred_cnt, 3)
+        self.assertEqual(result.pending_cnt, 2)
+        run = PayoutRun.objects.get(id=result.run_id)
+        self.assertEqual(run.status, PayoutRun.Status.RUNNING)
+        # Taken out of the wallets until transferred
+        for pending in run.payouts.filter(status=Payout.Status.PENDING):
+            self.assertIn("APIConnectionError", pending.last_error)
+            self.assertEqual(pending.wallet.payout_balance, 0)
+
+        # A crash after reserving a wallet, before its transfer
+        wallet = WalletFactory(
+            stripe_connect_account="acct_late",
+            stripe_charges_enabled=True,
+            payout_balance=500,
+            payout_usd_value=450,
+        )
+        payout.reserve_payout(run, wallet.id)
+
+        result = payout.run_payouts(self.stripe)
+        self.assertEqual(result.run_id, run.id)
+        self.assertEqual(result.transferred_cnt, 3)
+        self.assertEqual(result.pending_cnt, 0)
+        run.refresh_from_db()
+        self.assertEqual(run.status, PayoutRun.Status.DONE)
+        for wallet in self.wallets + [wallet]:
+            self.assert_paid_out(wallet)
+        self.assertEqual(len(self.stripe.transfers), 6)
+
+    def test_retried_transfer_is_applied_once(self):
+        run = PayoutRun.objects.create()
+        pending = payout.reserve_payout(run, self.wallets[0].id)
+        # Transferred by Stripe, but the worker died before recording it
+        self.stripe.create_transfer(
+            usd_amount=pending.transfer_amount,
+            account_id=pending.stripe_connect_account,
+            metadata={},
+            idempotency_key=pending.idempotency_key,
+        )
+
+        payout.run_payouts(self.stripe)
+        self.assertEqual(
+            len(
+                [
+                    t
+                    for t in self.stripe.transfers
+                    if t["destination"] == pending.stripe_connect_account
+                ]
+            ),
+            1,
+        )
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, Payout.Status.TRANSFERRED)
+        self.assert_paid_out(self.wallets[0])
+
+    def test_rejected_transfer_gives_balance_back(self):
+        self.stripe.fail_next(
+            stripe.error.InvalidRequestError("Insufficient funds", "amount")
+        )
+        result = payout.run_payouts(self.stripe, max_workers=1)
+        self.assertEqual(result.failed_cnt, 1)
+        self.assertEqual(result.transferred_cnt, 4)
+        # Failed payouts are not retried within the run
+        self.assertEqual(
+            PayoutRun.objects.get(id=result.run_id).status, PayoutRun.Status.DONE
+        )
+
+        failed = Payout.objects.get(status=Payout.Status.FAILED)
+        wallet = Wallet.objects.get(id=failed.wallet_id)
+        self.assertEqual(wallet.payout_balance, 1000)
+        self.assertEqual(wallet.payout_usd_value, 950)
+        self.assertFalse(
+            Transaction.objects.filter(
+                type=Transaction.Type.WITHDRAW, recipient=wallet.owner
+            ).exists()
+        )
+
+    def test_transfer_found_after_idempotency_window(self):
+        run = PayoutRun.objects.create()
+        pending = payout.reserve_payout(run, self.wallets[0].id)
+        # Transferred by Stripe, and the idempotency key forgotten since
+        payout.transfer_payout(self.stripe, pending)
+        Payout.objects.filter(id=pending.id).update(
+            status=Payout.Status.PENDING, stripe_transfer_id=None
+        )
+        Transaction.objects.all().delete()
+        self.stripe.forget_idempotency_keys()
+
+        payout.run_payouts(self.stripe)
+        self.assertEqual(
+            len(
+                [
+                    t
+                    for t in self.stripe.transfers
+                    if t["destination"] == pending.stripe_connect_account
+                ]
+            ),
+            1,
+        )
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, Payout.Status.TRANSFERRED)
+        self.assertEqual(pending.stripe_transfer_id, self.stripe.transfers[0]["id"])
+        self.assert_paid_out(self.wallets[0])
+
+    def test_run_of_past_month_is_closed(self):
+        self.stripe.fail_next(times=1)
+        result = payout.run_payouts(self.stripe, max_workers=1)
+        self.assertEqual(result.pending_cnt, 1)
+        last_month = timezone.now() - timedelta(days=40)
+        PayoutRun.objects.filter(id=result.run_id).update(created_at=last_month)
+
+        # New balances of the month, including wallets paid out last month
+        Wallet.objects.filter(id__in=[w.id for w in self.wallets]).update(
+            payout_balance=F("payout_balance") + 500,
+            payout_usd_value=F("payout_usd_value") + 450,
+        )
+        result = payout.run_payouts(self.stripe)
+        self.assertNotEqual(result.run_id, PayoutRun.objects.first().id)
+        # The pending payout of last month, then every wallet
+        self.assertEqual(result.transferred_cnt, 6)
+        self.assertEqual(result.pending_cnt, 0)
+        self.assertEqual(
+            dict(PayoutRun.objects.values_list("id", "status")),
+            {
+                PayoutRun.objects.get(created_at=last_month).id: (
+                    PayoutRun.Status.CLOSED
+                ),
+                result.run_id: PayoutRun.Status.DONE,
+            },
+        )
+        for wallet in self.wallets:
+            wallet.refresh_from_db()
+            self.assertEqual(wallet.payout_balance, 0)
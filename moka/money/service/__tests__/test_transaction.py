@@ -0,0 +1,79 @@
+import threading
+
+from django.db import connection
+from django.db.models import Sum
+from django.test import TransactionTestCase
+from moka_profile.factory import MokaProfileFactory
+from money.factory import WalletFactory
+from money.models import MonthlyRollover, Wallet
+from money.service.credits import fold_credits
+from money.service.transaction import move_monthly_balance_to_payout_balance, send_tip
+
+
+class MonthlyRolloverTests(TransactionTestCase):
+    def test_rollover_ledger(self):
+        profit_wallets = WalletFactory.create_batch(
+            size=7,
+            monthly_profit_balance=100,
+            monthly_profit_usd_value=90,
+            payout_balance=10,
+            payout_usd_value=9,
+        )
+        no_profit_wallet = WalletFactory(payout_balance=10, payout_usd_value=9)
+
+        rollover = move_monthly_balance_to_payout_balance(chunk_size=3)
+        self.assertEqual(rollover.wallet_cnt, 7)
+        self.assertEqual(rollover.coin_amount, 700)
+        self.assertEqual(rollover.usd_value, 630)
+        self.assertIsNotNone(rollover.finished_at)
+        for wallet in profit_wallets:
+            wallet.refresh_from_db()
+            self.assertEqual(wallet.monthly_profit_balance, 0)
+            self.assertEqual(wallet.monthly_profit_usd_value, 0)
+            self.assertEqual(wallet.payout_balance, 110)
+            self.assertEqual(wallet.payout_usd_value, 99)
+        no_profit_wallet.refresh_from_db()
+        self.assertEqual(no_profit_wallet.payout_balance, 10)
+
+        # Nothing left to move
+        rollover = move_monthly_balance_to_payout_balance()
+        self.assertEqual(rollover.wallet_cnt, 0)
+        self.assertEqual(MonthlyRollover.objects.count(), 2)
+
+    def test_concurrent_tips_are_kept(self):
+        creator = MokaProfileFactory()
+        WalletFactory(owner=creator)
+        fans = MokaProfileFactory.create_batch(4)
+        for fan in fans:
+            WalletFactory(owner=fan, balance=1000, usd_value=1000)
+        # Wallets around the creator's, spread over chunks
+        WalletFactory.create_batch(size=20, monthly_profit_balance=5)
+        tips_per_fan = 25
+
+        def tip(fan):
+            try:
+                for _ in range(tips_per_fan):
+                    send_tip(recipient=creator, sender=fan, amount=1)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=tip, args=(fan,)) for fan in fans]
+        for thread in threads:
+            thread.start()
+        rollovers = [
+            move_monthly_balance_to_payout_balance(chunk_size=2) for _ in range(3)
+        ]
+        for thread in threads:
+            thread.join()
+        fold_credits()
+
+        creator_wallet = Wallet.objects.get(owner=creator)
+        self.assertEqual(
+            creator_wallet.monthly_profit_balance + creator_wallet.payout_balance,
+            len(fans) * tips_per_fan,
+        )
+        # Everything moved is accounted for in the ledger
+        self.assertEqual(
+            sum(rollover.coin_amount for rollover in rollovers),
+            Wallet.objects.aggregate(total=Sum("payout_balance"))["total"],
+        )
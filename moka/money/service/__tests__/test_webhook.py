@@ -0,0 +1,183 @@
+from django.db import connection
+from django.test import TransactionTestCase
+from django.utils import timezone
+from moka_profile.factory import MokaProfileFactory
+from money.gateway.fake import FakeStripeHandler
+from money.models import StripeEvent, Transaction, Wallet
+from money.service import webhook
+
+
+def checkout_completed_event(event_id, profile, payment_intent_id):
+    return {
+        "id": event_id,
+        "type": "checkout.session.completed",
+        "data": {
+            "object": {
+                "id": f"cs_{event_id}",
+                "payment_status": "paid",
+                "payment_intent": payment_intent_id,
+                "client_reference_id": profile.id,
+            }
+        },
+    }
+
+
+class StripeEventProcessingTests(TransactionTestCase):
+    def setUp(self):
+        self.stripe = FakeStripeHandler()
+        self.profile = MokaProfileFactory()
+        Wallet.objects.create(owner=self.profile)
+        self.stripe.add_payment_intent("pi_1", amount=500, net=455)
+
+    def record_checkout(self, event_id="evt_1", payment_intent_id="pi_1"):
+        return webhook.record_event(
+            checkout_completed_event(event_id, self.profile, payment_intent_id)
+        )
+
+    def make_due(self):
+        StripeEvent.objects.update(next_attempt_at=timezone.now())
+
+    def assert_balance(self, balance, usd_value):
+        wallet = Wallet.objects.get(owner=self.profile)
+        self.assertEqual(wallet.balance, balance)
+        self.assertEqual(wallet.usd_value, usd_value)
+
+    def test_deposit_once(self):
+        self.assertTrue(self.record_checkout())
+        # Redelivery
+        self.assertFalse(self.record_checkout())
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+        self.assertEqual(webhook.process_due_events(self.stripe), 1)
+        self.assertEqual(webhook.process_due_events(self.stripe), 0)
+        self.assert_balance(500, 455)
+        self.assertEqual(
+            Transaction.objects.filter(type=Transaction.Type.DEPOSIT).count(), 1
+        )
+        event = StripeEvent.objects.get()
+        self.assertEqual(event.status, StripeEvent.Status.DONE)
+        self.assertEqual(event.attempts, 1)
+        self.assertIsNotNone(event.processed_at)
+
+    def test_expired_claim_is_not_applied_twice(self):
+        self.record_checkout()
+        now = timezone.now()
+        event_ids = webhook.claim_events(now)
+        # Claimed again once the claim expired, e.g. by a slow worker
+        self.assertEqual(webhook.claim_events(now), [])
+        self.assertEqual(webhook.claim_events(now + webhook.CLAIM_TIMEOUT), event_ids)
+
+        self.assertTrue(webhook.process_event(self.stripe, event_ids[0]))
+        self.assertTrue(webhook.process_event(self.stripe, event_ids[0]))
+        self.assert_balance(500, 455)
+        self.assertEqual(StripeEvent.objects.get().attempts, 2)
+
+    def test_stripe_read_outside_transaction(self):
+        self.record_checkout()
+        retrieve = self.stripe.retrieve_balance_transaction_nominal_and_net
+        in_atomic_block = []
+
+        def retrieve_and_check(payment_intent_id):
+            in_atomic_block.append(connection.in_atomic_block)
+            return retrieve(payment_intent_id)
+
+        self.stripe.retrieve_balance_transaction_nominal_and_net = retrieve_and_check
+        self.assertEqual(webhook.process_due_events(self.stripe, max_workers=1), 1)
+        self.assertEqual(in_atomic_block, [False])
+        self.assert_balance(500, 455)
+
+    def test_retry_with_backoff(self):
+        self.record_checkout()
+        self.stripe.fail_next()
+        self.assertEqual(webhook.process_due_events(self.stripe), 0)
+        event = StripeEvent.objects.get()
+        self.assertEqual(event.status, StripeEvent.Status.PENDING)
+        self.assertEqual(event.attempts, 1)
+        self.assertIn("APIConnectionError", event.last_error)
+        self.assertGreater(event.next_attempt_at, timezone.now())
+        self.assert_balance(0, 0)
+
+        # Not due yet
+        self.assertEqual(webhook.process_due_events(self.stripe), 0)
+        self.make_due()
+        self.assertEqual(webhook.process_due_events(self.stripe), 1)
+        self.assert_balance(500, 455)
+        event.refresh_from_db()
+        self.assertEqual(event.status, StripeEvent.Status.DONE)
+        self.assertIsNone(event.last_error)
+
+    def test_fail_after_max_attempts(self):
+        self.record_checkout()
+        self.stripe.fail_next(times=webhook.MAX_ATTEMPTS)
+        for _ in range(webhook.MAX_ATTEMPTS):
+            self.make_due()
+            webhook.process_due_events(self.stripe)
+        event = StripeEvent.objects.get()
+        self.assertEqual(event.status, StripeEvent.Status.FAILED)
+        self.assertEqual(event.attempts, webhook.MAX_ATTEMPTS)
+
+        self.make_due()
+        self.assertEqual(webhook.process_due_events(self.stripe), 0)
+        self.assert_balance(0, 0)
+
+    def test_retry_backoff_is_capped(self):
+        self.assertEqual(webhook.get_retry_backoff(1), webhook.RETRY_BACKOFF)
+        self.assertEqual(webhook.get_retry_backoff(2), webhook.RETRY_BACKOFF * 2)
+        self.assertEqual(webhook.get_retry_backoff(20), webhook.MAX_RETRY_BACKOFF)
+
+    def test_concurrent_processing(self):
+        self.stripe.latency = 0.01
+        num_events = 12
+        for i in range(num_events):
+            self.stripe.add_payment_intent(f"pi_concurrent_{i}", amount=300, net=270)
+            self.record_checkout(f"evt_concurrent_{i}", f"pi_concurrent_{i}")
+
+        self.assertEqual(
+            webhook.process_due_events(self.stripe, max_workers=4, batch_size=5),
+            num_events,
+        )
+        self.assertFalse(
+            StripeEvent.objects.exclude(status=StripeEvent.Status.DONE).exists()
+        )
+        self.assert_balance(300 * num_events, 270 * num_events)
+
+    def test_deauthorized_account(self):
+        Wallet.objects.filter(owner=self.profile).update(
+            stripe_connect_account="acct_1"
+        )
+        webhook.record_event(
+            {
+                "id": "evt_deauthorized",
+                "type": "account.application.deauthorized",
+                "account": "acct_1",
+                "data": {"object": {}},
+            }
+        )
+        # Other types are only recorded
+        webhook.record_event(
+            {"id": "evt_other", "type": "payment_intent.created", "data": {}}
+        )
+        self.assertEqual(webhook.process_due_events(self.stripe), 2)
+        self.assertIsNone(Wallet.objects.get(owner=self.profile).stripe_connect_account)
+
+    def test_account_updated(self):
+        Wallet.objects.filter(owner=self.profile).update(
+            stripe_connect_account="acct_1"
+        )
+        account = self.stripe.add_account("acct_1", email="creator@mochajump.com")
+        webhook.record_event(
+            {
+                "id": "evt_account_updated",
+                "type": "account.updated",
+                "created": int(timezone.now().timestamp()),
+                "account": "acct_1",
+                "data": {"object": account},
+            }
+        )
+        self.assertEqual(webhook.process_due_events(self.stripe), 1)
+        wallet = Wallet.objects.get(owner=self.profile)
+        self.assertTrue(wallet.stripe_charges_enabled)
+        self.assertEqual(wallet.stripe_account_email, "creator@mochajump.com")
+        self.assertEqual(
+            wallet.stripe_account_status, Wallet.StripeAccountStatus.ENABLED
+        )
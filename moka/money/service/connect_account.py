@@ -0,0 +1,120 @@
+"""
+Local copy of the state of Stripe Connect accounts on their Wallet, so that
+wallet reads and payout eligibility are DB reads.
+
+The state is written when the account is created, on account.updated
+webhooks (money/service/webhook.py), and by refresh_stale_accounts, run
+periodically, for accounts not synced within STRIPE_ACCOUNT_MAX_STALENESS
+in case webhooks were missed. Each write carries the time the state was
+read from Stripe, and older states than the stored one are ignored.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import stripe
+from common.logger import StructuredLogger
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from money.models import Wallet
+
+logger = StructuredLogger(__name__)
+
+REFRESH_BATCH_SIZE = 500
+REFRESH_MAX_WORKERS = 4
+
+
+def get_account_state(account) -> dict:
+    if account["charges_enabled"]:
+        status = Wallet.StripeAccountStatus.ENABLED
+    elif account.get("details_submitted"):
+        status = Wallet.StripeAccountStatus.PENDING
+    else:
+        status = Wallet.StripeAccountStatus.ONBOARDING
+    return {
+        "stripe_charges_enabled": bool(account["charges_enabled"]),
+        "stripe_account_email": account.get("email"),
+        "stripe_account_status": status,
+    }
+
+
+def link_account(wallet: Wallet, account, synced_at: datetime):
+    """
+    Sets a newly created account, the caller saves the wallet
+    """
+    wallet.stripe_connect_account = account["id"]
+    for field, value in get_account_state(account).items():
+        setattr(wallet, field, value)
+    wallet.stripe_account_synced_at = synced_at
+
+
+def unlink_account(wallet: Wallet):
+    """
+    The caller saves the wallet
+    """
+    wallet.stripe_connect_account = None
+    wallet.stripe_charges_enabled = False
+    wallet.stripe_account_email = None
+    wallet.stripe_account_status = Wallet.StripeAccountStatus.NONE
+    wallet.stripe_account_synced_at = None
+
+
+def update_account_state(account, synced_at: datetime) -> int:
+    """
+    Returns the number of updated wallets
+    """
+    return (
+        Wallet.objects.filter(stripe_connect_account=account["id"])
+        # Out of order webhooks
+        .filter(
+            Q(stripe_account_synced_at__isnull=True)
+            | Q(stripe_account_synced_at__lte=synced_at)
+        ).update(**get_account_state(account), stripe_account_synced_at=synced_at)
+    )
+
+
+def refresh_stale_accounts(
+    stripe_handler,
+    now: datetime = None,
+    max_staleness: timedelta = timedelta(
+        minutes=settings.STRIPE_ACCOUNT_MAX_STALENESS_MINUTES
+    ),
+    batch_size: int = REFRESH_BATCH_SIZE,
+    max_workers: int = REFRESH_MAX_WORKERS,
+) -> int:
+    """
+    Refreshes the stalest accounts first. Returns the number of updated wallets.
+    """
+    now = now or timezone.now()
+    account_ids = list(
+        Wallet.objects.filter(stripe_connect_account__isnull=False)
+        .filter(
+            Q(stripe_account_synced_at__isnull=True)
+            | Q(stripe_account_synced_at__lt=now - max_staleness)
+        )
+        .order_by(F("stripe_account_synced_at").asc(nulls_first=True), "id")
+        .values_list("stripe_connect_account", flat=True)[:batch_size]
+    )
+
+    def retrieve(account_id):
+        try:
+            return stripe_handler.get_account(account_id)
+        except stripe.error.StripeError as e:
+            # e.g. deauthorized, left for the deauthorization webhook
+            logger.exception(
+                event_name="STRIPE_ACCOUNT_REFRESH_FAILURE",
+                msg=str(e),
+                account_id=account_id,
+            )
+            return None
+
+    # Only the Stripe calls run on the pool, DB writes stay on this thread
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="stripe-account"
+    ) as executor:
+        accounts = list(executor.map(retrieve, account_ids))
+    return sum(
+        update_account_state(account, synced_at=now)
+        for account in accounts
+        if account is not None
+    )
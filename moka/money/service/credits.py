@@ -0,0 +1,109 @@
+"""
+Crediting recipients of purchases and tips through an append-only ledger
+(money.models.RecipientCredit), so that buyers of a popular creator don't
+serialize on the creator's wallet row. Only the buyer's wallet is locked by
+a purchase; the credit is an insert.
+
+fold_credits, run periodically and before the monthly rollover, adds
+unfolded credits to Wallet.monthly_profit_* and to the daily earnings
+(money/service/earnings.py) in chunks. Credits are claimed with SKIP LOCKED
+and wallets are locked in id order, so concurrent folds neither apply a
+credit twice nor deadlock. Until folded, credits show as pending in the
+recipient's wallet.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Tuple
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from money.models import RecipientCredit, Transaction, Wallet
+from money.service.earnings import add_earnings
+
+FOLD_CHUNK_SIZE = 1000
+
+
+def credit_recipient(recipient_id: int, purchase_transaction: Transaction):
+    """
+    Must be called within the transaction of the purchase
+    """
+    RecipientCredit.objects.create(
+        recipient_id=recipient_id,
+        transaction=purchase_transaction,
+        coin_amount=purchase_transaction.coin_amount,
+        usd_value=purchase_transaction.usd_value,
+        created_at=purchase_transaction.created_at,
+    )
+
+
+def get_pending_credits(recipient_id: int) -> Tuple[int, float]:
+    """
+    Coins and USD value credited to the recipient and not folded yet
+    """
+    pending = RecipientCredit.objects.filter(
+        recipient_id=recipient_id, folded_at__isnull=True
+    ).aggregate(coin_amount=Sum("coin_amount"), usd_value=Sum("usd_value"))
+    return pending["coin_amount"] or 0, pending["usd_value"] or 0
+
+
+def fold_chunk(now: datetime, chunk_size: int = FOLD_CHUNK_SIZE) -> int:
+    """
+    Returns the number of folded credits
+    """
+    with transaction.atomic():
+        credits = list(
+            RecipientCredit.objects.select_for_update(skip_locked=True)
+            .filter(folded_at__isnull=True)
+            .order_by("id")
+            .values_list(
+                "id", "recipient_id", "coin_amount", "usd_value", "created_at"
+            )[:chunk_size]
+        )
+        if not credits:
+            return 0
+
+        totals: Dict[int, list] = defaultdict(lambda: [0, 0])
+        daily_totals: Dict[tuple, list] = defaultdict(lambda: [0, 0])
+        for _, recipient_id, coin_amount, usd_value, created_at in credits:
+            for total in [
+                totals[recipient_id],
+                daily_totals[(recipient_id, created_at.date())],
+            ]:
+                total[0] += coin_amount
+                total[1] += usd_value
+
+        # In id order, so that concurrent folds don't deadlock
+        list(
+            Wallet.objects.select_for_update()
+            .filter(owner_id__in=totals.keys())
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        for recipient_id, (coin_amount, usd_value) in totals.items():
+            Wallet.objects.filter(owner_id=recipient_id).update(
+                monthly_profit_balance=F("monthly_profit_balance") + coin_amount,
+                monthly_profit_usd_value=F("monthly_profit_usd_value") + usd_value,
+            )
+        for (recipient_id, day), (coin_amount, usd_value) in sorted(
+            daily_totals.items()
+        ):
+            add_earnings(recipient_id, day, coin_amount, usd_value)
+
+        RecipientCredit.objects.filter(id__in=[credit[0] for credit in credits]).update(
+            folded_at=now
+        )
+    return len(credits)
+
+
+def fold_credits(chunk_size: int = FOLD_CHUNK_SIZE) -> int:
+    """
+    Folds until no credits are left, except those claimed by another fold.
+    Returns the number of folded credits.
+    """
+    folded_cnt = 0
+    while True:
+        chunk_cnt = fold_chunk(timezone.now(), chunk_size)
+        folded_cnt += chunk_cnt
+        if chunk_cnt < chunk_size:
+            return folded_cnt
@@ -0,0 +1,148 @@
+"""
+Daily earnings of creators (money.models.DailyEarnings), so that income
+reads cost one row per day requested whatever the number of purchases.
+
+Purchases and tips add to the row of their UTC day when their credits are
+folded (money/service/credits.py). backfill_daily_earnings rebuilds rows
+of past days from Transaction, e.g. for history older than the rollup.
+"""
+from datetime import date, datetime, timedelta
+from typing import List, NamedTuple, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+from money.models import DailyEarnings, RecipientCredit, Transaction
+
+MAX_SERIES_DAYS = 366
+BACKFILL_CHUNK_SIZE = 1000
+
+
+class EarningsBucket(NamedTuple):
+    day: date
+    coin_amount: int
+    usd_value: float
+
+
+def add_earnings(recipient_id: int, day: date, coin_amount: int, usd_value: float):
+    """
+    Must be called within the transaction folding the credits
+    """
+    table = DailyEarnings._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (recipient_id, day, coin_amount, usd_value)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (recipient_id, day) DO UPDATE
+            SET coin_amount = {table}.coin_amount + EXCLUDED.coin_amount,
+                usd_value = {table}.usd_value + EXCLUDED.usd_value
+            """,
+            [recipient_id, day, coin_amount, usd_value],
+        )
+
+
+def get_first_day(today: date, days: int) -> date:
+    # days=0 is today only
+    return today - timedelta(days=days)
+
+
+def get_earnings(recipient_id: int, days: int, today: date) -> Tuple[int, float]:
+    """
+    Coins and USD value earned since days ago
+    """
+    earnings = DailyEarnings.objects.filter(
+        recipient_id=recipient_id,
+        day__gte=get_first_day(today, days),
+    ).aggregate(
+        coin_amount=Sum("coin_amount"),
+        usd_value=Sum("usd_value"),
+    )
+    return earnings["coin_amount"] or 0, earnings["usd_value"] or 0
+
+
+def get_earnings_series(
+    recipient_id: int, days: int, today: date
+) -> List[EarningsBucket]:
+    """
+    One bucket per day since days ago, oldest first, including days without
+    earnings
+    """
+    first_day = get_first_day(today, days)
+    earnings = {
+        day: (coin_amount, usd_value)
+        for day, coin_amount, usd_value in DailyEarnings.objects.filter(
+            recipient_id=recipient_id,
+            day__gte=first_day,
+            day__lte=today,
+        ).values_list("day", "coin_amount", "usd_value")
+    }
+    return [
+        EarningsBucket(day, *earnings.get(day, (0, 0)))
+        for day in (first_day + timedelta(days=i) for i in range(days + 1))
+    ]
+
+
+def backfill(chunk_size: int = BACKFILL_CHUNK_SIZE, now: datetime = None) -> int:
+    """
+    Rebuilds the rows of every recipient before the day the backfill starts,
+    from their purchase transactions whose credits are folded, per chunk of
+    recipient ids. Returns the number of written rows.
+
+    Rows of that day and later are left to the live rollup. Purchases of
+    earlier days all exist, only their credits may still be folded, so each
+    chunk locks the unfolded credits it skips. A fold in flight is waited
+    for, and the others fold them once the chunk commits, after its sums.
+    """
+    now = now or timezone.now()
+    # High-water mark
+    first_live_day = now.date()
+    earnings_table = DailyEarnings._meta.db_table
+    transaction_table = Transaction._meta.db_table
+    max_id = (
+        Transaction.objects.filter(type=Transaction.Type.PURCHASE).aggregate(
+            max_id=Max("recipient_id")
+        )["max_id"]
+        or 0
+    )
+    row_cnt = 0
+    for start_id in range(0, max_id + 1, chunk_size):
+        end_id = start_id + chunk_size
+        with transaction.atomic(), connection.cursor() as cursor:
+            list(
+                RecipientCredit.objects.select_for_update()
+                .filter(
+                    recipient_id__gte=start_id,
+                    recipient_id__lt=end_id,
+                    created_at__date__lt=first_live_day,
+                    folded_at__isnull=True,
+                )
+                .values_list("id", flat=True)
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {earnings_table} (recipient_id, day, coin_amount, usd_value)
+                SELECT
+                    recipient_id,
+                    (created_at AT TIME ZONE 'UTC')::date AS day,
+                    SUM(coin_amount),
+                    SUM(usd_value)
+                FROM {transaction_table} AS purchase
+                WHERE type = %s
+                    AND recipient_id >= %s AND recipient_id < %s
+                    AND (created_at AT TIME ZONE 'UTC')::date < %s
+                    -- Added when folded
+                    AND NOT EXISTS (
+                        SELECT 1 FROM {RecipientCredit._meta.db_table} AS credit
+                        WHERE credit.transaction_id = purchase.id
+                            AND credit.folded_at IS NULL
+                    )
+                GROUP BY 1, 2
+                ON CONFLICT (recipient_id, day) DO UPDATE
+                SET coin_amount = EXCLUDED.coin_amount,
+                    usd_value = EXCLUDED.usd_value
+                """,
+                [Transaction.Type.PURCHASE, start_id, end_id, first_live_day],
+            )
+            row_cnt += cursor.rowcount
+    return row_cnt
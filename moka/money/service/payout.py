@@ -0,0 +1,298 @@
+"""
+Monthly payout of wallet payout balances to their Stripe Connect accounts.
+
+Wallets are paid out independently on a bounded thread pool, each in steps
+that never hold a lock across a Stripe call:
+1. In a short transaction locking only the wallet, its payout balance is
+   moved to a PENDING Payout of the run.
+2. The Stripe transfer, with the payout id as idempotency key and transfer
+   group.
+3. In another short transaction, the payout becomes TRANSFERRED along with
+   its WITHDRAW transaction, or FAILED with the balance given back to the
+   wallet when Stripe rejects the transfer.
+
+The run of the month and the payouts are the checkpoint. A run that didn't
+finish, e.g. after a crash or transient Stripe errors, is resumed by the
+next run_payouts of the month, then wallets not paid out yet in the month
+are. A run left RUNNING by a past month is closed, so that its wallets are
+paid again the next month.
+
+PENDING payouts, of any run, are resumed first. Stripe applies a retry with
+the same idempotency key once only within 24 hours, so the transfer group
+of the payout is looked up before the transfer is sent again.
+"""
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+import stripe
+from common.logger import StructuredLogger
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from money.models import Payout, PayoutRun, Transaction, Wallet
+
+logger = StructuredLogger(__name__)
+
+MIN_PAYOUT_BALANCE = 300
+# Left PENDING for the next run, other Stripe errors fail the payout
+TRANSIENT_STRIPE_ERRORS = (
+    stripe.error.APIConnectionError,
+    stripe.error.APIError,
+    stripe.error.RateLimitError,
+)
+
+
+class PlannedPayout(NamedTuple):
+    wallet_id: int
+    stripe_connect_account: str
+    coin_amount: int
+    usd_value: float
+    platform_fee: float
+    # Cents
+    transfer_amount: int
+
+
+class PayoutRunResult(NamedTuple):
+    run_id: int
+    transferred_cnt: int
+    failed_cnt: int
+    pending_cnt: int
+
+
+def get_eligible_wallets():
+    return Wallet.objects.filter(
+        payout_balance__gte=MIN_PAYOUT_BALANCE,
+        stripe_connect_account__isnull=False,
+        # Accounts Stripe enabled for payouts, as last synced
+        stripe_charges_enabled=True,
+    )
+
+
+def plan_payout(wallet: Wallet) -> PlannedPayout:
+    platform_fee = wallet.owner.get_platform_fee(wallet.payout_usd_value)
+    return PlannedPayout(
+        wallet_id=wallet.id,
+        stripe_connect_account=wallet.stripe_connect_account,
+        coin_amount=wallet.payout_balance,
+        usd_value=wallet.payout_usd_value,
+        platform_fee=platform_fee,
+        transfer_amount=math.floor(wallet.payout_usd_value - platform_fee),
+    )
+
+
+def get_period_start(now: datetime) -> datetime:
+    # Wallets are paid out once per month
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def plan_payouts(now: datetime = None) -> List[PlannedPayout]:
+    """
+    Dry run, the payouts of the wallets the next run_payouts would pay out
+    """
+    now = now or timezone.now()
+    run = PayoutRun.objects.filter(
+        status=PayoutRun.Status.RUNNING,
+        created_at__gte=get_period_start(now),
+    ).first()
+    wallets = get_eligible_wallets().select_related("owner").order_by("id")
+    if run is not None:
+        wallets = wallets.exclude(payouts__run=run)
+    return [plan_payout(wallet) for wallet in wallets]
+
+
+def reserve_payout(run: PayoutRun, wallet_id: int) -> Optional[Payout]:
+    """
+    Returns None if the wallet is no longer eligible or already in the run
+    """
+    with transaction.atomic():
+        wallet = (
+            get_eligible_wallets()
+            .select_for_update(of=("self",))
+            .select_related("owner")
+            .filter(id=wallet_id)
+            .first()
+        )
+        if wallet is None or Payout.objects.filter(run=run, wallet=wallet).exists():
+            return None
+
+        planned = plan_payout(wallet)
+        payout = Payout.objects.create(
+            run=run,
+            wallet=wallet,
+            stripe_connect_account=planned.stripe_connect_account,
+            coin_amount=planned.coin_amount,
+            usd_value=planned.usd_value,
+            platform_fee=planned.platform_fee,
+            transfer_amount=planned.transfer_amount,
+        )
+        wallet.payout_balance = 0
+        wallet.payout_usd_value = 0
+        wallet.save(update_fields=["payout_balance", "payout_usd_value"])
+    return payout
+
+
+def complete_payout(payout_id: int, stripe_transfer_id: str):
+    with transaction.atomic():
+        payout = (
+            Payout.objects.select_for_update(of=("self",))
+            .select_related("wallet")
+            .get(id=payout_id)
+        )
+        if payout.status != Payout.Status.PENDING:
+            return
+        payout.status = Payout.Status.TRANSFERRED
+        payout.stripe_transfer_id = stripe_transfer_id
+        payout.last_error = None
+        payout.save(update_fields=["status", "stripe_transfer_id", "last_error"])
+
+        owner_id = payout.wallet.owner_id if payout.wallet is not None else None
+        Transaction.objects.create(
+            type=Transaction.Type.WITHDRAW,
+            sender_id=owner_id,
+            recipient_id=owner_id,
+            coin_amount=payout.coin_amount,
+            usd_value=payout.usd_value,
+        )
+
+
+def fail_payout(payout_id: int, error: Exception):
+    with transaction.atomic():
+        payout = Payout.objects.select_for_update().get(id=payout_id)
+        if payout.status != Payout.Status.PENDING:
+            return
+        Wallet.objects.filter(id=payout.wallet_id).update(
+            payout_balance=F("payout_balance") + payout.coin_amount,
+            payout_usd_value=F("payout_usd_value") + payout.usd_value,
+        )
+        payout.status = Payout.Status.FAILED
+        payout.last_error = repr(error)
+        payout.save(update_fields=["status", "last_error"])
+
+
+def transfer_payout(stripe_handler, payout: Payout) -> str:
+    """
+    Returns the status of the payout
+    """
+    try:
+        transfer = stripe_handler.create_transfer(
+            usd_amount=payout.transfer_amount,
+            account_id=payout.stripe_connect_account,
+            metadata={
+                "coins": payout.coin_amount,
+                "eligible_value": payout.usd_value,
+                "platform_fee": payout.platform_fee,
+                "payout_id": payout.id,
+            },
+            idempotency_key=payout.idempotency_key,
+            transfer_group=payout.transfer_group,
+        )
+    except TRANSIENT_STRIPE_ERRORS as e:
+        logger.exception(
+            event_name="PAYOUT_TRANSFER_RETRYABLE_FAILURE",
+            msg=str(e),
+            payout_id=payout.id,
+            wallet_id=payout.wallet_id,
+        )
+        Payout.objects.filter(id=payout.id, status=Payout.Status.PENDING).update(
+            last_error=repr(e)
+        )
+        return Payout.Status.PENDING
+    except stripe.error.StripeError as e:
+        logger.exception(
+            event_name="PAYOUT_TRANSFER_FAILURE",
+            msg=str(e),
+            payout_id=payout.id,
+            wallet_id=payout.wallet_id,
+        )
+        fail_payout(payout.id, e)
+        return Payout.Status.FAILED
+    complete_payout(payout.id, transfer["id"])
+    return Payout.Status.TRANSFERRED
+
+
+def resume_payout(stripe_handler, payout_id: int) -> str:
+    payout = Payout.objects.get(id=payout_id)
+    if payout.status != Payout.Status.PENDING:
+        return payout.status
+    try:
+        # The previous attempt may have transferred, e.g. on a client timeout
+        transfer = stripe_handler.find_transfer(payout.transfer_group)
+    except stripe.error.StripeError as e:
+        logger.exception(
+            event_name="PAYOUT_TRANSFER_LOOKUP_FAILURE",
+            msg=str(e),
+            payout_id=payout.id,
+            wallet_id=payout.wallet_id,
+        )
+        return Payout.Status.PENDING
+    if transfer is not None:
+        complete_payout(payout.id, transfer["id"])
+        return Payout.Status.TRANSFERRED
+    return transfer_payout(stripe_handler, payout)
+
+
+def pay_out_wallet(stripe_handler, run: PayoutRun, wallet_id: int) -> Optional[str]:
+    payout = reserve_payout(run, wallet_id)
+    if payout is None:
+        return None
+    return transfer_payout(stripe_handler, payout)
+
+
+def _in_thread(func, *args):
+    try:
+        return func(*args)
+    finally:
+        # Pool threads don't go through the request cycle that closes them
+        connection.close()
+
+
+def run_payouts(
+    stripe_handler,
+    max_workers: int = settings.PAYOUT_MAX_WORKERS,
+    now: datetime = None,
+) -> PayoutRunResult:
+    now = now or timezone.now()
+    PayoutRun.objects.filter(
+        status=PayoutRun.Status.RUNNING,
+        created_at__lt=get_period_start(now),
+    ).update(status=PayoutRun.Status.CLOSED, finished_at=now)
+    # At most one run is RUNNING, see PayoutRun.Meta
+    run, _ = PayoutRun.objects.get_or_create(status=PayoutRun.Status.RUNNING)
+    pending_payout_ids = list(
+        Payout.objects.filter(status=Payout.Status.PENDING)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    wallet_ids = list(
+        get_eligible_wallets()
+        .exclude(payouts__run=run)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="payout"
+    ) as executor:
+        futures = [
+            executor.submit(_in_thread, resume_payout, stripe_handler, payout_id)
+            for payout_id in pending_payout_ids
+        ] + [
+            executor.submit(_in_thread, pay_out_wallet, stripe_handler, run, wallet_id)
+            for wallet_id in wallet_ids
+        ]
+        statuses = [future.result() for future in futures]
+
+    pending_cnt = Payout.objects.filter(status=Payout.Status.PENDING).count()
+    if not run.payouts.filter(status=Payout.Status.PENDING).exists():
+        run.status = PayoutRun.Status.DONE
+        run.finished_at = timezone.now()
+        run.save(update_fields=["status", "finished_at"])
+    return PayoutRunResult(
+        run_id=run.id,
+        transferred_cnt=statuses.count(Payout.Status.TRANSFERRED),
+        failed_cnt=statuses.count(Payout.Status.FAILED),
+        pending_cnt=pending_cnt,
+    )
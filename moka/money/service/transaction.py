@@ -4,18 +4,25 @@ Logics regarding safely transfering balance from one wallet to another.
 Unit is one cent (as per stripe)
 One coin costs one cent
 """
-import math
+from typing import List, Tuple
 
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import F, Max, Q
 from django.shortcuts import get_object_or_404
-from episode.models import PurchaseEpisode
+from django.utils import timezone
+from episode.models import Episode, PurchaseEpisode
 from moka_profile.models import MokaProfile
-from money.models import Transaction, Wallet
+from money.models import MonthlyRollover, Transaction, Wallet
+from money.service.connect_account import unlink_account
+from money.service.credits import credit_recipient, fold_credits
 
 # Never change these constants! As this subjects to messing with internal economy
 CENTS_PER_COIN = 1
 CENTS_PER_USD = 100
 
+ROLLOVER_CHUNK_SIZE = 10000
+MAX_EPISODES_PER_PURCHASE = 100
+
 
 class WithdrawAmountExceedsBalance(Exception):
     pass
@@ -39,7 +46,7 @@ def remove_stored_connect_acct_id(connected_acct_id):
         wallet = Wallet.objects.select_for_update().get(
             stripe_connect_account=connected_acct_id,
         )
-        wallet.stripe_connect_account = None
+        unlink_account(wallet)
         wallet.save()
 
 
@@ -96,36 +103,33 @@ def __transfer_coins(
     if amount > 10000000:
         raise OverMaximumAmount
 
+    # Only the sender's wallet is locked, the recipient is credited through
+    # the ledger, see money/service/credits.py
     sender_wallet_locked, _ = Wallet.objects.select_for_update().get_or_create(
         owner=sender
     )
-    recipient_wallet_locked, _ = Wallet.objects.select_for_update().get_or_create(
-        owner=recipient
-    )
+    Wallet.objects.get_or_create(owner=recipient)
     # Check if buyer has enough balance
     if sender_wallet_locked.balance < amount:
         raise NotEnoughBalance
 
     # Subtract amount and corresponding usd_value based on the episode price from the buyer wallet
-    # Add the same amount and usd_value to the owner wallet
+    # Credit the same amount and usd_value to the owner
     transfer_coins = amount
     transfer_usd_value = amount * sender_wallet_locked.usd_value_per_coin()
 
     sender_wallet_locked.balance -= transfer_coins
     sender_wallet_locked.usd_value -= transfer_usd_value
-    recipient_wallet_locked.monthly_profit_balance += transfer_coins
-    recipient_wallet_locked.monthly_profit_usd_value += transfer_usd_value
-
     sender_wallet_locked.save()
-    recipient_wallet_locked.save()
 
-    Transaction.objects.create(
+    purchase_transaction = Transaction.objects.create(
         type=Transaction.Type.PURCHASE,
         sender=sender,
         recipient=recipient,
         coin_amount=transfer_coins,
         usd_value=transfer_usd_value,
     )
+    credit_recipient(recipient.id, purchase_transaction)
 
 
 def send_tip(
@@ -152,71 +156,117 @@ def purchase_episode(
         )
 
 
-def move_monthly_balance_to_payout_balance():
+def get_purchasable_episodes():
+    return Episode.objects.filter(
+        # Premium public episodes, or pre-release ones with a price set
+        Q(status=Episode.EpisodeStatus.PUBLIC, is_premium=True)
+        | Q(status=Episode.EpisodeStatus.PRE_RELEASE, price__gt=0)
+    )
+
+
+def purchase_episodes(
+    buyer,
+    series,
+    episode_filter: Q,
+) -> Tuple[List[int], int]:
+    """
+    Purchases the episodes of the series matching episode_filter that are
+    eligible and not owned by the buyer yet, with one transfer to the series
+    owner. Returns the ids of the purchased episodes and the coins spent.
+    """
     with transaction.atomic():
-        wallets = Wallet.objects.select_for_update().all()
-        bulk_update_wallets = []
-        for wallet in wallets:
-            if wallet.monthly_profit_balance > 0:
-                wallet.payout_balance += wallet.monthly_profit_balance
-                wallet.payout_usd_value += wallet.monthly_profit_usd_value
-                wallet.monthly_profit_usd_value = 0
-                wallet.monthly_profit_balance = 0
-                bulk_update_wallets.append(wallet)
-        Wallet.objects.bulk_update(
-            bulk_update_wallets,
+        # Purchases of a buyer wait on their wallet, so that the episodes
+        # read below can't be bought concurrently
+        Wallet.objects.select_for_update().get_or_create(owner=buyer)
+        episodes = list(
+            get_purchasable_episodes()
+            .filter(episode_filter, series=series)
+            .exclude(
+                id__in=PurchaseEpisode.objects.filter(profile=buyer).values(
+                    "episode_id"
+                )
+            )
+            .order_by("episode_number", "id")
+            .values_list("id", "price")
+        )
+        if not episodes:
+            return [], 0
+
+        amount = sum(price for _, price in episodes)
+        __transfer_coins(recipient=series.owner, sender=buyer, amount=amount)
+        PurchaseEpisode.objects.bulk_create(
             [
-                "payout_balance",
-                "payout_usd_value",
-                "monthly_profit_usd_value",
-                "monthly_profit_balance",
-            ],
+                PurchaseEpisode(episode_id=episode_id, profile=buyer)
+                for episode_id, _ in episodes
+            ]
         )
+    return [episode_id for episode_id, _ in episodes], amount
 
 
-def payout(stripe_handler):
-    payout_eligibile_wallets = (
-        Wallet.objects.select_for_update()
-        .filter(
-            payout_balance__gte=300,
-        )
-        .exclude(
-            stripe_connect_account__isnull=True,
-        )
-    )
-    with transaction.atomic():
-        for wallet in payout_eligibile_wallets:
-            account = stripe_handler.get_account(wallet.stripe_connect_account)
-            if not account["charges_enabled"]:
-                continue  # Payout is disabled
-
-            Transaction.objects.create(
-                type=Transaction.Type.WITHDRAW,
-                sender=wallet.owner,
-                recipient=wallet.owner,
-                coin_amount=wallet.payout_balance,
-                usd_value=wallet.payout_usd_value,
-            )
+def __roll_over_chunk(start_id, end_id):
+    """
+    Moves the monthly profits of wallets in [start_id, end_id) with one
+    statement. Returns the number of wallets, coins and USD value moved.
 
-            platform_fee = wallet.owner.get_platform_fee(wallet.payout_usd_value)
-            stripe_handler.create_transfer(
-                usd_amount=math.floor(wallet.payout_usd_value - platform_fee),
-                account_id=wallet.stripe_connect_account,
-                metadata={
-                    "coins": wallet.payout_balance,
-                    "eligible_value": wallet.payout_usd_value,
-                    "platform_fee": platform_fee,
-                },
+    Rows are locked before they are read, so credits folded into a wallet of
+    the chunk either commit first and are moved, or wait and land in the
+    emptied monthly profit.
+    """
+    table = Wallet._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH locked AS (
+                SELECT id, monthly_profit_balance, monthly_profit_usd_value
+                FROM {table}
+                WHERE id >= %s AND id < %s AND monthly_profit_balance > 0
+                -- Same lock order as fold_credits
+                ORDER BY id
+                FOR UPDATE
+            ), moved AS (
+                UPDATE {table} AS wallet
+                SET payout_balance = wallet.payout_balance + locked.monthly_profit_balance,
+                    payout_usd_value = wallet.payout_usd_value + locked.monthly_profit_usd_value,
+                    monthly_profit_balance = 0,
+                    monthly_profit_usd_value = 0
+                FROM locked
+                WHERE wallet.id = locked.id
+                RETURNING locked.monthly_profit_balance, locked.monthly_profit_usd_value
             )
-            wallet.payout_balance = 0
-            wallet.payout_usd_value = 0
-
-        Wallet.objects.bulk_update(
-            payout_eligibile_wallets,
-            [
-                "payout_balance",
-                "payout_usd_value",
-                "monthly_profit_usd_value",
-                "monthly_profit_balance",
-            ],
+            SELECT
+                COUNT(*),
+                COALESCE(SUM(monthly_profit_balance), 0),
+                COALESCE(SUM(monthly_profit_usd_value), 0)
+            FROM moved
+            """,
+            [start_id, end_id],
         )
+        return cursor.fetchone()
+
+
+def move_monthly_balance_to_payout_balance(
+    chunk_size=ROLLOVER_CHUNK_SIZE,
+) -> MonthlyRollover:
+    """
+    Chunked over wallet id ranges, each in its own short transaction, so
+    that locks are held for one chunk of wallets with monthly profits at a
+    time. A rerun after an interruption only moves what is left.
+    """
+    # Credits of the month so far
+    fold_credits()
+    rollover = MonthlyRollover.objects.create()
+    max_id = Wallet.objects.aggregate(max_id=Max("id"))["max_id"] or 0
+    for start_id in range(0, max_id + 1, chunk_size):
+        with transaction.atomic():
+            wallet_cnt, coin_amount, usd_value = __roll_over_chunk(
+                start_id, start_id + chunk_size
+            )
+            if wallet_cnt:
+                MonthlyRollover.objects.filter(id=rollover.id).update(
+                    wallet_cnt=F("wallet_cnt") + wallet_cnt,
+                    coin_amount=F("coin_amount") + coin_amount,
+                    usd_value=F("usd_value") + usd_value,
+                )
+    MonthlyRollover.objects.filter(id=rollover.id).update(finished_at=timezone.now())
+    rollover.refresh_from_db()
+    return rollover
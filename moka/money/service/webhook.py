@@ -0,0 +1,188 @@
+"""
+Processing of the Stripe webhook inbox (money.models.StripeEvent).
+
+The webhook only verifies the signature and records the event by its id
+before acknowledging it, so a slow Stripe never holds a request thread and
+redeliveries of an event are recorded once. process_due_events then claims
+due events with SKIP LOCKED, so that concurrent workers never claim the
+same ones, and handles them on a bounded thread pool. Failed events are
+retried with exponential backoff up to MAX_ATTEMPTS.
+
+A claimed event is processed in two steps, so that no transaction or row
+lock is held across a Stripe call:
+1. The Stripe reads its handling needs, outside any transaction.
+2. In a short transaction under the event's row lock, its DB writes and
+   marking it done, if no other claim of the event did first. A deposit is
+   so applied once even when an expired claim is processed again.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from typing import List
+
+from common.logger import StructuredLogger
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from money.models import StripeEvent
+from money.service import connect_account
+from money.service.transaction import deposit, remove_stored_connect_acct_id
+
+logger = StructuredLogger(__name__)
+
+CLAIM_BATCH_SIZE = 50
+# A claimed event is claimable again after this, e.g. when its worker died
+CLAIM_TIMEOUT = timedelta(minutes=5)
+MAX_ATTEMPTS = 8
+RETRY_BACKOFF = timedelta(seconds=30)
+MAX_RETRY_BACKOFF = timedelta(hours=1)
+
+
+def record_event(event: dict) -> bool:
+    """
+    Returns False if the event was already recorded
+    """
+    _, created = StripeEvent.objects.get_or_create(
+        event_id=event["id"],
+        defaults={
+            "type": event["type"],
+            "payload": event,
+        },
+    )
+    return created
+
+
+def fetch_event_data(stripe_handler, event: dict) -> dict:
+    """
+    Stripe reads needed to handle the event, made outside any transaction
+    """
+    if event["type"] == "checkout.session.completed":
+        session = event["data"]["object"]
+        if session["payment_status"] == "paid":
+            (
+                nominal,
+                net,
+            ) = stripe_handler.retrieve_balance_transaction_nominal_and_net(
+                session["payment_intent"]
+            )
+            return {"nominal": nominal, "net": net}
+    return {}
+
+
+def handle_event(event: dict, data: dict):
+    """
+    Must be called within the transaction marking the event done
+    """
+    if event["type"] == "checkout.session.completed":
+        if data:
+            deposit(
+                owner_id=event["data"]["object"]["client_reference_id"],
+                coin_amount=data["nominal"],
+                usd_value=data["net"],
+            )
+    elif event["type"] == "account.application.deauthorized":
+        remove_stored_connect_acct_id(event["account"])
+    elif event["type"] == "account.updated":
+        connect_account.update_account_state(
+            event["data"]["object"],
+            synced_at=datetime.fromtimestamp(event["created"], timezone.utc),
+        )
+
+
+def get_retry_backoff(attempts: int) -> timedelta:
+    return min(RETRY_BACKOFF * 2 ** (attempts - 1), MAX_RETRY_BACKOFF)
+
+
+def claim_events(now: datetime, batch_size: int = CLAIM_BATCH_SIZE) -> List[int]:
+    with transaction.atomic():
+        event_ids = list(
+            StripeEvent.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[StripeEvent.Status.PENDING, StripeEvent.Status.PROCESSING],
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at", "id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        StripeEvent.objects.filter(id__in=event_ids).update(
+            status=StripeEvent.Status.PROCESSING,
+            attempts=F("attempts") + 1,
+            next_attempt_at=now + CLAIM_TIMEOUT,
+        )
+    return event_ids
+
+
+def process_event(stripe_handler, event_id: int) -> bool:
+    """
+    Returns whether the event is done
+    """
+    try:
+        event = StripeEvent.objects.get(id=event_id)
+        if event.status != StripeEvent.Status.PROCESSING:
+            return event.status == StripeEvent.Status.DONE
+        data = fetch_event_data(stripe_handler, event.payload)
+
+        with transaction.atomic():
+            event = StripeEvent.objects.select_for_update().get(id=event_id)
+            if event.status != StripeEvent.Status.PROCESSING:
+                # Done by another claim in the meantime
+                return event.status == StripeEvent.Status.DONE
+            handle_event(event.payload, data)
+            event.status = StripeEvent.Status.DONE
+            event.processed_at = timezone.now()
+            event.last_error = None
+            event.save(update_fields=["status", "processed_at", "last_error"])
+        return True
+    except Exception as e:
+        event = StripeEvent.objects.get(id=event_id)
+        logger.exception(
+            event_name="STRIPE_EVENT_PROCESS_FAILURE",
+            msg=str(e),
+            event_id=event.event_id,
+            stripe_event_type=event.type,
+            attempts=event.attempts,
+        )
+        if event.attempts >= MAX_ATTEMPTS:
+            status, next_attempt_at = StripeEvent.Status.FAILED, event.next_attempt_at
+        else:
+            status = StripeEvent.Status.PENDING
+            next_attempt_at = timezone.now() + get_retry_backoff(event.attempts)
+        StripeEvent.objects.filter(
+            id=event_id, status=StripeEvent.Status.PROCESSING
+        ).update(status=status, next_attempt_at=next_attempt_at, last_error=repr(e))
+        return False
+
+
+def _process_event_in_thread(stripe_handler, event_id: int) -> bool:
+    try:
+        return process_event(stripe_handler, event_id)
+    finally:
+        # Pool threads don't go through the request cycle that closes them
+        connection.close()
+
+
+def process_due_events(
+    stripe_handler,
+    max_workers: int = settings.STRIPE_EVENT_WORKERS,
+    batch_size: int = CLAIM_BATCH_SIZE,
+) -> int:
+    """
+    Processes events until none are due. Returns the number of done events.
+    """
+    done_cnt = 0
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="stripe-event"
+    ) as executor:
+        while True:
+            event_ids = claim_events(timezone.now(), batch_size)
+            if not event_ids:
+                break
+            done_cnt += sum(
+                executor.map(
+                    partial(_process_event_in_thread, stripe_handler), event_ids
+                )
+            )
+            if len(event_ids) < batch_size:
+                break
+    return done_cnt
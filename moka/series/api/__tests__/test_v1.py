@@ -2,9 +2,11 @@ import random
 from unittest import mock
 
 import django.test
+from django.core.cache import cache
 from django.test import Client
 from episode.factory import EpisodeFactory
 from episode.models import Episode
+from episode.service import neighbors
 from image.factory import ThumbnailFactory
 from image.models import Thumbnail
 from moka_profile.factory import MokaProfileFactory
@@ -28,6 +30,9 @@ class TestSeriesAPI(django.test.TestCase):
         self.mock_signed_cookie.start()
         self.addCleanup(self.mock_signed_cookie.stop)
 
+        # Ids are reused across test databases, drop leftover neighbor indexes
+        cache.delete_pattern("series_*_episode_numbers")
+
     def test_get_series(self):
         tags = ["sci-fi", "adventure", "comedy"]
         series = SeriesFactory(status=Series.SeriesStatus.PUBLIC, tags=tags)
@@ -37,6 +42,15 @@ class TestSeriesAPI(django.test.TestCase):
         self.assertEqual(response_parsed.thumbnail_url, self.fake_signed_cookie)
         self.assertFalse(response_parsed.is_owner)
 
+    def test_get_series_without_artist_name(self):
+        series = SeriesFactory(
+            status=Series.SeriesStatus.PUBLIC,
+            owner=MokaProfileFactory(display_name=None),
+        )
+        response = self.client.get(f"/v1/series/{series.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()["artist_name"])
+
     def test_get_all_series_episodes_in_order(self):
         series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
         episode1 = EpisodeFactory(
@@ -281,3 +295,115 @@ class TestSeriesAPI(django.test.TestCase):
                 path=f"/v1/series/{99999999999}/delete",
             )
             self.assertEqual(response.status_code, 404)
+
+    def test_series_list_query_count_is_constant(self):
+        SeriesFactory.create_batch(
+            size=20,
+            status=Series.SeriesStatus.PUBLIC,
+            tags=["sci-fi", "comedy"],
+        )
+        # count, page, tags prefetch
+        with self.assertNumQueries(3):
+            response = self.client.get("/v1/series/list?limit=5").json()
+        self.assertEqual(len(response["items"]), 5)
+
+        with self.assertNumQueries(3):
+            response = self.client.get("/v1/series/list?limit=20").json()
+        self.assertEqual(len(response["items"]), 20)
+        for item in response["items"]:
+            self.assertSetEqual(set(item["tags"]), {"sci-fi", "comedy"})
+
+    def test_public_series_episodes_query_count_is_constant(self):
+        profiles = MokaProfileFactory.create_batch(2)
+        series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        EpisodeFactory.create_batch(
+            size=20,
+            series=series,
+            status=Episode.EpisodeStatus.PUBLIC,
+            likes=[profile.id for profile in profiles],
+        )
+        # count, page
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                f"/v1/series/{series.id}/episodes/public?limit=5"
+            ).json()
+        self.assertEqual(len(response["items"]), 5)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                f"/v1/series/{series.id}/episodes/public?limit=20"
+            ).json()
+        self.assertEqual(len(response["items"]), 20)
+        for item in response["items"]:
+            self.assertEqual(item["likes"], 2)
+
+    def test_public_series_episodes_cursor_pagination(self):
+        series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        episodes = EpisodeFactory.create_batch(
+            size=7,
+            series=series,
+            status=Episode.EpisodeStatus.PUBLIC,
+        )
+        path = f"/v1/series/{series.id}/episodes/public?limit=3"
+
+        response = self.client.get(path).json()
+        self.assertEqual(response["count"], 7)
+        episode_ids = [item["id"] for item in response["items"]]
+        cursor = response["next_cursor"]
+        while cursor is not None:
+            with self.assertNumQueries(1):
+                response = self.client.get(f"{path}&cursor={cursor}").json()
+            episode_ids += [item["id"] for item in response["items"]]
+            cursor = response["next_cursor"]
+
+        self.assertEqual(
+            episode_ids,
+            [
+                str(episode.id)
+                for episode in sorted(
+                    episodes, key=lambda e: e.episode_number, reverse=True
+                )
+            ],
+        )
+
+    def test_jump_to_episode_number(self):
+        series = SeriesFactory(status=Series.SeriesStatus.PUBLIC)
+        episode = EpisodeFactory(
+            series=series,
+            episode_number=3,
+            status=Episode.EpisodeStatus.PUBLIC,
+            is_banned=False,
+        )
+        EpisodeFactory(
+            series=series,
+            episode_number=4,
+            status=Episode.EpisodeStatus.DRAFT,
+        )
+        neighbors.rebuild_series(series.id)
+
+        response = self.client.get(f"/v1/series/{series.id}/episodes/number/3")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["id"], str(episode.id))
+
+        response = self.client.get(f"/v1/series/{series.id}/episodes/number/4")
+        self.assertEqual(response.status_code, 404)
+
+    def test_series_list_search(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            title_match = SeriesFactory(
+                title="Moonlight", status=Series.SeriesStatus.PUBLIC
+            )
+            tag_match = SeriesFactory(
+                title="Harbor",
+                status=Series.SeriesStatus.PUBLIC,
+                tags=["moonlight", "moody"],
+            )
+            SeriesFactory(title="Other", status=Series.SeriesStatus.PUBLIC)
+
+        response = self.client.get("/v1/series/list?q=moonlight").json()
+        self.assertEqual(response["count"], 2)
+        # Title weighs more than tags
+        self.assertEqual(
+            [item["series_id"] for item in response["items"]],
+            [str(title_match.id), str(tag_match.id)],
+        )
@@ -5,6 +5,7 @@ from collection.models import FollowingCollection
 from common.logger import StructuredLogger
 from common.schema_utils import datetime_encoder
 from episode.api.schema import EpisodeIdSchema
+from image.models import Image
 from moka_profile.models import MokaProfile
 from ninja import Field, Schema
 from series.models import Series
@@ -30,13 +31,15 @@ class SeriesMetaDataSchema(Schema):
     thumbnail_id: Optional[str]
     thumbnail_url: Optional[str] = Field(default=None)
     artist_id: str
-    artist_name: str
+    # Unset until synced from Firebase, see moka_profile.service.firebase_sync
+    artist_name: Optional[str]
     series_id: str
     series_title: str
     tags: list
     description: Optional[str]
 
     status: str
+    unique_readers: int
 
     is_owner: Optional[bool] = Field(default=False)
     is_following: Optional[bool] = Field(default=False)
@@ -44,6 +47,15 @@ class SeriesMetaDataSchema(Schema):
     class Config(Schema.Config):
         json_encorders = {datetime: datetime_encoder}
 
+    @staticmethod
+    def prefetch(series_list: List[Series]):
+        """
+        Batch resolve tags and readers for a page of series
+        """
+        Series.prefetch_tags(series_list)
+        Series.prefetch_unique_readers(series_list)
+        Image.prefetch_signed_cookies([series.thumbnail for series in series_list])
+
     def resolve_thumbnail_url(self, series: Series):
         if series.thumbnail:
             return series.thumbnail.signed_cookie
@@ -79,6 +91,9 @@ class SeriesMetaDataSchema(Schema):
     def resolve_status(self, series: Series):
         return series.status
 
+    def resolve_unique_readers(self, series: Series):
+        return series.get_unique_readers()
+
     @staticmethod
     def resolve_with_series(series: Series):
         ret = {
@@ -89,6 +104,7 @@ class SeriesMetaDataSchema(Schema):
             "tags": series.get_tags(),
             "description": series.description,
             "status": series.status,
+            "unique_readers": series.get_unique_readers(),
         }
         if series.thumbnail:
             ret["thumbnail_url"] = series.thumbnail.signed_cookie
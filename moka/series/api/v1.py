@@ -5,16 +5,20 @@ from collection.models import FollowingCollection
 from common.auth import FirebaseAuthentication, FirebaseOptionalAuthentication
 from common.errors import MokaBackendGenericError, UnauthorizedError
 from common.logger import StructuredLogger
+from common.pagination import BatchedLimitOffsetPagination, CursorPagination
+from discovery.service import feed_index, search
 from django.db import IntegrityError, transaction
 from django.db.models import Q
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.views.decorators import csrf
 from episode.api.schema import EpisodeMetaDataSchema
 from episode.models import Episode
+from episode.service import neighbors
 from image.models import Image, Thumbnail
 from moka_profile.models import MokaProfile
 from ninja import Router
-from ninja.pagination import LimitOffsetPagination, paginate
+from ninja.pagination import paginate
 from series.api.schema import (
     SeriesEditInputSchema,
     SeriesEpisodesOrderInputSchema,
@@ -31,24 +35,19 @@ logger = StructuredLogger(__name__)
     response=List[SeriesMetaDataSchema],
 )
 @csrf.csrf_exempt
-@paginate(LimitOffsetPagination)
+@paginate(BatchedLimitOffsetPagination, batch_resolver=SeriesMetaDataSchema.prefetch)
 def get_series_list(request, q: Optional[str] = None):
     query_predicate = (
         Q(status=Series.SeriesStatus.PUBLIC)
         & Q(is_banned=False)
         & Q(owner__is_banned=False)
     )
-    if q is not None:
-        query_predicate = query_predicate & (
-            Q(title__icontains=q)
-            | Q(owner__display_name__icontains=q)
-            | Q(tags__name__icontains=q)
-        )
-    return (
-        Series.objects.select_related("thumbnail", "owner")
-        .filter(query_predicate)
-        .order_by("-updated_at")
+    series_list = Series.objects.select_related("thumbnail", "owner").filter(
+        query_predicate
     )
+    if q is not None:
+        return search.search_series(series_list, q)
+    return series_list.order_by("-updated_at")
 
 
 @router.get(
@@ -76,7 +75,11 @@ def get_series(request, id: int):
     response=List[EpisodeMetaDataSchema],
 )
 @csrf.csrf_exempt
-@paginate(LimitOffsetPagination)
+@paginate(
+    CursorPagination,
+    ordering=("-episode_number", "-id"),
+    batch_resolver=EpisodeMetaDataSchema.prefetch,
+)
 def get_public_series_episodes(request, id: int):
     return (
         Episode.objects.select_related(
@@ -98,13 +101,26 @@ def get_public_series_episodes(request, id: int):
     )
 
 
+@router.get(
+    "/{int:id}/episodes/number/{int:number}",
+    response=EpisodeMetaDataSchema,
+    description="Jump to the public episode with the given number",
+)
+@csrf.csrf_exempt
+def get_public_series_episode_by_number(request, id: int, number: int):
+    episode_id = neighbors.get_episode_id(id, number)
+    if episode_id is None:
+        raise Http404
+    return get_object_or_404(feed_index.get_visible_episodes(), id=episode_id)
+
+
 @router.get(
     "/{int:id}/episodes/all",
     response=List[EpisodeMetaDataSchema],
     auth=FirebaseAuthentication(),
     description="List all episodes as a Series owner",
 )
-@paginate(LimitOffsetPagination)
+@paginate(BatchedLimitOffsetPagination, batch_resolver=EpisodeMetaDataSchema.prefetch)
 def get_all_series_episodes(request, id: int):
     return (
         Episode.objects.select_related(
@@ -210,6 +226,8 @@ def edit_series_episode_order(request, id: int, input: SeriesEpisodesOrderInputS
                 episodes[episode.id].episode_number = input.start + idx
                 bulk_update_episodes.append(episodes[episode.id])
             Episode.objects.bulk_update(bulk_update_episodes, ["episode_number"])
+            # bulk_update skips the signals that keep the neighbor index in sync
+            neighbors.rebuild_series(series.id)
         except Exception as e:
             logger.exception(
                 event_name="EDIT_SERIES_EPISODE_ORDER_ERROR",
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('series', '0005_auto_20220824_2159'),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.TrigramExtension(),
+        migrations.AddField(
+            model_name='series',
+            name='search_document',
+            field=django.contrib.postgres.search.SearchVectorField(null=True),
+        ),
+        migrations.AddField(
+            model_name='series',
+            name='search_text',
+            field=models.TextField(default=''),
+        ),
+        migrations.AddIndex(
+            model_name='series',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='series_seri_search__67e650_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='series',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='series_search_text_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -1,4 +1,10 @@
+from typing import List
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import prefetch_related_objects
+from episode.service import readers
 from image.models import Thumbnail
 from moka_profile.models import MokaProfile
 from taggit.managers import TaggableManager
@@ -7,6 +13,14 @@ from taggit.managers import TaggableManager
 class Series(models.Model):
     class Meta:
         verbose_name_plural = "Series'"
+        indexes = [
+            GinIndex(fields=["search_document"]),
+            GinIndex(
+                name="series_search_text_trgm",
+                fields=["search_text"],
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
 
     class SeriesStatus(models.TextChoices):
         PUBLIC = "PUBLIC"
@@ -35,8 +49,39 @@ class Series(models.Model):
 
     is_banned = models.BooleanField(default=False)
 
+    # Maintained by discovery.service.search
+    search_document = SearchVectorField(null=True)
+    search_text = models.TextField(default="")
+
     def get_tags(self):
+        if "tags" in getattr(self, "_prefetched_objects_cache", {}):
+            return [tag.name for tag in self.tags.all()]
         return list(self.tags.names())
 
+    @staticmethod
+    def prefetch_tags(series_list: List["Series"]):
+        """
+        Load tags of the given series with a single query
+        """
+        prefetch_related_objects(series_list, "tags")
+
+    def get_unique_readers(self):
+        if hasattr(self, "_prefetched_unique_readers"):
+            return self._prefetched_unique_readers
+        return readers.get_unique_readers(
+            readers.SERIES_READERS_CACHE_KEY, [self.id]
+        ).get(self.id, 0)
+
+    @staticmethod
+    def prefetch_unique_readers(series_list: List["Series"]):
+        """
+        Attach unique reader counts to the given series with one pipeline
+        """
+        unique_readers = readers.get_unique_readers(
+            readers.SERIES_READERS_CACHE_KEY, [series.id for series in series_list]
+        )
+        for series in series_list:
+            series._prefetched_unique_readers = unique_readers.get(series.id, 0)
+
     def is_owner(self, profile: MokaProfile):
         return self.owner.id == profile.id